@@ -0,0 +1,5 @@
+"""
+Benchmark offline cho CV Analyzer API (fake AI provider + corpus CV tổng hợp).
+
+Chạy từ thư mục backend:  python -m benchmarks.run --help
+"""
@@ -0,0 +1,149 @@
+"""
+Corpus CV tổng hợp cho benchmark: PDF / DOCX / TXT với nhiều kích thước.
+
+Nội dung sinh theo seed nên chạy lại cho cùng corpus; mỗi file khác nhau
+(không trúng cache text/analysis của app giữa các request).
+PDF được ghi trực tiếp (text + font Helvetica), không cần thư viện tạo PDF.
+"""
+import io
+import os
+import random
+import unicodedata
+from dataclasses import dataclass
+
+from benchmarks.fake_provider import SKILLS
+
+FORMATS = ("pdf", "docx", "txt")
+# Số trang (ước lượng theo số dòng) cho mỗi kích thước
+SIZES = {"small": 1, "medium": 3, "large": 12}
+LINES_PER_PAGE = 50
+
+FIRST_NAMES = ["An", "Bình", "Châu", "Dũng", "Hà", "Hùng", "Lan", "Minh", "Nam", "Phương", "Quân", "Thảo", "Trang", "Tuấn"]
+LAST_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Vũ", "Đặng", "Bùi", "Đỗ"]
+COMPANIES = ["FPT Software", "VNG", "Tiki", "MoMo", "Viettel", "Shopee", "Grab", "KMS Technology"]
+ROLES = ["Backend Developer", "Fullstack Developer", "Data Engineer", "DevOps Engineer", "Software Engineer"]
+TASKS = [
+    "Thiết kế và phát triển REST API phục vụ hàng triệu request mỗi ngày",
+    "Tối ưu truy vấn SQL, giảm 40% thời gian phản hồi",
+    "Xây dựng pipeline CI/CD và triển khai lên Kubernetes",
+    "Viết unit test và integration test, coverage trên 80%",
+    "Hướng dẫn 3 thành viên mới trong team",
+    "Tích hợp thanh toán và hệ thống thông báo realtime",
+    "Phân tích yêu cầu cùng Product Owner và ước lượng công việc",
+]
+
+
+@dataclass
+class CorpusFile:
+    filename: str
+    content: bytes
+    format: str
+    size: str
+
+
+def cv_text(rng: random.Random, pages: int) -> str:
+    """Nội dung 1 CV khoảng `pages` trang"""
+    name = f"{rng.choice(LAST_NAMES)} Văn {rng.choice(FIRST_NAMES)}"
+    lines = [
+        name.upper(),
+        f"Email: {rng.randint(1000, 9999)}@example.com | Điện thoại: 09{rng.randint(10000000, 99999999)}",
+        "",
+        "TÓM TẮT",
+        f"{rng.randint(1, 10)} năm kinh nghiệm phát triển phần mềm, yêu thích hệ thống phân tán.",
+        "",
+        "KỸ NĂNG",
+        ", ".join(rng.sample(SKILLS, 6)),
+        "",
+        "HỌC VẤN",
+        f"Cử nhân Công nghệ Thông tin, Đại học Bách Khoa ({rng.randint(2008, 2020)})",
+        "",
+        "KINH NGHIỆM LÀM VIỆC",
+    ]
+    while len(lines) < pages * LINES_PER_PAGE:
+        start = rng.randint(2012, 2022)
+        lines += [
+            "",
+            f"{rng.choice(ROLES)} - {rng.choice(COMPANIES)} ({start} - {start + rng.randint(1, 3)})",
+            *(f"- {task}" for task in rng.sample(TASKS, 4)),
+            f"- Công nghệ: {', '.join(rng.sample(SKILLS, 4))}",
+        ]
+    return "\n".join(lines)
+
+
+def to_txt(text: str) -> bytes:
+    return text.encode("utf-8")
+
+
+def to_docx(text: str) -> bytes:
+    from docx import Document
+
+    document = Document()
+    for line in text.split("\n"):
+        document.add_paragraph(line)
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def to_pdf(text: str) -> bytes:
+    """PDF text tối giản, mỗi trang LINES_PER_PAGE dòng (font chuẩn nên bỏ dấu tiếng Việt)"""
+    lines = _ascii(text).split("\n")
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    # 1 catalog, 2 pages, 3 font, sau đó từng cặp page / content
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        body = " ".join(f"({_pdf_escape(line)}) Tj T*" for line in page)
+        stream = f"BT /F1 10 Tf 50 800 Td 14 TL {body} ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def _ascii(text: str) -> str:
+    text = text.replace("đ", "d").replace("Đ", "D")
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+RENDERERS = {"pdf": to_pdf, "docx": to_docx, "txt": to_txt}
+
+
+def build_corpus(count: int, formats=FORMATS, sizes=tuple(SIZES), seed: int = 0) -> list[CorpusFile]:
+    """`count` file CV khác nhau, luân phiên theo định dạng và kích thước"""
+    rng = random.Random(seed)
+    combos = [(fmt, size) for fmt in formats for size in sizes]
+    files = []
+    for i in range(count):
+        fmt, size = combos[i % len(combos)]
+        text = cv_text(rng, SIZES[size])
+        files.append(CorpusFile(f"cv-{i:05d}-{size}.{fmt}", RENDERERS[fmt](text), fmt, size))
+    return files
+
+
+def save_corpus(files: list[CorpusFile], directory: str) -> None:
+    """Ghi corpus ra thư mục (để kiểm tra thủ công hoặc dùng với công cụ khác)"""
+    os.makedirs(directory, exist_ok=True)
+    for file in files:
+        with open(os.path.join(directory, file.filename), "wb") as output:
+            output.write(file.content)
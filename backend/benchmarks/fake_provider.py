@@ -0,0 +1,178 @@
+"""
+Fake AI provider cho benchmark: không gọi API thật, không tốn credit.
+
+Giả lập response Gemini / Claude / OpenRouter (cả non-stream và SSE stream) với
+latency, tỉ lệ lỗi và rate limit cấu hình được. Gắn vào app qua http_client.set_transport
+nên toàn bộ đường đi gateway (rate limit, retry, circuit breaker) vẫn được đo.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import httpx
+
+import http_client
+
+SKILLS = [
+    "Python", "Java", "JavaScript", "TypeScript", "React", "Node.js", "SQL", "PostgreSQL", "Docker",
+    "Kubernetes", "AWS", "FastAPI", "Django", "Go", "Machine Learning", "Git", "Linux", "Redis",
+]
+_CV_INDEX_RE = re.compile(r'<cv index="(\d+)">')
+
+
+@dataclass
+class FakeProviderConfig:
+    # Latency trung bình mỗi request (ms) và độ lệch chuẩn
+    latency_ms: float = 300
+    jitter_ms: float = 100
+    # Tỉ lệ request trả về HTTP 500
+    error_rate: float = 0.0
+    # Số request/giây tối đa, vượt quá trả về 429 (0 = không giới hạn)
+    rate_limit: float = 0
+    # Số chunk khi trả response dạng stream
+    stream_chunks: int = 20
+    seed: int = 0
+
+
+class FakeProvider:
+    """Handler cho httpx.MockTransport của 1 provider"""
+
+    def __init__(self, provider: str, config: FakeProviderConfig):
+        self.provider = provider
+        self.config = config
+        self.stats: Counter = Counter()
+        self._random = random.Random(f"{config.seed}:{provider}")
+        self._window: deque = deque()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST":
+            # Warm-up của app mở kết nối bằng HEAD /
+            return httpx.Response(404)
+
+        self.stats["requests"] += 1
+        if self._rate_limited():
+            self.stats["rate_limited"] += 1
+            return httpx.Response(429, headers={"retry-after": "1"}, json={"error": {"message": "rate limited"}})
+
+        latency = max(0.0, self._random.gauss(self.config.latency_ms, self.config.jitter_ms)) / 1000
+        if self._random.random() < self.config.error_rate:
+            await asyncio.sleep(latency)
+            self.stats["errors"] += 1
+            return httpx.Response(500, json={"error": {"message": "fake provider error"}})
+
+        body = json.loads(request.content)
+        text = fake_response_text(self._prompt(body), self._random)
+        if request.url.params.get("alt") == "sse" or body.get("stream"):
+            self.stats["streams"] += 1
+            return httpx.Response(
+                200, headers={"content-type": "text/event-stream"},
+                content=self._stream(text, latency)
+            )
+
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=self._completion(text))
+
+    def _rate_limited(self) -> bool:
+        if self.config.rate_limit <= 0:
+            return False
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1.0:
+            self._window.popleft()
+        if len(self._window) >= self.config.rate_limit:
+            return True
+        self._window.append(now)
+        return False
+
+    def _prompt(self, body: dict) -> str:
+        if self.provider == "gemini":
+            return "".join(part.get("text", "") for part in body["contents"][0]["parts"])
+        return body["messages"][-1]["content"]
+
+    def _completion(self, text: str) -> dict:
+        if self.provider == "gemini":
+            return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        if self.provider == "claude":
+            return {"content": [{"type": "text", "text": text}]}
+        return {"choices": [{"message": {"content": text}}]}
+
+    def _event(self, text: str) -> str:
+        if self.provider == "gemini":
+            data = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        elif self.provider == "claude":
+            data = {"type": "content_block_delta", "delta": {"type": "text_delta", "text": text}}
+        else:
+            data = {"choices": [{"delta": {"content": text}}]}
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def _stream(self, text: str, latency: float) -> AsyncIterator[bytes]:
+        # 20% latency trước token đầu tiên, phần còn lại chia đều cho các chunk
+        chunks = max(1, self.config.stream_chunks)
+        size = -(-len(text) // chunks)
+        await asyncio.sleep(latency * 0.2)
+        for start in range(0, len(text), size):
+            yield self._event(text[start:start + size]).encode()
+            await asyncio.sleep(latency * 0.8 / chunks)
+        if self.provider == "openrouter":
+            yield b"data: [DONE]\n\n"
+
+
+def fake_response_text(prompt: str, rng: random.Random) -> str:
+    """JSON giống response thật: phân tích JD, 1 CV, hoặc JSON array cho packed prompt"""
+    if '"required_skills"' in prompt and '"interview_questions"' not in prompt:
+        return json.dumps({
+            "title": "Backend Developer",
+            "required_skills": rng.sample(SKILLS, 4),
+            "nice_to_have_skills": rng.sample(SKILLS, 2),
+            "min_years_experience": rng.randint(1, 5),
+            "education": "Cử nhân CNTT",
+            "responsibilities": ["Phát triển API", "Review code"],
+            "soft_skills": ["Giao tiếp", "Làm việc nhóm"],
+        }, ensure_ascii=False)
+
+    indexes = [int(index) for index in _CV_INDEX_RE.findall(prompt)]
+    if indexes:
+        analyses = [{**fake_analysis(prompt, rng), "cv_index": index} for index in indexes]
+        return "```json\n" + json.dumps(analyses, ensure_ascii=False) + "\n```"
+    return "```json\n" + json.dumps(fake_analysis(prompt, rng), ensure_ascii=False, indent=2) + "\n```"
+
+
+def fake_analysis(prompt: str, rng: random.Random) -> dict:
+    skills = [skill for skill in SKILLS if skill in prompt] or rng.sample(SKILLS, 3)
+    score = rng.randint(40, 95)
+    return {
+        "summary": "Ứng viên có kinh nghiệm phát triển phần mềm, phù hợp vị trí backend.",
+        "name": f"Ứng viên {rng.randint(1, 10 ** 6)}",
+        "email": "candidate@example.com",
+        "phone": "0900000000",
+        "skills": skills,
+        "experience": "3 năm phát triển web",
+        "education": "Cử nhân CNTT",
+        "strengths": ["Tư duy logic", "Tự học tốt"],
+        "recommendations": ["Bổ sung chứng chỉ cloud"],
+        "interview_questions": ["Mô tả dự án gần nhất?", "Bạn xử lý bug production thế nào?"],
+        "salary_range": "20-30 triệu",
+        "career_path": ["Senior Developer", "Tech Lead"],
+        "overall_score": score,
+        "skills_score": rng.randint(40, 95),
+        "experience_score": rng.randint(40, 95),
+        "education_score": rng.randint(40, 95),
+        "soft_skills_score": rng.randint(40, 95),
+        "match_percentage": score,
+        "matching_skills": skills[:3],
+        "missing_skills": ["Kubernetes"],
+        "red_flags": [],
+    }
+
+
+def install(config: FakeProviderConfig) -> dict[str, FakeProvider]:
+    """Thay transport của tất cả provider bằng fake provider, trả về các handler (để đọc stats)"""
+    providers = {}
+    for provider in http_client.PROVIDER_BASE_URLS:
+        providers[provider] = FakeProvider(provider, config)
+        http_client.set_transport(provider, httpx.MockTransport(providers[provider]))
+    return providers
@@ -0,0 +1,353 @@
+"""
+Benchmark offline: chạy app in-process (httpx ASGITransport) với fake AI provider.
+
+Ví dụ (từ thư mục backend):
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario analyze batch --requests 200 --concurrency 20 --latency-ms 800
+    python -m benchmarks.run --error-rate 0.05 --rate-limit 20 --output bench.json
+    python -m benchmarks.run --baseline bench.json --max-regression 0.2   # exit 1 nếu chậm hơn baseline
+
+Scenario:
+- extract: thời gian extract text theo định dạng / kích thước file (qua process pool như app)
+- analyze: POST /analyze-cv, mỗi request 1 CV khác nhau
+- stream: POST /analyze-cv/stream
+- batch: POST /batch-analyze, mỗi request --batch-size CV (kèm JD)
+- export: POST /export-excel với --export-rows dòng
+
+Báo cáo: requests/s, latency p50/p95/p99, thời gian trung bình từng bước phía server
+(đọc từ /metrics), peak RSS (process chính và process pool extract).
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from typing import Awaitable, Callable
+
+SCENARIOS = ("extract", "analyze", "stream", "batch", "export")
+JOB_DESCRIPTION = "Backend Developer: Python, FastAPI, PostgreSQL, Docker, AWS. Tối thiểu 2 năm kinh nghiệm."
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark CV Analyzer API với fake AI provider")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Số request mỗi scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--model", default="gemini-2.0-flash")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latency trung bình của fake provider")
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ fake provider trả HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Request/giây tối đa của fake provider (0 = không giới hạn)")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--pack", action="store_true", help="Batch dùng packed mode")
+    parser.add_argument("--export-rows", type=int, default=2000)
+    parser.add_argument("--formats", nargs="+", default=["pdf", "docx", "txt"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Ghi report JSON ra file")
+    parser.add_argument("--baseline", help="Report JSON trước đó để so sánh")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Cho phép chậm hơn baseline tối đa (0.2 = 20%%)")
+    parser.add_argument("--save-corpus", help="Ghi corpus CV ra thư mục này")
+    return parser.parse_args(argv)
+
+
+def configure_env(workdir: str, env=os.environ) -> None:
+    """Env cho app trước khi import main: DB tạm, API key giả, bỏ rate limit phía client, log ít"""
+    defaults = {
+        "CACHE_DB_PATH": os.path.join(workdir, "cache.db"),
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "SEARCH_DB_PATH": os.path.join(workdir, "search.db"),
+        "GOOGLE_API_KEY": "benchmark",
+        "ANTHROPIC_API_KEY": "benchmark",
+        "OPENROUTER_API_KEY": "benchmark",
+        # Rate limit do fake provider giả lập (--rate-limit), token bucket của gateway không giới hạn
+        "GEMINI_RATE_PER_MIN": "1000000",
+        "CLAUDE_RATE_PER_MIN": "1000000",
+        "OPENROUTER_RATE_PER_MIN": "1000000",
+        "LOG_LEVEL": "ERROR",
+    }
+    for key, value in defaults.items():
+        env.setdefault(key, value)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Percentile theo nearest-rank (values đã sort)"""
+    if not values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(values))
+    return values[max(0, min(len(values), rank) - 1)]
+
+
+def peak_rss_mb() -> dict:
+    """Peak RSS của process chính và các process con đã kết thúc (process pool extract)"""
+    try:
+        import resource
+    except ImportError:
+        return {}
+    # Linux trả về KB, macOS trả về bytes
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+async def run_load(
+    send: Callable[[int], Awaitable], count: int, concurrency: int
+) -> dict:
+    """Gửi `count` request với tối đa `concurrency` request đồng thời, đo latency từng request"""
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < count:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await send(index)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, min(concurrency, count)))])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": count,
+        "concurrency": concurrency,
+        "status": dict(statuses),
+        "errors": sum(value for key, value in statuses.items() if key != "200"),
+        "duration_s": round(elapsed, 3),
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def stage_totals(client) -> dict[str, list[float]]:
+    """Tổng thời gian / số lần của từng bước phía server, đọc từ /metrics"""
+    totals: dict[str, list[float]] = {}
+    response = await client.get("/metrics")
+    for line in response.text.splitlines():
+        for suffix, position in (("_sum", 0), ("_count", 1)):
+            prefix = f"cv_stage_duration_seconds{suffix}{{"
+            if line.startswith(prefix):
+                stage = line.split('stage="', 1)[1].split('"', 1)[0]
+                totals.setdefault(stage, [0.0, 0.0])[position] += float(line.rsplit(" ", 1)[1])
+    return totals
+
+
+def stage_means(before: dict, after: dict) -> dict[str, float]:
+    """Thời gian trung bình (ms) mỗi bước trong khoảng giữa 2 lần đọc /metrics"""
+    means = {}
+    for stage, (total, count) in after.items():
+        total -= before.get(stage, [0.0, 0.0])[0]
+        count -= before.get(stage, [0.0, 0.0])[1]
+        if count:
+            means[stage] = round(total / count * 1000, 2)
+    return means
+
+
+async def bench_extraction(args, corpus_module, extraction) -> dict:
+    """
+    Thời gian extract từng định dạng / kích thước, chạy tuần tự để đo latency thuần.
+    File được ghi ra đĩa và extract theo path như upload lớn đã spool ra file tạm.
+    """
+    files = corpus_module.build_corpus(len(args.formats) * len(corpus_module.SIZES) * 5, args.formats, seed=args.seed + 1)
+    workdir = tempfile.mkdtemp(prefix="cv-bench-extract-")
+    paths = []
+    for i, file in enumerate(files):
+        paths.append(os.path.join(workdir, f"{i}-{file.filename}"))
+        with open(paths[-1], "wb") as out:
+            out.write(file.content)
+
+    # Khởi động các process trong pool trước khi đo
+    warm = len(args.formats) * 3
+    await asyncio.gather(*[extraction.extract_text(file.filename, path=path) for file, path in zip(files[:warm], paths)])
+
+    timings: dict = {}
+    for file, path in zip(files, paths):
+        start = time.perf_counter()
+        text = await extraction.extract_text(file.filename, path=path)
+        elapsed = time.perf_counter() - start
+        entry = timings.setdefault(file.format, {}).setdefault(file.size, {"times": [], "bytes": 0, "chars": 0})
+        entry["times"].append(elapsed)
+        entry["bytes"] += len(file.content)
+        entry["chars"] += len(text)
+
+    report: dict = {}
+    for fmt, sizes in timings.items():
+        for size, entry in sizes.items():
+            times = sorted(entry["times"])
+            total = sum(times)
+            report.setdefault(fmt, {})[size] = {
+                "files": len(times),
+                "avg_kb": round(entry["bytes"] / len(times) / 1024, 1),
+                "mean_ms": round(total / len(times) * 1000, 2),
+                "p95_ms": round(percentile(times, 95) * 1000, 2),
+                "mb_per_s": round(entry["bytes"] / total / 1024 / 1024, 2) if total else 0.0,
+                "chars": entry["chars"],
+            }
+    return report
+
+
+async def run_benchmark(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="cv-bench-")
+    configure_env(workdir)
+
+    import httpx
+    from benchmarks import corpus, fake_provider
+
+    import main as api
+    import extraction
+
+    providers = fake_provider.install(fake_provider.FakeProviderConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, seed=args.seed,
+    ))
+    report: dict = {"config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}, "scenarios": {}}
+
+    if args.save_corpus:
+        corpus.save_corpus(corpus.build_corpus(args.requests, args.formats, seed=args.seed), args.save_corpus)
+
+    async with api.lifespan(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            # Đo trạng thái ổn định: chờ warm-up xong (cold start đo bằng benchmarks.startup)
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.01)
+
+            for number, scenario in enumerate(args.scenario):
+                if scenario == "extract":
+                    report["extraction"] = await bench_extraction(args, corpus, extraction)
+                    print_extraction(report["extraction"])
+                    continue
+
+                send, count = await prepare_scenario(scenario, args, client, corpus, fake_provider, seed=args.seed + 10 * (number + 1))
+                before = await stage_totals(client)
+                result = await run_load(send, count, args.concurrency)
+                result["stages_ms"] = stage_means(before, await stage_totals(client))
+                result["peak_rss_mb"] = peak_rss_mb().get("self")
+                report["scenarios"][scenario] = result
+                print_scenario(scenario, result)
+
+    report["provider"] = {name: dict(provider.stats) for name, provider in providers.items() if provider.stats}
+    # Sau khi lifespan kết thúc process pool đã dừng -> RUSAGE_CHILDREN có peak RSS của worker extract
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+async def prepare_scenario(scenario: str, args, client, corpus, fake_provider, seed: int) -> tuple[Callable, int]:
+    """Trả về (hàm gửi request thứ i, số request)"""
+    params = {"model": args.model}
+
+    if scenario in ("analyze", "stream"):
+        files = corpus.build_corpus(args.requests, args.formats, seed=seed)
+        path = "/analyze-cv" if scenario == "analyze" else "/analyze-cv/stream"
+
+        async def send(index: int):
+            file = files[index]
+            return await client.post(path, params=params, files={"file": (file.filename, file.content)})
+        return send, len(files)
+
+    if scenario == "batch":
+        count = max(1, args.requests // args.batch_size)
+        files = corpus.build_corpus(count * args.batch_size, args.formats, seed=seed)
+
+        async def send(index: int):
+            batch = files[index * args.batch_size:(index + 1) * args.batch_size]
+            return await client.post(
+                "/batch-analyze", params={**params, "pack": str(args.pack).lower()},
+                files=[("files", (file.filename, file.content)) for file in batch],
+                data={"job_description": JOB_DESCRIPTION},
+            )
+        return send, count
+
+    if scenario == "export":
+        import random
+        rng = random.Random(seed)
+        rows = [
+            {"filename": f"cv-{i:05d}.pdf", "analysis": fake_provider.fake_analysis("", rng)}
+            for i in range(args.export_rows)
+        ]
+
+        async def send(index: int):
+            return await client.post("/export-excel", json={"results": rows})
+        return send, max(1, args.requests // 10)
+
+    raise ValueError(f"Scenario không hỗ trợ: {scenario}")
+
+
+def print_scenario(name: str, result: dict) -> None:
+    stages = ", ".join(f"{stage}={ms}ms" for stage, ms in result["stages_ms"].items())
+    print(
+        f"{name:<8} {result['requests']:>5} req  {result['rps']:>8.2f} req/s  "
+        f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms  "
+        f"errors={result['errors']}  rss={result['peak_rss_mb']}MB"
+    )
+    if stages:
+        print(f"{'':<8} stages: {stages}")
+
+
+def print_extraction(report: dict) -> None:
+    for fmt, sizes in report.items():
+        for size, entry in sizes.items():
+            print(
+                f"extract  {fmt:<5} {size:<7} {entry['avg_kb']:>8.1f}KB  mean={entry['mean_ms']}ms "
+                f"p95={entry['p95_ms']}ms  {entry['mb_per_s']}MB/s"
+            )
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Danh sách chỉ số chậm hơn baseline quá max_regression"""
+    regressions = []
+    for name, result in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        if old["rps"] and result["rps"] < old["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: rps {old['rps']} -> {result['rps']}")
+        for key in ("p50_ms", "p95_ms"):
+            if old[key] and result[key] > old[key] * (1 + max_regression):
+                regressions.append(f"{name}: {key} {old[key]} -> {result[key]}")
+    for fmt, sizes in report.get("extraction", {}).items():
+        for size, entry in sizes.items():
+            old = baseline.get("extraction", {}).get(fmt, {}).get(size)
+            if old and old["mean_ms"] and entry["mean_ms"] > old["mean_ms"] * (1 + max_regression):
+                regressions.append(f"extract {fmt}/{size}: mean_ms {old['mean_ms']} -> {entry['mean_ms']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+
+    print(f"peak RSS: {report['peak_rss_mb']}  provider: {report['provider']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
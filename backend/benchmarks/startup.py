@@ -0,0 +1,189 @@
+"""
+Benchmark cold start: mỗi lần đo chạy trong 1 process Python mới (giống instance vừa wake up).
+
+Đo:
+- import_ms: thời gian import app (main)
+- startup_ms: phần startup của lifespan (trước khi nhận request)
+- ready_ms: từ lúc process bắt đầu tới khi /ready trả về 200
+- first_*_ms / warm_*_ms: request đầu tiên sau khi start và request cùng loại lần sau
+  (analyze PDF, analyze DOCX, export Excel), fake provider không có latency
+- import chậm nhất theo `python -X importtime`
+
+Ví dụ (từ thư mục backend):
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --output startup.json
+    python -m benchmarks.startup --baseline startup.json --max-regression 0.3
+"""
+import time
+
+_PROCESS_START = time.perf_counter()
+
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+METRICS = (
+    "import_ms", "startup_ms", "ready_ms",
+    "first_pdf_ms", "warm_pdf_ms", "first_docx_ms", "warm_docx_ms", "first_export_ms", "warm_export_ms",
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark cold start của CV Analyzer API")
+    parser.add_argument("--runs", type=int, default=3, help="Số process đo cho mỗi chế độ")
+    parser.add_argument("--top-imports", type=int, default=10)
+    parser.add_argument("--output", help="Ghi report JSON ra file")
+    parser.add_argument("--baseline", help="Report JSON trước đó để so sánh")
+    parser.add_argument("--max-regression", type=float, default=0.3)
+    parser.add_argument("--child", choices=("warmup", "cold"), help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def measure_child(mode: str, corpus_dir: str) -> dict:
+    """
+    Chạy trong process con: import app, start, chờ ready, gửi request đầu tiên / lần sau.
+    Corpus được tạo sẵn ở process cha để process con không import python-docx trước app.
+    """
+    from benchmarks.run import configure_env
+
+    os.environ["WARMUP"] = "1" if mode == "warmup" else "0"
+    configure_env(tempfile.mkdtemp(prefix="cv-startup-"))
+
+    import httpx
+    from benchmarks import fake_provider
+    import main as api
+    import warmup
+
+    result = {"import_ms": warmup.status()["import_ms"]}
+    fake_provider.install(fake_provider.FakeProviderConfig(latency_ms=0, jitter_ms=0))
+    files = {}
+    for filename in sorted(os.listdir(corpus_dir)):
+        with open(os.path.join(corpus_dir, filename), "rb") as file:
+            files.setdefault(os.path.splitext(filename)[1], []).append((filename, file.read()))
+    rng = random.Random(0)
+    rows = [{"filename": f"cv-{i}.pdf", "analysis": fake_provider.fake_analysis("", rng)} for i in range(200)]
+
+    async with api.lifespan(api.app):
+        result["startup_ms"] = warmup.status()["startup_ms"]
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.005)
+            result["ready_ms"] = round((time.perf_counter() - _PROCESS_START) * 1000, 1)
+
+            async def timed(send) -> float:
+                start = time.perf_counter()
+                response = await send()
+                response.raise_for_status()
+                return round((time.perf_counter() - start) * 1000, 1)
+
+            for fmt in ("pdf", "docx"):
+                for phase, upload in zip(("first", "warm"), files[f".{fmt}"]):
+                    result[f"{phase}_{fmt}_ms"] = await timed(
+                        lambda: client.post("/analyze-cv", files={"file": upload})
+                    )
+            for phase in ("first", "warm"):
+                result[f"{phase}_export_ms"] = await timed(lambda: client.post("/export-excel", json={"results": rows}))
+    return result
+
+
+def run_child(mode: str, corpus_dir: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", mode, "--corpus", corpus_dir],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list[dict]:
+    """Các module import trực tiếp từ main, sắp theo thời gian cumulative (python -X importtime)"""
+    from benchmarks.run import configure_env
+
+    # DB tạm như process đo, không tạo cache.db / jobs.db / search.db trong thư mục hiện tại
+    env = {**os.environ, "WARMUP": "0"}
+    configure_env(tempfile.mkdtemp(prefix="cv-startup-imports-"), env)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <2 khoảng trắng mỗi cấp><module>"
+        self_part, cumulative_us, name = line.split("|", 2)
+        self_us = self_part.split(":", 1)[1]
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            entries.append({
+                "module": name.strip(),
+                "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+                "self_ms": round(int(self_us) / 1000, 1),
+            })
+    entries.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return entries[:top]
+
+
+def summarize(runs: list[dict]) -> dict:
+    """Median của từng chỉ số qua các lần đo"""
+    return {
+        metric: round(statistics.median(run[metric] for run in runs), 1)
+        for metric in METRICS if all(run.get(metric) is not None for run in runs)
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    regressions = []
+    for mode, metrics in report["modes"].items():
+        old_metrics = baseline.get("modes", {}).get(mode, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            # Bỏ qua chênh lệch nhỏ hơn 5ms (nhiễu đo)
+            if old and value > old * (1 + max_regression) and value - old > 5:
+                regressions.append(f"{mode} {metric}: {old} -> {value}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(asyncio.run(measure_child(args.child, args.corpus))))
+        return 0
+
+    from benchmarks import corpus
+
+    corpus_dir = tempfile.mkdtemp(prefix="cv-startup-corpus-")
+    corpus.save_corpus(corpus.build_corpus(4, ("pdf", "docx"), ("medium",), seed=1), corpus_dir)
+
+    report = {"runs": args.runs, "modes": {}, "imports": slowest_imports(args.top_imports)}
+    for mode in ("warmup", "cold"):
+        report["modes"][mode] = summarize([run_child(mode, corpus_dir) for _ in range(args.runs)])
+
+    for entry in report["imports"]:
+        print(f"import   {entry['module']:<20} {entry['cumulative_ms']:>8.1f}ms (self {entry['self_ms']}ms)")
+    for mode, metrics in report["modes"].items():
+        print(f"{mode:<8} " + "  ".join(f"{metric}={value}" for metric, value in metrics.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Cache có giới hạn bộ nhớ (LRU), TTL tùy chọn và lưu xuống SQLite.
+
+- Tầng memory: LRU giới hạn theo số bytes, riêng cho mỗi worker.
+- Tầng disk: SQLite (WAL) dùng chung giữa các uvicorn worker và giữ lại sau restart.
+"""
+import os
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class PersistentCache:
+    """Cache 2 tầng: LRU trong memory + SQLite trên disk"""
+
+    def __init__(
+        self,
+        name: str,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 0,
+        db_path: Optional[str] = None,
+        max_disk_entries: int = 10000,
+    ):
+        self.name = name
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+
+        # key -> (expires_at, size_bytes, value)
+        self._memory: "OrderedDict[str, tuple[float, int, Any]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.expirations = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS cache_{name} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_cache_{name}_accessed ON cache_{name}(accessed_at)"
+            )
+            self._db.commit()
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl_seconds if self.ttl_seconds > 0 else 0
+
+    @staticmethod
+    def _is_expired(expires_at: float) -> bool:
+        return expires_at > 0 and expires_at < time.time()
+
+    def _memory_put(self, key: str, expires_at: float, size: int, value: Any) -> None:
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = (expires_at, size, value)
+        self._memory_bytes += size
+        # Evict các entry ít dùng nhất khi vượt giới hạn bytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.evictions += 1
+
+    def _memory_drop(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Lấy giá trị theo key, None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._memory_drop(key)
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, size, expires_at FROM cache_{self.name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, size, expires_at = row
+                    if not self._is_expired(expires_at):
+                        value = json.loads(raw)
+                        self._memory_put(key, expires_at, size, value)
+                        self._db.execute(
+                            f"UPDATE cache_{self.name} SET accessed_at = ? WHERE key = ?",
+                            (time.time(), key)
+                        )
+                        self._db.commit()
+                        self.hits += 1
+                        return value
+                    self._db.execute(f"DELETE FROM cache_{self.name} WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Giống get nhưng không tính hit/miss và không cập nhật LRU (dùng để kiểm tra / poll)"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._is_expired(entry[0]):
+                return entry[2]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires_at FROM cache_{self.name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._is_expired(row[1]):
+                    return json.loads(row[0])
+            return None
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def set(self, key: str, value: Any) -> None:
+        """Lưu giá trị (phải serialize được JSON)"""
+        raw = json.dumps(value, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        expires_at = self._expires_at()
+
+        with self._lock:
+            self._memory_put(key, expires_at, size, value)
+
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO cache_{self.name} (key, value, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, size, expires_at, time.time())
+                )
+                self._trim_disk()
+                self._db.commit()
+
+    def _trim_disk(self) -> None:
+        """Xóa entry hết hạn và entry lâu không dùng nhất khi vượt max_disk_entries"""
+        self._db.execute(
+            f"DELETE FROM cache_{self.name} WHERE expires_at > 0 AND expires_at < ?", (time.time(),)
+        )
+        count = self._db.execute(f"SELECT COUNT(*) FROM cache_{self.name}").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                f"DELETE FROM cache_{self.name} WHERE key IN ("
+                f"SELECT key FROM cache_{self.name} ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            self.disk_evictions += overflow
+
+    def clear(self) -> int:
+        """Xóa toàn bộ cache, trả về số entry đã xóa"""
+        with self._lock:
+            count = len(self._memory)
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                count = self._db.execute(f"SELECT COUNT(*) FROM cache_{self.name}").fetchone()[0]
+                self._db.execute(f"DELETE FROM cache_{self.name}")
+                self._db.commit()
+            return count
+
+    def items(self):
+        """Duyệt (key, value) của tất cả entry còn hạn (từ disk nếu có, không tính vào hits)"""
+        if self._db is None:
+            with self._lock:
+                entries = [(key, entry[2]) for key, entry in self._memory.items() if not self._is_expired(entry[0])]
+            yield from entries
+            return
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value FROM cache_{self.name} WHERE expires_at = 0 OR expires_at >= ?", (time.time(),)
+            ).fetchall()
+        for key, raw in rows:
+            yield key, json.loads(raw)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._db is not None:
+                return self._db.execute(f"SELECT COUNT(*) FROM cache_{self.name}").fetchone()[0]
+            return len(self._memory)
+
+    def stats(self) -> dict:
+        """Thống kê hits/misses/evictions và dung lượng"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+            if self._db is not None:
+                disk_items, disk_bytes = self._db.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_{self.name}"
+                ).fetchone()
+                stats.update({
+                    "disk_items": disk_items,
+                    "disk_bytes": disk_bytes,
+                    "disk_evictions": self.disk_evictions,
+                    "max_disk_entries": self.max_disk_entries,
+                })
+            return stats
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def cache_from_env(name: str, prefix: str, default_memory_mb: int = 64) -> PersistentCache:
+    """Tạo cache với cấu hình đọc từ env, vd. prefix ANALYSIS_CACHE -> ANALYSIS_CACHE_MAX_MB"""
+    db_path = os.getenv("CACHE_DB_PATH", "cache.db")
+    return PersistentCache(
+        name,
+        max_memory_bytes=int(float(os.getenv(f"{prefix}_MAX_MB", str(default_memory_mb))) * 1024 * 1024),
+        ttl_seconds=float(os.getenv(f"{prefix}_TTL_SECONDS", "0")),
+        db_path=db_path or None,
+        max_disk_entries=int(os.getenv(f"{prefix}_MAX_DISK_ENTRIES", "10000")),
+    )
+
+
+def content_hash(data) -> str:
+    """SHA-256 hex của bytes/str"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def analysis_cache_key(cv_text: str, model: str, job_description: str, prompt_version: str) -> str:
+    """
+    Key content-addressed cho 1 lần phân tích: hash(text CV) + model + hash(JD) + version prompt.
+    Cùng CV, cùng JD, cùng model và prompt -> cùng key, bất kể tên file hay endpoint.
+    """
+    parts = [
+        prompt_version,
+        model,
+        content_hash(cv_text.strip()),
+        content_hash(job_description.strip()),
+    ]
+    return content_hash("|".join(parts))
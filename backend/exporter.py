@@ -0,0 +1,273 @@
+"""
+Export kết quả phân tích ra XLSX / CSV / Parquet dạng stream.
+
+- XLSX: openpyxl write-only (không giữ toàn bộ workbook trong memory),
+  độ rộng cột tính 1 lần từ header + WIDTH_SAMPLE_ROWS dòng đầu,
+  bytes được đẩy ra client ngay khi zip được ghi.
+- CSV: ghi và stream từng dòng.
+- Parquet: cần pyarrow (tùy chọn), ghi theo row group.
+"""
+import io
+import csv
+import asyncio
+import tempfile
+import threading
+from itertools import chain, islice
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional
+
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# (header, field, kiểu) - field là list thì join bằng ", "
+EXPORT_COLUMNS = [
+    ("Tên", "name", str),
+    ("Email", "email", str),
+    ("Phone", "phone", str),
+    ("Điểm Tổng", "overall_score", int),
+    ("Skills Score", "skills_score", int),
+    ("Experience Score", "experience_score", int),
+    ("Education Score", "education_score", int),
+    ("Match %", "match_percentage", int),
+    ("Skills", "skills", list),
+    ("Red Flags", "red_flags", list),
+    ("Salary Range", "salary_range", str),
+]
+
+MAX_COLUMN_WIDTH = 50
+WIDTH_SAMPLE_ROWS = 500
+CHUNK_SIZE = 64 * 1024
+# Số chunk tối đa đã tạo nhưng client chưa nhận (thread tạo file chờ khi đầy)
+MAX_PENDING_CHUNKS = 16
+# Chu kỳ (giây) thread tạo file kiểm tra client ngắt kết nối khi chờ chỗ trống
+QUEUE_POLL_SECONDS = 0.5
+
+
+class ExportCancelled(IOError):
+    """Client ngắt kết nối khi đang export, dừng tạo file"""
+
+    def __init__(self):
+        super().__init__("Client đã ngắt kết nối")
+
+
+def iter_rows(results: Iterable[dict], cancelled: Optional[threading.Event] = None) -> Iterator[tuple]:
+    """Chuyển từng result ({"analysis": {...}}) thành 1 dòng export, dừng khi cancelled được set"""
+    for result in results:
+        if cancelled is not None and cancelled.is_set():
+            raise ExportCancelled()
+        analysis = result.get("analysis") or {}
+        row = []
+        for _, field, kind in EXPORT_COLUMNS:
+            value = analysis.get(field)
+            if kind is list:
+                row.append(", ".join(str(item) for item in value or []))
+            elif kind is int:
+                row.append(value or 0)
+            else:
+                row.append(value or "")
+        yield tuple(row)
+
+
+def stream_csv(results: Iterable[dict]) -> Iterator[bytes]:
+    """Stream CSV (UTF-8 BOM để Excel đọc đúng tiếng Việt)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow([header for header, _, _ in EXPORT_COLUMNS])
+
+    for row in iter_rows(results):
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _LoopChannel:
+    """
+    Chuyển item từ thread tạo file sang event loop (call_soon_threadsafe vào asyncio.Queue):
+    bên đọc không cần thread riêng, tối đa MAX_PENDING_CHUNKS item chưa được đọc.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, cancelled: threading.Event):
+        self._loop = loop
+        self._cancelled = cancelled
+        self._items: asyncio.Queue = asyncio.Queue()
+        self._slots = threading.Semaphore(MAX_PENDING_CHUNKS)
+
+    def put(self, item: Any) -> None:
+        """Gọi từ thread tạo file: chờ chỗ trống rồi đẩy item, bỏ qua nếu client đã ngắt kết nối"""
+        while not self._cancelled.is_set():
+            if not self._slots.acquire(timeout=QUEUE_POLL_SECONDS):
+                continue
+            try:
+                self._loop.call_soon_threadsafe(self._items.put_nowait, item)
+            except RuntimeError:
+                # Event loop đã đóng
+                self._cancelled.set()
+            return
+
+    async def get(self) -> Any:
+        item = await self._items.get()
+        self._slots.release()
+        return item
+
+
+class _QueueWriter(io.RawIOBase):
+    """File-like chỉ ghi, đẩy từng chunk bytes vào channel (không seek được -> zip ghi dạng stream)"""
+
+    def __init__(self, chunks: _LoopChannel, cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self._cancelled.is_set():
+            raise ExportCancelled()
+        self._buffer += data
+        if len(self._buffer) >= CHUNK_SIZE:
+            self.put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def put(self, item) -> None:
+        """Đẩy item vào channel, bỏ qua nếu client đã ngắt kết nối"""
+        self._chunks.put(item)
+
+    def close(self) -> None:
+        if not self.closed and self._buffer:
+            self.put(bytes(self._buffer))
+            self._buffer.clear()
+        super().close()
+
+
+def _write_xlsx(rows: Iterator[tuple], output) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    headers = [header for header, _, _ in EXPORT_COLUMNS]
+
+    # Độ rộng cột: 1 lượt qua header + các dòng đầu, sau đó stream phần còn lại
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+    widths = [len(header) for header in headers]
+    for row in sample:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(str(value)))
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("CV Analysis Results")
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+    # Style header
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in chain(sample, rows):
+        ws.append(row)
+
+    wb.save(output)
+
+
+async def stream_xlsx(results: Iterable[dict]) -> AsyncIterator[bytes]:
+    """
+    Tạo XLSX trong thread riêng của mỗi export (không chiếm default executor mà to_thread của app dùng)
+    và stream bytes ra ngay khi được ghi.
+    Khi client ngắt kết nối (generator bị đóng), thread tạo file dừng ở dòng / chunk tiếp theo
+    hoặc sau tối đa QUEUE_POLL_SECONDS nếu đang chờ chỗ trống.
+    """
+    cancelled = threading.Event()
+    chunks = _LoopChannel(asyncio.get_running_loop(), cancelled)
+    done = object()
+
+    def produce() -> None:
+        writer = _QueueWriter(chunks, cancelled)
+        try:
+            _write_xlsx(iter_rows(results, cancelled), writer)
+            writer.close()
+            writer.put(done)
+        except BaseException as e:
+            writer.put(e)
+
+    threading.Thread(target=produce, name="export-xlsx", daemon=True).start()
+    try:
+        while True:
+            item = await chunks.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+def write_parquet(results: Iterable[dict], batch_size: int = 1000):
+    """Ghi Parquet ra file tạm theo từng row group, trả về file đã seek(0). Cần pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (header, pa.int64() if kind is int else pa.string())
+        for header, _, kind in EXPORT_COLUMNS
+    ])
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    with pq.ParquetWriter(output, schema) as writer:
+        rows = iter_rows(results)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+    output.seek(0)
+    return output
+
+
+def stream_file(file, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Đọc file theo chunk rồi đóng"""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+def warm_up() -> None:
+    """Import sẵn openpyxl (writer write-only) để lần export đầu không phải chờ import"""
+    from openpyxl import Workbook
+
+    Workbook(write_only=True).create_sheet()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,247 @@
+"""
+Extract text từ CV (PDF, DOCX, TXT).
+
+Parse PDF/DOCX là CPU-bound nên chạy trong process pool riêng,
+không block event loop của uvicorn.
+PDF nhiều trang được chia theo khoảng trang chạy song song trên các process,
+dừng sớm khi đã đủ PDF_MAX_CHARS ký tự (phần thừa cũng bị cắt khi compaction).
+"""
+import io
+import os
+import math
+import asyncio
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Số process mặc định tối đa khi không set EXTRACTION_WORKERS (mỗi process import PyPDF2 / python-docx lúc warm-up)
+MAX_DEFAULT_WORKERS = 4
+_CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus() -> int:
+    """
+    Số CPU process được dùng: CPU affinity, giới hạn thêm bởi CPU quota của cgroup v2 nếu có
+    (trong container os.cpu_count() trả về số CPU của host)
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open(_CGROUP_CPU_MAX) as file:
+            quota, period = file.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+# Số process dùng để parse file (0 = chạy trong thread, không dùng process pool)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(available_cpus(), MAX_DEFAULT_WORKERS))))
+# Thời gian chờ tối đa (giây) cho mỗi tài liệu (chỉ dừng chờ, không dừng process đang parse)
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "30"))
+# Số trang PDF tối đa được đọc
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "30"))
+# Dừng đọc PDF khi đã đủ số ký tự này (0 = không giới hạn)
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "60000"))
+# Số trang mỗi task khi extract PDF song song
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+# Ký tự ngăn cách các trang PDF trong text (để compaction nhận ra header/footer, số trang)
+PAGE_BREAK = "\f"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def start_pool() -> None:
+    """Tạo process pool (gọi khi app startup)"""
+    global _executor
+    if _executor is None and EXTRACTION_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+
+
+def _warm_worker() -> int:
+    """Import sẵn thư viện parse PDF / DOCX trong process hiện tại"""
+    from PyPDF2 import PdfReader  # noqa: F401
+    from docx import Document
+
+    Document()
+    return os.getpid()
+
+
+async def warm_pool() -> int:
+    """
+    Tạo sẵn các process của pool (ProcessPoolExecutor chỉ tạo process khi có task)
+    và import PyPDF2 / python-docx trong từng process. Trả về số process đã warm.
+    """
+    if _executor is None:
+        await asyncio.to_thread(_warm_worker)
+        return 0
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(*[
+        loop.run_in_executor(_executor, _warm_worker) for _ in range(EXTRACTION_WORKERS)
+    ])
+    return len(set(pids))
+
+
+def shutdown_pool() -> None:
+    """Đóng process pool (gọi khi app shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_text(
+    filename: str,
+    content: Optional[bytes] = None,
+    path: Optional[str] = None,
+) -> str:
+    """
+    Extract text 1 file trong process pool, có timeout.
+    Timeout chỉ dừng việc chờ: process đang parse (vd. PDF làm PyPDF2 bị treo) vẫn chạy tiếp
+    tới khi xong và chiếm 1 slot của pool trong thời gian đó (ProcessPoolExecutor không hủy được task đang chạy).
+    Truyền content (bytes) hoặc path (file tạm của upload, process con tự đọc file - không copy bytes qua IPC).
+    """
+    if filename.endswith('.txt'):
+        return extract_cv_text(filename, content, path)
+
+    if filename.endswith('.pdf'):
+        future = extract_pdf_parallel(content, path)
+    elif _executor is None:
+        future = asyncio.to_thread(extract_cv_text, filename, content, path)
+    else:
+        future = asyncio.get_running_loop().run_in_executor(_executor, extract_cv_text, filename, content, path)
+
+    try:
+        return await asyncio.wait_for(future, timeout=EXTRACTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Quá thời gian extract file {filename} ({EXTRACTION_TIMEOUT:.0f}s)")
+
+
+async def extract_pdf_parallel(
+    content: Optional[bytes] = None,
+    path: Optional[str] = None,
+    max_pages: int = PDF_MAX_PAGES,
+    max_chars: int = PDF_MAX_CHARS,
+) -> str:
+    """
+    Extract PDF theo khoảng trang trên process pool.
+    Task đầu đọc PDF_PAGES_PER_TASK trang và trả về tổng số trang; nếu chưa đủ ký tự thì
+    các khoảng trang còn lại chạy song song theo từng đợt (mỗi đợt = số process), dừng khi đủ.
+    Không có path thì bytes được gửi kèm mỗi task (vài trăm KB, rẻ so với thời gian parse trang).
+    """
+    loop = asyncio.get_running_loop()
+
+    def run(start: int, stop: int, budget: int):
+        args = (content, path, start, stop, budget)
+        if _executor is None:
+            return asyncio.to_thread(extract_pdf_pages, *args)
+        return loop.run_in_executor(_executor, extract_pdf_pages, *args)
+
+    if _executor is None:
+        _, pages = await run(0, max_pages, max_chars)
+        return PAGE_BREAK.join(pages)
+
+    page_count, pages = await run(0, min(PDF_PAGES_PER_TASK, max_pages), max_chars)
+    page_count = min(page_count, max_pages)
+    chars = sum(len(page) for page in pages)
+    next_page = PDF_PAGES_PER_TASK
+
+    while next_page < page_count and not (max_chars and chars >= max_chars):
+        ranges = []
+        for _ in range(max(1, EXTRACTION_WORKERS)):
+            if next_page >= page_count:
+                break
+            ranges.append((next_page, min(next_page + PDF_PAGES_PER_TASK, page_count)))
+            next_page += PDF_PAGES_PER_TASK
+        remaining = max_chars - chars if max_chars else 0
+        for _, wave_pages in await asyncio.gather(*[run(start, stop, remaining) for start, stop in ranges]):
+            pages.extend(wave_pages)
+            chars += sum(len(page) for page in wave_pages)
+
+    return PAGE_BREAK.join(pages)
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hóa text sau khi extract (unicode NFC, xuống dòng, khoảng trắng cuối dòng), giữ PAGE_BREAK"""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    pages = text.split(PAGE_BREAK)
+    return PAGE_BREAK.join(
+        "\n".join(line.rstrip() for line in page.strip("\n").split("\n")) for page in pages
+    ).strip()
+
+
+def extract_cv_text(filename: str, content: Optional[bytes] = None, path: Optional[str] = None) -> str:
+    """Extract text từ file theo định dạng (PDF, DOCX, TXT), đọc từ bytes hoặc từ path"""
+    if path is None:
+        return _extract_stream(filename, io.BytesIO(content))
+
+    # Parser đọc thẳng từ file (seek theo nhu cầu), không load cả file vào memory
+    with open(path, "rb") as file:
+        return _extract_stream(filename, file)
+
+
+def _extract_stream(filename: str, stream) -> str:
+    if filename.endswith('.txt'):
+        return stream.read().decode('utf-8')
+    elif filename.endswith('.pdf'):
+        return extract_text_from_pdf(stream)
+    elif filename.endswith('.docx'):
+        return extract_text_from_docx(stream)
+    raise ValueError(f"Định dạng file không hỗ trợ: {filename}")
+
+
+def extract_text_from_pdf(content, max_pages: int = PDF_MAX_PAGES, max_chars: int = PDF_MAX_CHARS) -> str:
+    """Extract text từ PDF (tối đa max_pages trang / max_chars ký tự). content: bytes hoặc file-like"""
+    from PyPDF2 import PdfReader
+
+    pdf_file = content if hasattr(content, "read") else io.BytesIO(content)
+    reader = PdfReader(pdf_file)
+    return PAGE_BREAK.join(_read_pages(reader, 0, max_pages, max_chars))
+
+
+def extract_pdf_pages(
+    content: Optional[bytes],
+    path: Optional[str],
+    start: int,
+    stop: int,
+    max_chars: int = 0,
+) -> tuple[int, list[str]]:
+    """Extract các trang [start, stop) của PDF (chạy trong process con). Trả về (tổng số trang, text từng trang)"""
+    from PyPDF2 import PdfReader
+
+    if path is None:
+        reader = PdfReader(io.BytesIO(content))
+        return len(reader.pages), _read_pages(reader, start, stop, max_chars)
+
+    with open(path, "rb") as file:
+        reader = PdfReader(file)
+        return len(reader.pages), _read_pages(reader, start, stop, max_chars)
+
+
+def _read_pages(reader, start: int, stop: int, max_chars: int) -> list[str]:
+    """Đọc text từng trang, dừng khi đủ max_chars"""
+    pages = []
+    chars = 0
+    for index in range(start, min(stop, len(reader.pages))):
+        text = reader.pages[index].extract_text() or ""
+        pages.append(text)
+        chars += len(text)
+        if max_chars and chars >= max_chars:
+            break
+    return pages
+
+
+def extract_text_from_docx(content) -> str:
+    """Extract text từ DOCX. content: bytes hoặc file-like"""
+    from docx import Document
+
+    docx_file = content if hasattr(content, "read") else io.BytesIO(content)
+    doc = Document(docx_file)
+
+    text = ""
+    for paragraph in doc.paragraphs:
+        text += paragraph.text + "\n"
+
+    return text
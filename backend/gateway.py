@@ -0,0 +1,315 @@
+"""
+Provider gateway đứng trước các lời gọi AI API.
+
+- Token bucket rate limit theo provider/model
+- Retry với exponential backoff + jitter, tôn trọng header Retry-After
+- Circuit breaker: fail fast khi provider lỗi liên tục (5xx / lỗi kết nối);
+  429 chỉ là provider đang throttle nên chỉ backoff, không tính là lỗi
+"""
+import os
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import httpx
+
+import http_client
+import telemetry
+
+log = telemetry.get_logger("gateway")
+RETRIES = telemetry.counter("cv_provider_retries_total", "Số lần retry lời gọi provider", ("provider", "reason"))
+
+# Số request/phút cho mỗi model của provider
+RATE_LIMITS_PER_MINUTE = {
+    "gemini": float(os.getenv("GEMINI_RATE_PER_MIN", "60")),
+    "claude": float(os.getenv("CLAUDE_RATE_PER_MIN", "50")),
+    "openrouter": float(os.getenv("OPENROUTER_RATE_PER_MIN", "60")),
+}
+MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "30"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Status được tính là lỗi của provider cho circuit breaker (429 không tính)
+FAILURE_STATUS = {500, 502, 503, 504}
+
+# Callback gọi mỗi khi request được gửi đi (sau khi đã có token của rate limiter),
+# routing dùng để chỉ tính thời gian của provider, không tính thời gian chờ phía app
+on_send: ContextVar[Optional[Callable[[], None]]] = ContextVar("on_send", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Provider đang bị ngắt mạch, không gửi request"""
+
+    def __init__(self, key: str, retry_in: float):
+        self.key = key
+        self.retry_in = retry_in
+        super().__init__(f"{key} tạm thời không khả dụng, thử lại sau {retry_in:.0f}s")
+
+
+class TokenBucket:
+    """Token bucket: rate token/giây, tối đa capacity token"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        """Không cấp token trong `seconds` giây (provider trả 429 kèm Retry-After)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """Chờ tới khi có token"""
+        async with self._lock:
+            while (wait := self.paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class CircuitBreaker:
+    """
+    closed -> open sau N lỗi liên tiếp -> half_open sau reset_seconds -> closed khi thành công.
+    Ở half_open chỉ 1 request thử được gửi; nếu request thử không báo kết quả
+    (vd. bị hủy) thì sau reset_seconds cho phép request thử khác.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def check(self, key: str) -> None:
+        """Raise CircuitOpenError nếu đang open, hoặc half_open và đã có request thử đang chạy"""
+        state = self.state
+        now = time.monotonic()
+        if state == "open":
+            raise CircuitOpenError(key, self.reset_seconds - (now - self.opened_at))
+        if state == "half_open":
+            if self.probe_at is not None and now - self.probe_at < self.reset_seconds:
+                raise CircuitOpenError(key, self.reset_seconds - (now - self.probe_at))
+            self.probe_at = now
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_at = None
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def record_throttled(self) -> None:
+        """429: không đổi trạng thái, chỉ trả lại lượt thử của half_open"""
+        self.probe_at = None
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _bucket(provider: str, model: str) -> TokenBucket:
+    key = f"{provider}:{model}"
+    if key not in _buckets:
+        per_minute = RATE_LIMITS_PER_MINUTE.get(provider, 60)
+        _buckets[key] = TokenBucket(rate=per_minute / 60, capacity=max(1, per_minute / 6))
+    return _buckets[key]
+
+
+def _breaker(provider: str, model: str) -> CircuitBreaker:
+    key = f"{provider}:{model}"
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+    return _breakers[key]
+
+
+def provider_for_model(model: str) -> str:
+    """Lấy tên provider từ model id"""
+    if model.startswith("gemini"):
+        return "gemini"
+    if model.startswith("claude"):
+        return "claude"
+    if model.startswith("openrouter"):
+        return "openrouter"
+    return model
+
+
+def circuit_state(provider: str, model: str) -> str:
+    """Trạng thái circuit breaker của provider/model (closed nếu chưa gọi lần nào)"""
+    breaker = _breakers.get(f"{provider}:{model}")
+    return breaker.state if breaker else "closed"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Đọc Retry-After (số giây hoặc HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff với full jitter; ưu tiên Retry-After nếu provider gửi"""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def log_retry(provider: str, key: str, reason: str, attempt: int, delay: float) -> None:
+    RETRIES.inc(provider=provider, reason=reason)
+    log.warning("Provider retry", extra={
+        "key": key, "reason": reason, "attempt": attempt + 1, "max_retries": MAX_RETRIES, "delay": round(delay, 1)
+    })
+
+
+def _record_retryable(response: httpx.Response, breaker: CircuitBreaker, bucket: TokenBucket, attempt: int) -> float:
+    """
+    Ghi nhận response lỗi có thể retry, trả về thời gian chờ trước lần thử tiếp.
+    5xx tính là lỗi cho circuit breaker; 429 chỉ backoff, nếu có Retry-After thì
+    tạm dừng cấp token để các request khác tới cùng provider/model cũng chờ.
+    """
+    retry_after = parse_retry_after(response.headers.get("retry-after"))
+    if response.status_code in FAILURE_STATUS:
+        breaker.record_failure()
+    else:
+        breaker.record_throttled()
+        if retry_after is not None:
+            bucket.pause(min(retry_after, BACKOFF_MAX))
+    return backoff_delay(attempt, retry_after)
+
+
+def _notify_send() -> None:
+    callback = on_send.get()
+    if callback is not None:
+        callback()
+
+
+async def post(provider: str, model: str, url: str, **kwargs) -> httpx.Response:
+    """
+    POST tới provider qua rate limiter + retry + circuit breaker.
+    Trả về response cuối cùng (caller tự xử lý status khác 200).
+    """
+    key = f"{provider}:{model}"
+    bucket = _bucket(provider, model)
+    breaker = _breaker(provider, model)
+    client = http_client.get_client(provider)
+
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check(key)
+        await bucket.acquire()
+        _notify_send()
+
+        try:
+            response = await client.post(url, **kwargs)
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            log_retry(provider, key, type(e).__name__, attempt, delay)
+            await asyncio.sleep(delay)
+            continue
+
+        if response.status_code not in RETRYABLE_STATUS:
+            breaker.record_success()
+            return response
+
+        delay = _record_retryable(response, breaker, bucket, attempt)
+        if attempt == MAX_RETRIES:
+            return response
+        log_retry(provider, key, f"HTTP {response.status_code}", attempt, delay)
+        await asyncio.sleep(delay)
+
+    return response
+
+
+@asynccontextmanager
+async def stream(provider: str, model: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """
+    Giống post nhưng mở response dạng stream (đọc body dần bằng aiter_lines / aiter_bytes).
+    Chỉ retry trước khi nhận body; response được đóng khi thoát context.
+    """
+    key = f"{provider}:{model}"
+    bucket = _bucket(provider, model)
+    breaker = _breaker(provider, model)
+    client = http_client.get_client(provider)
+
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check(key)
+        await bucket.acquire()
+        _notify_send()
+
+        try:
+            response = await client.send(client.build_request("POST", url, **kwargs), stream=True)
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            log_retry(provider, key, type(e).__name__, attempt, delay)
+            await asyncio.sleep(delay)
+            continue
+
+        if response.status_code not in RETRYABLE_STATUS:
+            breaker.record_success()
+            break
+
+        delay = _record_retryable(response, breaker, bucket, attempt)
+        if attempt == MAX_RETRIES:
+            break
+        await response.aclose()
+        log_retry(provider, key, f"HTTP {response.status_code}", attempt, delay)
+        await asyncio.sleep(delay)
+
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+def status() -> dict:
+    """Trạng thái circuit breaker và rate limiter theo provider/model"""
+    return {
+        key: {
+            "circuit": breaker.state,
+            "consecutive_failures": breaker.failures,
+            "tokens_available": round(_buckets[key].tokens, 2) if key in _buckets else None,
+        }
+        for key, breaker in _breakers.items()
+    }
@@ -0,0 +1,85 @@
+"""
+Shared async HTTP client cho các AI provider.
+
+Mỗi provider có một httpx.AsyncClient riêng (connection pool keep-alive),
+được tạo khi app start và đóng khi app shutdown.
+"""
+import os
+import asyncio
+from typing import Dict, Optional
+
+import httpx
+
+# Base URL có thể override bằng env để trỏ tới stub provider local khi test
+PROVIDER_BASE_URLS = {
+    "gemini": os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com"),
+    "claude": os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com"),
+    "openrouter": os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api"),
+}
+
+HTTP_TIMEOUT = float(os.getenv("AI_HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "10"))
+# Timeout khi mở sẵn kết nối lúc warm-up
+WARMUP_CONNECT_TIMEOUT = float(os.getenv("WARMUP_CONNECT_TIMEOUT", "5"))
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_transports: Dict[str, httpx.AsyncBaseTransport] = {}
+
+
+def set_transport(provider: str, transport: Optional[httpx.AsyncBaseTransport]) -> None:
+    """Thay transport của provider (vd. httpx.MockTransport làm stub provider khi test)"""
+    if transport is None:
+        _transports.pop(provider, None)
+    else:
+        _transports[provider] = transport
+    # Client cũ sẽ được tạo lại với transport mới ở lần gọi sau
+    _clients.pop(provider, None)
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """Lấy (hoặc tạo lazy) client dùng chung của provider"""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=PROVIDER_BASE_URLS[provider],
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+            transport=_transports.get(provider),
+        )
+        _clients[provider] = client
+    return client
+
+
+def open_clients() -> None:
+    """Tạo sẵn client cho tất cả provider (gọi khi app startup)"""
+    for provider in PROVIDER_BASE_URLS:
+        get_client(provider)
+
+
+async def warm_up(providers: list[str]) -> list[str]:
+    """
+    Mở sẵn kết nối (DNS + TLS) tới các provider, kết nối được giữ lại trong pool keep-alive
+    nên request AI đầu tiên không phải bắt tay lại. Trả về các provider kết nối được.
+    """
+    async def connect(provider: str) -> bool:
+        try:
+            await get_client(provider).head("/", timeout=WARMUP_CONNECT_TIMEOUT)
+            return True
+        except Exception:
+            # Chỉ là tối ưu, lỗi kết nối sẽ được xử lý ở request thật
+            return False
+
+    results = await asyncio.gather(*[connect(provider) for provider in providers])
+    return [provider for provider, ok in zip(providers, results) if ok]
+
+
+async def close_clients() -> None:
+    """Đóng toàn bộ client (gọi khi app shutdown)"""
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
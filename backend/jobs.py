@@ -0,0 +1,305 @@
+"""
+Job queue chạy nền cho các đợt screening lớn (hàng trăm CV).
+
+Job và từng file được lưu trong SQLite nên worker tự chạy tiếp sau khi restart.
+Nhiều uvicorn worker có thể dùng chung DB, item được claim trong transaction và
+ghi lại worker đang giữ (owner) + thời điểm gia hạn claim gần nhất; worker gia hạn claim
+của mình định kỳ, item có claim quá hạn (worker chết / restart) được đưa lại hàng đợi.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import threading
+from typing import Awaitable, Callable, Iterator, Optional
+
+import telemetry
+
+log = telemetry.get_logger("jobs")
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+# Số CV tối đa mỗi job
+JOB_MAX_FILES = int(os.getenv("JOB_MAX_FILES", "500"))
+# Số CV xử lý song song trong worker nền
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "5"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Claim không được gia hạn sau số giây này thì item được đưa lại hàng đợi
+JOB_CLAIM_TIMEOUT = float(os.getenv("JOB_CLAIM_TIMEOUT", "60"))
+# Thời gian chờ tối đa (giây) trước khi worker thử lại sau lỗi DB
+JOB_ERROR_BACKOFF_MAX = 30.0
+
+
+class JobStore:
+    """Lưu job và item trong SQLite"""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH):
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                model TEXT NOT NULL,
+                job_description TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                content BLOB,
+                status TEXT NOT NULL,
+                result TEXT,
+                owner TEXT,
+                claimed_at REAL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status);
+        """)
+        # DB tạo trước khi có owner / claimed_at
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(job_items)")}
+        for column, kind in (("owner", "TEXT"), ("claimed_at", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE job_items ADD COLUMN {column} {kind}")
+
+    def create_job(
+        self,
+        uploads: list[tuple[str, bytes]],
+        model: str,
+        job_description: str,
+        skipped: Optional[dict[int, dict]] = None,
+    ) -> str:
+        """
+        Tạo job mới với trạng thái queued, trả về job id.
+        skipped: {index: result} các file không cần xử lý (vd. không lọt shortlist)
+        """
+        skipped = skipped or {}
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        status = "done" if len(skipped) >= len(uploads) else "queued"
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, model, job_description, total, completed, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, status, model, job_description, len(uploads), len(skipped), now, now)
+                )
+                self._db.executemany(
+                    "INSERT INTO job_items (job_id, idx, filename, content, status, result) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (job_id, idx, filename, None, "skipped", json.dumps(skipped[idx], ensure_ascii=False))
+                        if idx in skipped else
+                        (job_id, idx, filename, content, "pending", None)
+                        for idx, (filename, content) in enumerate(uploads)
+                    ]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def requeue_stale(self, timeout: float = JOB_CLAIM_TIMEOUT) -> int:
+        """Đưa các item running có claim quá hạn (worker đã chết / restart) về lại pending"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE job_items SET status = 'pending', owner = NULL, claimed_at = NULL "
+                "WHERE status = 'running' AND (claimed_at IS NULL OR claimed_at < ?)",
+                (time.time() - timeout,)
+            )
+            return cursor.rowcount
+
+    def renew_claims(self, owner: str) -> int:
+        """Gia hạn claim các item worker owner đang xử lý"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE job_items SET claimed_at = ? WHERE status = 'running' AND owner = ?",
+                (time.time(), owner)
+            )
+            return cursor.rowcount
+
+    def claim_items(self, limit: int, owner: str) -> list[dict]:
+        """Lấy tối đa limit item pending và đánh dấu running bởi owner (atomic giữa các process)"""
+        if limit <= 0:
+            return []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT i.job_id, i.idx, i.filename, i.content, j.model, j.job_description "
+                    "FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                    "WHERE i.status = 'pending' ORDER BY j.created_at, i.idx LIMIT ?",
+                    (limit,)
+                ).fetchall()
+                now = time.time()
+                for row in rows:
+                    self._db.execute(
+                        "UPDATE job_items SET status = 'running', owner = ?, claimed_at = ? WHERE job_id = ? AND idx = ?",
+                        (owner, now, row["job_id"], row["idx"])
+                    )
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                        (now, row["job_id"])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def finish_item(self, job_id: str, idx: int, result: dict, owner: str) -> None:
+        """Lưu kết quả 1 item và cập nhật tiến độ job (bỏ qua nếu claim đã bị worker khác lấy lại)"""
+        failed = "error" in result
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._db.execute(
+                    "UPDATE job_items SET status = ?, result = ?, content = NULL, owner = NULL "
+                    "WHERE job_id = ? AND idx = ? AND status = 'running' AND owner = ?",
+                    ("error" if failed else "done", json.dumps(result, ensure_ascii=False), job_id, idx, owner)
+                )
+                if cursor.rowcount:
+                    self._db.execute(
+                        "UPDATE jobs SET completed = completed + ?, failed = failed + ?, updated_at = ?, "
+                        "status = CASE WHEN completed + failed + 1 >= total THEN 'done' ELSE status END "
+                        "WHERE id = ?",
+                        (0 if failed else 1, 1 if failed else 0, time.time(), job_id)
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Thông tin job và tiến độ"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, model, total, completed, failed, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["processed"] = job["completed"] + job["failed"]
+        job["progress"] = round(job["processed"] / job["total"], 4) if job["total"] else 1.0
+        return job
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 50) -> list[dict]:
+        """Kết quả của job theo thứ tự input, có phân trang"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, filename, status, result FROM job_items WHERE job_id = ? "
+                "ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        results = []
+        for row in rows:
+            item = {"index": row["idx"], "filename": row["filename"], "status": row["status"]}
+            if row["result"]:
+                item.update(json.loads(row["result"]))
+            results.append(item)
+        return results
+
+    def iter_results(self, job_id: str, batch_size: int = 200) -> Iterator[dict]:
+        """Duyệt toàn bộ kết quả của job theo từng trang (dùng cho export, không load hết vào memory)"""
+        last_idx = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT idx, filename, status, result FROM job_items "
+                    "WHERE job_id = ? AND idx > ? ORDER BY idx LIMIT ?",
+                    (job_id, last_idx, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                item = {"index": row["idx"], "filename": row["filename"], "status": row["status"]}
+                if row["result"]:
+                    item.update(json.loads(row["result"]))
+                yield item
+            last_idx = rows[-1]["idx"]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def worker_id() -> str:
+    """Id duy nhất của 1 worker (host, pid và suffix ngẫu nhiên)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def run_worker(
+    store: JobStore,
+    process: Callable[[str, bytes, str, str], Awaitable[dict]],
+    wake_event: asyncio.Event,
+    concurrency: int = JOB_CONCURRENCY,
+    poll_interval: float = JOB_POLL_INTERVAL,
+    claim_timeout: float = JOB_CLAIM_TIMEOUT,
+) -> None:
+    """
+    Vòng lặp worker nền: claim item pending, xử lý song song tối đa concurrency item.
+    process(filename, content, model, job_description) trả về dict result hoặc {"error": ...}
+    Claim được gia hạn mỗi claim_timeout / 4 giây; item của worker khác quá hạn được đưa lại hàng đợi.
+    Lỗi (vd. sqlite3.OperationalError khi DB bị khóa) được log và thử lại sau backoff, worker không dừng.
+    Các thao tác DB chạy trong thread (có thể chờ khóa ghi tới busy timeout), không chặn event loop.
+    """
+    owner = worker_id()
+
+    async def run_item(item: dict) -> None:
+        try:
+            result = await process(item["filename"], item["content"], item["model"], item["job_description"])
+        except Exception as e:
+            result = {"filename": item["filename"], "error": str(e)}
+        try:
+            await asyncio.to_thread(store.finish_item, item["job_id"], item["idx"], result, owner)
+        except sqlite3.Error:
+            # Claim hết hạn và item được xử lý lại sau
+            log.exception("Saving job item failed", extra={"job_id": item["job_id"], "index": item["idx"]})
+
+    running: set[asyncio.Task] = set()
+    maintained_at = 0.0
+    errors = 0
+    try:
+        while True:
+            try:
+                if time.monotonic() - maintained_at >= claim_timeout / 4:
+                    await asyncio.to_thread(store.renew_claims, owner)
+                    requeued = await asyncio.to_thread(store.requeue_stale, claim_timeout)
+                    if requeued:
+                        log.info("Requeued stale job items", extra={"requeued": requeued})
+                    maintained_at = time.monotonic()
+
+                for item in await asyncio.to_thread(store.claim_items, concurrency - len(running), owner):
+                    running.add(asyncio.create_task(run_item(item)))
+                errors = 0
+            except Exception as e:
+                errors += 1
+                delay = min(JOB_ERROR_BACKOFF_MAX, poll_interval * 2 ** min(errors, 10))
+                log.error("Job worker error", extra={"error": str(e), "retry_in": delay}, exc_info=True)
+                await asyncio.sleep(delay)
+                continue
+
+            if running:
+                _, running = await asyncio.wait(
+                    running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+            else:
+                # Chờ job mới hoặc poll lại (job có thể được submit từ worker process khác)
+                try:
+                    await asyncio.wait_for(wake_event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake_event.clear()
+    finally:
+        for task in running:
+            task.cancel()
@@ -1,19 +1,92 @@
+import time
+# Đo thời gian import app (báo cáo ở /ready)
+_IMPORT_START = time.perf_counter()
+
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
 import json
-import requests
-import hashlib
-from typing import Dict
+import httpx
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Union
 
 load_dotenv()
 
-app = FastAPI(title="CV Analyzer API")
+import http_client
+import extraction
+import jobs
+import text_compaction
+import response_parsing
+import gateway
+import routing
+import scoring
+import packing
+import streaming
+import telemetry
+import exporter
+import upload_stream
+import warmup
+from upload_stream import SpooledUpload
+from singleflight import SingleFlight
+from search_index import CandidateIndex
+from cache import cache_from_env, analysis_cache_key, content_hash
+
+telemetry.setup_logging()
+log = telemetry.get_logger("api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    # Tạo connection pool cho các provider + process pool extract khi start, đóng khi shutdown
+    http_client.open_clients()
+    extraction.start_pool()
+    # model=auto chỉ dùng provider đã có API key
+    routing.set_providers(configured_providers())
+    # Worker nền xử lý job queue (tự resume các job dở dang)
+    job_worker = asyncio.create_task(
+        jobs.run_worker(job_store, analyze_job_item, job_wake_event)
+    )
+    # Warm-up chạy nền: server nhận request ngay, /ready báo 503 tới khi xong
+    warmup_task = asyncio.create_task(warmup.run(configured_providers()))
+    warmup.mark_started(time.perf_counter() - start)
+    yield
+    warmup_task.cancel()
+    job_worker.cancel()
+    await http_client.close_clients()
+    extraction.shutdown_pool()
+    analysis_cache.close()
+    text_cache.close()
+    analysis_singleflight.close()
+    candidate_index.close()
+    job_store.close()
+
+app = FastAPI(title="CV Analyzer API", lifespan=lifespan)
+
+# Cache để lưu kết quả phân tích (LRU trong memory + SQLite dùng chung giữa các worker)
+analysis_cache = cache_from_env("analysis", "ANALYSIS_CACHE")
+# Cache text đã extract, key theo hash nội dung file -> đổi model/JD không phải parse lại
+text_cache = cache_from_env("text", "TEXT_CACHE", default_memory_mb=32)
 
-# Cache để lưu kết quả phân tích
-analysis_cache: Dict[str, dict] = {}
+# Gộp các request phân tích trùng nhau đang chạy (lease dùng chung file SQLite với cache)
+analysis_singleflight = SingleFlight(os.getenv("CACHE_DB_PATH", "cache.db") or None)
+
+# Index tìm kiếm ứng viên trên các kết quả đã phân tích
+candidate_index = CandidateIndex()
+
+# Job queue cho screening lớn (SQLite)
+job_store = jobs.JobStore()
+job_wake_event = asyncio.Event()
+
+# Tăng version mỗi khi sửa prompt (ANALYSIS_INSTRUCTIONS*) để cache cũ tự hết hiệu lực
+PROMPT_VERSION = "v2"
+# Version của prompt phân tích JD (analyze_job_description)
+JD_PROMPT_VERSION = "jd-v1"
+# Số token output tối đa mỗi CV
+MAX_OUTPUT_TOKENS = int(os.getenv("MAX_OUTPUT_TOKENS", "2048"))
 
 # CORS middleware để frontend có thể gọi API
 app.add_middleware(
@@ -24,12 +97,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Giới hạn kích thước body mỗi request (từ chối sớm upload quá lớn)
+app.add_middleware(upload_stream.RequestSizeLimitMiddleware)
+
+# Request id, latency mỗi request, log/profile request chậm (ngoài cùng để đo cả các middleware khác)
+app.add_middleware(telemetry.TelemetryMiddleware)
+
 # API keys
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
 if not GOOGLE_API_KEY:
-    print("WARNING: GOOGLE_API_KEY not found in .env file!")
+    log.warning("GOOGLE_API_KEY not found in .env file!")
+
+def configured_providers() -> list[str]:
+    """Các provider đã có API key (được mở sẵn kết nối khi warm-up)"""
+    keys = {
+        "gemini": GOOGLE_API_KEY,
+        "claude": os.getenv("ANTHROPIC_API_KEY"),
+        "openrouter": OPENROUTER_API_KEY,
+    }
+    return [provider for provider, key in keys.items() if key and not key.startswith("your_")]
+
+# Giới hạn số request AI chạy đồng thời cho mỗi provider khi batch
+PROVIDER_CONCURRENCY = {
+    "gemini": int(os.getenv("GEMINI_CONCURRENCY", "5")),
+    "claude": int(os.getenv("CLAUDE_CONCURRENCY", "3")),
+    "openrouter": int(os.getenv("OPENROUTER_CONCURRENCY", "3")),
+}
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+# Model nhận từ tham số ?model= của các endpoint (kể cả model trong AUTO_MODELS).
+# Model lạ bị từ chối trước khi tạo metrics, semaphore, thống kê routing / compaction theo tên model
+SUPPORTED_MODELS = {
+    routing.AUTO_MODEL,
+    "gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-pro",
+    "claude-sonnet",
+    "openrouter-claude", "openrouter-gpt4", "openrouter-llama",
+    *routing.AUTO_MODELS,
+}
+
+def validate_model(model: str) -> None:
+    """HTTP 400 nếu model không nằm trong SUPPORTED_MODELS"""
+    if model not in SUPPORTED_MODELS:
+        raise HTTPException(status_code=400, detail=f"Model không hỗ trợ: {model}")
+
+def get_provider_semaphore(model: str) -> asyncio.Semaphore:
+    """Semaphore giới hạn concurrency theo provider (tạo lazy trong event loop), model phải là model cụ thể"""
+    if model == routing.AUTO_MODEL:
+        raise ValueError("Cần model cụ thể (model=auto được chọn trong routing.route)")
+    provider = gateway.provider_for_model(model)
+    if provider not in _provider_semaphores:
+        _provider_semaphores[provider] = asyncio.Semaphore(PROVIDER_CONCURRENCY.get(provider, 3))
+    return _provider_semaphores[provider]
 
 class CVAnalysisResponse(BaseModel):
     summary: str
@@ -55,6 +175,20 @@ class CVAnalysisResponse(BaseModel):
     missing_skills: list[str] = []
     red_flags: list[str] = []
 
+# Các trường điểm luôn có trong schema trả về (0 khi không có JD), thiếu nghĩa là response không đầy đủ
+ANALYSIS_SCORE_FIELDS = (
+    "overall_score", "skills_score", "experience_score", "education_score", "soft_skills_score", "match_percentage",
+)
+
+class JobRequirements(BaseModel):
+    title: str = ""
+    required_skills: list[str] = []
+    nice_to_have_skills: list[str] = []
+    min_years_experience: float = 0
+    education: str = ""
+    responsibilities: list[str] = []
+    soft_skills: list[str] = []
+
 @app.get("/")
 async def root():
     return {
@@ -62,141 +196,534 @@ async def root():
         "cached_items": len(analysis_cache)
     }
 
+@app.get("/ready")
+async def readiness():
+    """Readiness: 200 khi đã warm-up xong (process extract, parser, kết nối provider), 503 khi đang warm-up"""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.get("/cache/stats")
 async def get_cache_stats():
     """Thống kê cache"""
     return {
         "total_cached": len(analysis_cache),
-        "cache_keys": list(analysis_cache.keys())[:10]  # Show first 10
+        "analysis": analysis_cache.stats(),
+        "text": text_cache.stats(),
+        "singleflight": analysis_singleflight.stats()
     }
 
+@app.get("/providers/status")
+async def get_providers_status():
+    """Trạng thái circuit breaker / rate limit của các provider"""
+    return {"providers": gateway.status(), "models": routing.stats()}
+
+@app.get("/compaction/stats")
+async def get_compaction_stats():
+    """Thống kê token trước/sau khi làm gọn text theo model"""
+    return {"models": text_compaction.get_stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics dạng Prometheus: latency theo request/bước/model, token, bytes, cache hit/miss"""
+    cache_lines = []
+    caches = {"analysis": analysis_cache.stats(), "text": text_cache.stats()}
+    for result, help in (("hits", "Số lần đọc cache có kết quả"), ("misses", "Số lần đọc cache không có kết quả")):
+        cache_lines += telemetry.format_metric(
+            f"cv_cache_{result}_total", "counter", help,
+            {(name,): stats[result] for name, stats in caches.items()}, ("cache",)
+        )
+    return PlainTextResponse(telemetry.render(cache_lines), media_type="text/plain; version=0.0.4")
+
+@app.get("/parsing/stats")
+async def get_parsing_stats():
+    """Thống kê parse response AI: số response phải sửa JSON, thất bại, field bị ép kiểu"""
+    return response_parsing.get_stats()
+
 @app.delete("/cache/clear")
 async def clear_cache():
     """Xóa toàn bộ cache"""
-    global analysis_cache
-    count = len(analysis_cache)
-    analysis_cache = {}
+    count = analysis_cache.clear() + text_cache.clear()
     return {"message": f"Đã xóa {count} items từ cache"}
 
 @app.post("/batch-analyze")
 async def batch_analyze_cvs(
     files: list[UploadFile] = File(...),
     model: str = "gemini-2.0-flash",
-    job_description: str = Form("")
+    job_description: str = Form(""),
+    top_k: int = 0,
+    pack: bool = False
 ):
     """
     Upload nhiều CV cùng lúc và phân tích
+    top_k > 0 (cần JD): chấm điểm sơ bộ local, chỉ top_k CV được gửi tới AI
+    pack=true: gộp nhiều CV ngắn vào 1 request AI (tiết kiệm request/rate limit với model flash)
     """
+    validate_model(model)
     if len(files) > 10:
         raise HTTPException(status_code=400, detail="Tối đa 10 CV mỗi lần")
     
-    results = []
-    
-    for file in files:
-        try:
-            # Đọc file
-            content = await file.read()
-            
-            # Extract text
-            if file.filename.endswith('.txt'):
-                cv_text = content.decode('utf-8')
-            elif file.filename.endswith('.pdf'):
-                cv_text = extract_text_from_pdf(content)
-            elif file.filename.endswith('.docx'):
-                cv_text = extract_text_from_docx(content)
-            else:
-                continue
-            
-            # Phân tích
-            analysis = await analyze_cv_with_ai(cv_text, model, job_description)
-            
-            results.append({
-                "filename": file.filename,
-                "analysis": analysis.dict()
-            })
-            
-        except Exception as e:
-            print(f"Error processing {file.filename}: {e}")
-            results.append({
-                "filename": file.filename,
-                "error": str(e)
-            })
+    # Lấy + hash các file đã spool (nhanh), sau đó extract + phân tích song song
+    uploads = await read_batch_uploads(files)
+    try:
+        prescores, selected = await shortlist_uploads(uploads, job_description, top_k)
+        
+        if pack:
+            results = await analyze_packed_batch(uploads, model, job_description, prescores, selected)
+        else:
+            # Phân tích JD 1 lần cho cả batch, các CV dùng chung bản tóm tắt yêu cầu
+            job_profile = await batch_job_profile(uploads, selected, model, job_description)
+            # gather giữ nguyên thứ tự input, mỗi file tự bắt lỗi riêng
+            results = await asyncio.gather(*[
+                analyze_shortlisted_file(
+                    filename, content, model, job_description, prescores[index], index in selected, job_profile
+                )
+                for index, (filename, content) in enumerate(uploads)
+            ])
+    finally:
+        upload_stream.close_all(uploads)
     
     return {"results": results, "total": len(results)}
 
-@app.post("/export-excel")
-async def export_to_excel(data: dict):
+@app.post("/batch-analyze/stream")
+async def batch_analyze_stream(
+    files: list[UploadFile] = File(...),
+    model: str = "gemini-2.0-flash",
+    job_description: str = Form(""),
+    top_k: int = 0
+):
     """
-    Export kết quả batch analysis ra Excel
+    Giống /batch-analyze nhưng stream kết quả dạng NDJSON (mỗi dòng 1 JSON event):
+    - {"type": "start", "total": N}
+    - {"type": "result", "index": i, "filename": ..., "analysis"/"error": ...} ngay khi từng CV xong
+    - {"type": "progress", "completed": k, "total": N}
+    - {"type": "done", "total": N}
     """
+    validate_model(model)
+    if len(files) > 10:
+        raise HTTPException(status_code=400, detail="Tối đa 10 CV mỗi lần")
+    
+    # Phải lấy file trước khi trả response vì UploadFile sẽ bị đóng sau đó
+    uploads = await read_batch_uploads(files)
+    
+    return StreamingResponse(
+        stream_batch_results(uploads, model, job_description, top_k),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/jobs")
+async def submit_job(
+    files: list[UploadFile] = File(...),
+    model: str = "gemini-2.0-flash",
+    job_description: str = Form(""),
+    top_k: int = 0
+):
+    """
+    Tạo job phân tích nhiều CV chạy nền, trả về job_id ngay lập tức
+    top_k > 0 (cần JD): chỉ top_k CV có điểm sơ bộ cao nhất được đưa vào hàng đợi AI
+    """
+    validate_model(model)
+    if len(files) > jobs.JOB_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Tối đa {jobs.JOB_MAX_FILES} CV mỗi job")
+    
+    uploads = await read_batch_uploads(files)
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from io import BytesIO
-        from fastapi.responses import StreamingResponse
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "CV Analysis Results"
+        if not uploads:
+            raise HTTPException(status_code=400, detail="Chỉ hỗ trợ file PDF, DOCX, TXT")
         
-        # Header
-        headers = [
-            "Tên", "Email", "Phone", "Điểm Tổng", "Skills Score", 
-            "Experience Score", "Education Score", "Match %", 
-            "Skills", "Red Flags", "Salary Range"
-        ]
+        prescores, selected = await shortlist_uploads(uploads, job_description, top_k)
+        skipped = {
+            index: {"filename": filename, "skipped": True, "prescore": prescores[index]}
+            for index, (filename, _) in enumerate(uploads)
+            if index not in selected
+        }
         
-        # Style header
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
+        # sqlite ghi BLOB trực tiếp từ bytes / mmap của file đã spool (trong thread, không block event loop)
+        job_id = await asyncio.to_thread(
+            job_store.create_job,
+            [(filename, upload.buffer()) for filename, upload in uploads], model, job_description, skipped
+        )
+    finally:
+        upload_stream.close_all(uploads)
+    job_wake_event.set()
+    
+    return {"job_id": job_id, "status": "queued", "total": len(uploads), "queued": len(uploads) - len(skipped)}
+
+@app.post("/prescore")
+async def prescore_cvs(
+    files: list[UploadFile] = File(...),
+    job_description: str = Form(...)
+):
+    """
+    Chấm điểm sơ bộ và xếp hạng CV theo JD, chạy local (không gọi AI)
+    """
+    if len(files) > jobs.JOB_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Tối đa {jobs.JOB_MAX_FILES} CV mỗi lần")
+    if not job_description.strip():
+        raise HTTPException(status_code=400, detail="Cần nhập Job Description để chấm điểm")
+    
+    uploads = await read_batch_uploads(files)
+    try:
+        prescores, _ = await shortlist_uploads(uploads, job_description, len(uploads))
+    finally:
+        upload_stream.close_all(uploads)
+    
+    results = [
+        {"filename": filename, "prescore": prescore} if prescore is not None
+        else {"filename": filename, "error": "Không đọc được nội dung file"}
+        for (filename, _), prescore in zip(uploads, prescores)
+    ]
+    # File lỗi xếp cuối
+    last_rank = len(results) + 1
+    results.sort(key=lambda result: result.get("prescore", {}).get("rank", last_rank))
+    return {"results": results, "total": len(results)}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Trạng thái và tiến độ của job"""
+    job = await asyncio.to_thread(job_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    return job
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0, limit: int = 50):
+    """Kết quả của job theo thứ tự file, có phân trang"""
+    job = await asyncio.to_thread(job_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    
+    limit = max(1, min(limit, 200))
+    results = await asyncio.to_thread(job_store.get_results, job_id, max(offset, 0), limit)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "total": job["total"],
+        "offset": offset,
+        "limit": limit,
+        "results": results
+    }
+
+async def read_batch_uploads(files: list[UploadFile]) -> list[tuple[str, SpooledUpload]]:
+    """
+    Lấy các file hợp lệ trong batch đã được Starlette spool (bỏ qua định dạng không hỗ trợ).
+    Người gọi phải upload_stream.close_all() sau khi dùng xong.
+    """
+    uploads = []
+    try:
+        for file in files:
+            if not file.filename.endswith(extraction.SUPPORTED_EXTENSIONS):
+                continue
+            uploads.append((file.filename, await upload_stream.spool_upload(file)))
+    except BaseException:
+        upload_stream.close_all(uploads)
+        raise
+    return uploads
+
+async def stream_batch_results(uploads: list[tuple[str, bytes]], model: str, job_description: str, top_k: int = 0):
+    """Chạy batch song song và yield từng event NDJSON theo thứ tự hoàn thành"""
+    total = len(uploads)
+    prescores: list = [None] * total
+    selected: set[int] = set()
+    job_profile = ""
+    
+    async def run(index: int, filename: str, content: bytes) -> dict:
+        result = await analyze_shortlisted_file(
+            filename, content, model, job_description, prescores[index], index in selected, job_profile
+        )
+        return {"type": "result", "index": index, **result}
+    
+    tasks: list[asyncio.Task] = []
+    
+    try:
+        yield json.dumps({"type": "start", "total": total}, ensure_ascii=False) + "\n"
         
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
+        prescores, selected = await shortlist_uploads(uploads, job_description, top_k)
         
-        # Data
-        results = data.get("results", [])
-        for row_idx, result in enumerate(results, 2):
-            analysis = result.get("analysis", {})
-            
-            ws.cell(row=row_idx, column=1, value=analysis.get("name", ""))
-            ws.cell(row=row_idx, column=2, value=analysis.get("email", ""))
-            ws.cell(row=row_idx, column=3, value=analysis.get("phone", ""))
-            ws.cell(row=row_idx, column=4, value=analysis.get("overall_score", 0))
-            ws.cell(row=row_idx, column=5, value=analysis.get("skills_score", 0))
-            ws.cell(row=row_idx, column=6, value=analysis.get("experience_score", 0))
-            ws.cell(row=row_idx, column=7, value=analysis.get("education_score", 0))
-            ws.cell(row=row_idx, column=8, value=analysis.get("match_percentage", 0))
-            ws.cell(row=row_idx, column=9, value=", ".join(analysis.get("skills", [])))
-            ws.cell(row=row_idx, column=10, value=", ".join(analysis.get("red_flags", [])))
-            ws.cell(row=row_idx, column=11, value=analysis.get("salary_range", ""))
+        # Phân tích JD 1 lần cho cả batch trước khi chạy các CV
+        job_profile = await batch_job_profile(uploads, selected, model, job_description)
+        tasks.extend(
+            asyncio.create_task(run(index, filename, content))
+            for index, (filename, content) in enumerate(uploads)
+        )
         
-        # Auto-adjust column width
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+        completed = 0
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            completed += 1
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({"type": "progress", "completed": completed, "total": total}) + "\n"
         
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+        yield json.dumps({"type": "done", "total": total}) + "\n"
+    
+    finally:
+        # Client ngắt kết nối giữa chừng -> hủy các CV chưa xong
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        upload_stream.close_all(uploads)
+
+async def shortlist_uploads(
+    uploads: list[tuple[str, bytes]], job_description: str, top_k: int
+) -> tuple[list, set[int]]:
+    """
+    Chế độ shortlist: extract + chấm điểm sơ bộ tất cả CV, chọn top_k CV để gửi AI.
+    Trả về (prescores theo thứ tự input, tập index được chọn).
+    Không bật (top_k <= 0 hoặc không có JD) thì chọn tất cả.
+    """
+    if top_k <= 0 or not job_description.strip():
+        return [None] * len(uploads), set(range(len(uploads)))
+    
+    texts = await asyncio.gather(
+        *[extract_text_cached(filename, content) for filename, content in uploads],
+        return_exceptions=True
+    )
+    readable = [index for index, text in enumerate(texts) if isinstance(text, str)]
+    scores = await asyncio.to_thread(
+        scoring.rank_candidates, [texts[index] for index in readable], job_description
+    )
+    
+    prescores: list = [None] * len(uploads)
+    for index, score in zip(readable, scores):
+        prescores[index] = score
+    
+    # File lỗi extract vẫn được "chọn" để trả về lỗi của riêng file đó
+    selected = {readable[i] for i in scoring.shortlist(scores, top_k)}
+    selected.update(index for index, score in enumerate(prescores) if score is None)
+    return prescores, selected
+
+async def analyze_shortlisted_file(
+    filename: str, content: bytes, model: str, job_description: str,
+    prescore: dict = None, selected: bool = True, job_profile: str = ""
+) -> dict:
+    """Phân tích 1 file trong batch; file không lọt shortlist chỉ trả về điểm sơ bộ"""
+    if not selected:
+        return {"filename": filename, "skipped": True, "prescore": prescore}
+    
+    result = await analyze_batch_file(filename, content, model, job_description, job_profile)
+    if prescore is not None:
+        result["prescore"] = prescore
+    return result
+
+async def analyze_packed_batch(
+    uploads: list[tuple[str, SpooledUpload]], model: str, job_description: str,
+    prescores: list, selected: set[int]
+) -> list[dict]:
+    """
+    Packed mode: CV ngắn chưa có cache được gộp nhiều CV/1 request AI,
+    CV dài và CV không parse được trong kết quả packed được phân tích riêng.
+    Trả về results theo thứ tự input (cùng format với analyze_shortlisted_file)
+    """
+    results: list = [None] * len(uploads)
+    texts: dict[int, str] = {}
+    
+    extracted = await asyncio.gather(
+        *[extract_text_cached(filename, content) for index, (filename, content) in enumerate(uploads) if index in selected],
+        return_exceptions=True
+    )
+    for index, text in zip(sorted(selected), extracted):
+        filename = uploads[index][0]
+        if isinstance(text, Exception):
+            results[index] = {"filename": filename, "error": str(text)}
+            continue
+        cached = analysis_cache.get(cv_cache_key(text, model, job_description))
+        if cached is not None:
+            results[index] = {
+                "filename": filename, "analysis": CVAnalysisResponse(**cached).dict(),
+                "cached": True, "key": cv_cache_key(text, model, job_description)
+            }
+        else:
+            texts[index] = text
+    
+    pending = sorted(texts)
+    # Chỉ tóm tắt JD khi có từ 2 CV (khác nội dung) cần gọi AI, giống batch_job_profile
+    job_profile = await prepare_job_description(job_description, model) if len(set(texts.values())) > 1 else ""
+    budget = text_compaction.token_budget(model)
+    compacted = [text_compaction.compact_text(texts[index], budget) for index in pending]
+    packs, singles = packing.plan_packs([result.tokens_after for result in compacted])
+    
+    async def run_single(index: int) -> None:
+        filename, content = uploads[index]
+        results[index] = await analyze_batch_file(filename, content, model, job_description, job_profile)
+    
+    async def run_pack(pack: list[int]) -> None:
+        analyses = await analyze_cv_pack([compacted[i] for i in pack], model, job_profile or job_description)
+        retry = []
+        for i, analysis in zip(pack, analyses):
+            index = pending[i]
+            if analysis is None:
+                retry.append(index)
+                continue
+            cache_key = cv_cache_key(texts[index], model, job_description)
+            result = analysis.dict()
+            analysis_cache.set(cache_key, result)
+            candidate_index.add(cache_key, result, model)
+            results[index] = {"filename": uploads[index][0], "analysis": result, "cached": False, "key": cache_key}
+        if retry:
+            log.info("Retry CVs individually after packed request", extra={"retry": len(retry), "pack": len(pack)})
+        await asyncio.gather(*[run_single(index) for index in retry])
+    
+    await asyncio.gather(
+        *[run_pack(pack) for pack in packs],
+        *[run_single(pending[i]) for i in singles]
+    )
+    
+    for index, (filename, _) in enumerate(uploads):
+        if index not in selected:
+            results[index] = {"filename": filename, "skipped": True, "prescore": prescores[index]}
+        elif prescores[index] is not None:
+            results[index]["prescore"] = prescores[index]
+    return results
+
+async def analyze_job_item(filename: str, content: bytes, model: str, job_description: str) -> dict:
+    """Xử lý 1 CV của job queue (JD được phân tích 1 lần rồi cache theo hash)"""
+    job_profile = await prepare_job_description(job_description, model)
+    return await analyze_batch_file(filename, content, model, job_description, job_profile)
+
+async def analyze_batch_file(
+    filename: str, content: bytes, model: str, job_description: str, job_profile: str = ""
+) -> dict:
+    """Extract + phân tích 1 file trong batch, trả về result hoặc error của riêng file đó"""
+    try:
+        cv_text = await extract_text_cached(filename, content)
+        analysis, cached = await analyze_cv_cached(cv_text, model, job_description, job_profile)
         
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=cv_analysis_results.xlsx"}
+        return {
+            "filename": filename,
+            "analysis": analysis.dict(),
+            "cached": cached,
+            # Dùng để export / tra cứu lại kết quả mà không cần gửi lại JSON
+            "key": cv_cache_key(cv_text, model, job_description)
+        }
+    
+    except Exception as e:
+        log.error("Error processing file", extra={"cv_filename": filename, "error": str(e)})
+        return {
+            "filename": filename,
+            "error": str(e)
+        }
+
+@app.get("/candidates/search")
+async def search_candidates(
+    skills: str = "",
+    skill_field: str = "skills",
+    q: str = "",
+    min_overall_score: int = None,
+    min_skills_score: int = None,
+    min_experience_score: int = None,
+    min_education_score: int = None,
+    min_soft_skills_score: int = None,
+    min_match_percentage: int = None,
+    sort: str = "overall_score",
+    offset: int = 0,
+    limit: int = 20
+):
+    """
+    Tìm ứng viên đã phân tích, không cần gọi lại AI.
+    Vd: /candidates/search?skills=Kubernetes,Python&min_overall_score=80&q=fintech
+    - skills: danh sách skill (phải có tất cả), skill_field: skills | matching_skills
+    - q: tìm full-text trong tên, tóm tắt, kinh nghiệm, học vấn
+    """
+    if skill_field not in ("skills", "matching_skills"):
+        raise HTTPException(status_code=400, detail="skill_field phải là skills hoặc matching_skills")
+    
+    limit = max(1, min(limit, 200))
+    result = candidate_index.search(
+        skills=[skill for skill in skills.split(",") if skill.strip()],
+        skill_field=skill_field,
+        q=q,
+        min_scores={
+            "overall_score": min_overall_score,
+            "skills_score": min_skills_score,
+            "experience_score": min_experience_score,
+            "education_score": min_education_score,
+            "soft_skills_score": min_soft_skills_score,
+            "match_percentage": min_match_percentage,
+        },
+        sort=sort,
+        offset=max(offset, 0),
+        limit=limit
+    )
+    return {"offset": offset, "limit": limit, **result}
+
+@app.get("/candidates/skills")
+async def get_candidate_skills(limit: int = 50):
+    """Các skill phổ biến nhất trong index ứng viên"""
+    return {"skills": candidate_index.top_skills(max(1, min(limit, 500)))}
+
+@app.post("/candidates/reindex")
+async def reindex_candidates():
+    """Build lại index ứng viên từ cache kết quả phân tích"""
+    count = await asyncio.to_thread(
+        candidate_index.add_many,
+        # Bỏ qua các entry không phải phân tích CV (vd. yêu cầu JD đã tóm tắt)
+        ((key, value) for key, value in analysis_cache.items() if isinstance(value, dict) and "summary" in value)
+    )
+    return {"message": f"Đã index {count} ứng viên", "total": len(candidate_index)}
+
+@app.post("/export-excel")
+async def export_to_excel(data: dict, format: str = "xlsx"):
+    """
+    Export kết quả batch analysis ra Excel (hoặc format=csv / parquet).
+    Nguồn dữ liệu (chọn 1):
+    - results: kết quả batch client gửi lên
+    - job_id: đọc kết quả job đã lưu trên server
+    - cache_keys: danh sách key (trường "key" trong kết quả batch / search)
+    File được stream ra client trong lúc ghi, memory không tăng theo số dòng.
+    """
+    if data.get("job_id"):
+        return await export_job(data["job_id"], format)
+    
+    if data.get("cache_keys") is not None:
+        keys = data["cache_keys"]
+        if not isinstance(keys, list):
+            raise HTTPException(status_code=400, detail="cache_keys phải là danh sách")
+        return await export_response(iter_cached_results(keys), format)
+    
+    return await export_response(data.get("results", []), format)
+
+@app.get("/jobs/{job_id}/export")
+async def export_job_results(job_id: str, format: str = "xlsx"):
+    """Export kết quả của job đã lưu (xlsx | csv | parquet)"""
+    return await export_job(job_id, format)
+
+async def export_job(job_id: str, format: str) -> StreamingResponse:
+    if await asyncio.to_thread(job_store.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    # Chỉ export các CV đã phân tích xong (bỏ qua file lỗi / không lọt shortlist)
+    results = (item for item in job_store.iter_results(job_id) if "analysis" in item)
+    return await export_response(results, format)
+
+def iter_cached_results(keys: list) -> Iterable[dict]:
+    """Đọc lần lượt kết quả theo cache key, bỏ qua key không còn tồn tại"""
+    for key in keys:
+        analysis = lookup_analysis(str(key))
+        if analysis is not None:
+            yield {"key": key, "analysis": analysis}
+
+async def export_response(results: Iterable[dict], format: str) -> StreamingResponse:
+    """Tạo StreamingResponse export theo format"""
+    if format not in exporter.EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format không hỗ trợ. Chỉ chấp nhận: {', '.join(exporter.EXPORT_FORMATS)}"
         )
-        
+    media_type, extension = exporter.EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f"attachment; filename=cv_analysis_results.{extension}"}
+
+    try:
+        if format == "csv":
+            body = exporter.stream_csv(results)
+        elif format == "parquet":
+            if not exporter.parquet_available():
+                raise HTTPException(status_code=400, detail="Export Parquet cần cài pyarrow")
+            body = exporter.stream_file(await asyncio.to_thread(exporter.write_parquet, results))
+        else:
+            body = exporter.stream_xlsx(results)
+        return StreamingResponse(body, media_type=media_type, headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi export Excel: {str(e)}")
 
@@ -205,6 +732,13 @@ async def get_available_models():
     """Lấy danh sách models có sẵn"""
     return {
         "models": [
+            {
+                "id": "auto",
+                "name": "Auto (nhanh nhất)",
+                "provider": "Auto",
+                "description": "Tự chọn model nhanh nhất đang hoạt động, tự chuyển model khi lỗi",
+                "icon": "🧭"
+            },
             {
                 "id": "gemini-2.0-flash",
                 "name": "Gemini 2.0 Flash",
@@ -258,66 +792,273 @@ async def analyze_cv(
 ):
     """
     Upload CV file và phân tích nội dung
-    Supported models: gemini-2.0-flash, gemini-2.5-flash, gemini-2.5-pro, claude-sonnet
+    Supported models: xem SUPPORTED_MODELS (GET /models)
     """
+    validate_model(model)
     # Kiểm tra file type
-    if not file.filename.endswith(('.pdf', '.docx', '.txt')):
+    if not file.filename.endswith(extraction.SUPPORTED_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Chỉ hỗ trợ file PDF, DOCX, TXT")
     
     try:
-        print(f"Processing file: {file.filename} with model: {model}")
-        
-        # Đọc nội dung file
-        content = await file.read()
-        print(f"File size: {len(content)} bytes")
-        
-        # Tạo cache key từ file content + model
-        cache_key = hashlib.md5(content + model.encode()).hexdigest()
-        
-        # Kiểm tra cache
-        if cache_key in analysis_cache:
-            print(f"✅ Cache hit! Returning cached result for {file.filename}")
-            return CVAnalysisResponse(**analysis_cache[cache_key])
-        
-        print(f"❌ Cache miss. Analyzing with AI...")
+        # Lấy file đã được Starlette spool và hash (không copy ra file tạm khác)
+        upload = await upload_stream.spool_upload(file)
         
         # Extract text từ file
-        if file.filename.endswith('.txt'):
-            cv_text = content.decode('utf-8')
-        elif file.filename.endswith('.pdf'):
-            cv_text = extract_text_from_pdf(content)
-        elif file.filename.endswith('.docx'):
-            cv_text = extract_text_from_docx(content)
-        
-        print(f"Extracted text length: {len(cv_text)} characters")
-        print(f"Job Description provided: {bool(job_description)}")
-        
-        # Gọi AI để phân tích
-        analysis = await analyze_cv_with_ai(cv_text, model, job_description)
-        
-        # Lưu vào cache
-        analysis_cache[cache_key] = analysis.dict()
-        print(f"💾 Saved to cache. Total cached items: {len(analysis_cache)}")
+        try:
+            cv_text = await extract_text_cached(file.filename, upload)
+        finally:
+            upload.close()
         
+        # Gọi AI để phân tích (có cache)
+        analysis, cached = await analyze_cv_cached(cv_text, model, job_description)
+        log.info("Analyzed CV", extra={
+            "cv_filename": file.filename, "model": model, "file_bytes": upload.size,
+            "text_chars": len(cv_text), "has_jd": bool(job_description), "cached": cached,
+        })
         return analysis
     
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error analyzing CV", extra={"cv_filename": file.filename})
         raise HTTPException(status_code=500, detail=f"Lỗi xử lý file: {str(e)}")
 
-async def analyze_cv_with_ai(cv_text: str, model: str = "gemini-2.0-flash", job_description: str = "") -> CVAnalysisResponse:
+@app.post("/analyze-cv/stream")
+async def analyze_cv_stream(
+    file: UploadFile = File(...),
+    model: str = "gemini-2.0-flash",
+    job_description: str = Form("")
+):
     """
-    Sử dụng AI API để phân tích CV
-    Hỗ trợ: Gemini (2.0-flash, 2.5-flash, 2.5-pro) và Claude Sonnet
+    Giống /analyze-cv nhưng stream kết quả dạng NDJSON, field nào AI trả xong thì gửi ngay:
+    - {"type": "field", "field": "name", "value": ...}
+    - {"type": "done", "analysis": {...}, "cached": bool}
+    - {"type": "error", "detail": ...}
     """
-    # Build prompt based on whether JD is provided
-    if job_description:
-        prompt = f"""
-Bạn là chuyên gia phân tích CV và tư vấn tuyển dụng. Phân tích CV và SO SÁNH với Job Description để trả về JSON:
+    validate_model(model)
+    if not file.filename.endswith(extraction.SUPPORTED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Chỉ hỗ trợ file PDF, DOCX, TXT")
+    
+    upload = await upload_stream.spool_upload(file)
+    try:
+        cv_text = await extract_text_cached(file.filename, upload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi xử lý file: {str(e)}")
+    finally:
+        upload.close()
+    
+    return StreamingResponse(
+        stream_cv_analysis(cv_text, model, job_description),
+        media_type="application/x-ndjson"
+    )
+
+async def stream_cv_analysis(cv_text: str, model: str, job_description: str = "") -> AsyncIterator[str]:
+    """Phân tích CV bằng streaming API, yield event NDJSON cho từng field hoàn chỉnh"""
+    def event(data: dict) -> str:
+        return json.dumps(data, ensure_ascii=False) + "\n"
+    
+    cache_key = cv_cache_key(cv_text, model, job_description)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        for field, value in cached.items():
+            yield event({"type": "field", "field": field, "value": value})
+        yield event({"type": "done", "analysis": cached, "cached": True})
+        return
+    
+    # Stream không failover giữa chừng được -> auto dùng model đang nhanh nhất
+    provider_model = routing.rank_models()[0] if model == routing.AUTO_MODEL else model
+    prompt = prepare_analysis_prompt(cv_text, provider_model, job_description)
+    parser = streaming.IncrementalJSONParser()
+    start = time.monotonic()
+    
+    try:
+        async with get_provider_semaphore(provider_model):
+            with telemetry.span("provider", provider_model):
+                async for chunk in stream_provider(prompt, provider_model):
+                    for field, value in parser.feed(chunk):
+                        if field in CVAnalysisResponse.model_fields:
+                            value = normalize_analysis_field(field, value)
+                            yield event({"type": "field", "field": field, "value": value})
+        record_provider_usage(provider_model, prompt, parser.text)
+        analysis = parse_analysis(parser.text, provider_model)
+    except Exception as e:
+        routing.record(provider_model, time.monotonic() - start, False)
+        telemetry.PROVIDER_ERRORS.inc(model=provider_model)
+        log.error("Stream analysis error", extra={"model": provider_model, "error": str(e)})
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        yield event({"type": "error", "detail": f"Lỗi phân tích AI: {detail}"})
+        return
+    
+    routing.record(provider_model, time.monotonic() - start, True)
+    result = analysis.dict()
+    analysis_cache.set(cache_key, result)
+    candidate_index.add(cache_key, result, model)
+    yield event({"type": "done", "analysis": result, "cached": False})
+
+async def extract_text_cached(filename: str, content: Union[bytes, SpooledUpload]) -> str:
+    """Extract text có cache theo hash nội dung file (upload đã có sẵn hash khi spool)"""
+    extension = os.path.splitext(filename)[1].lower()
+    if isinstance(content, SpooledUpload):
+        cache_key = content.digest + extension
+    else:
+        cache_key = content_hash(content) + extension
+    
+    cached = text_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    start = time.perf_counter()
+    with telemetry.span("extract"):
+        if isinstance(content, SpooledUpload):
+            # File nhỏ truyền bytes, file lớn để process extract tự đọc theo path
+            text = await extraction.extract_text(filename, content.content, content.path)
+        else:
+            text = await extraction.extract_text(filename, content)
+    telemetry.EXTRACTION_LATENCY.observe(time.perf_counter() - start, format=extension.lstrip(".") or "unknown")
+    cv_text = extraction.normalize_text(text)
+    text_cache.set(cache_key, cv_text)
+    return cv_text
+
+def cv_cache_key(cv_text: str, model: str, job_description: str = "") -> str:
+    """
+    Cache key của kết quả phân tích CV (cũng là key trong candidate index).
+    Luôn theo JD gốc (kể cả khi prompt dùng bản tóm tắt JD) nên /analyze-cv và batch dùng chung key.
+    """
+    prompt_version = f"{PROMPT_VERSION}+{JD_PROMPT_VERSION}" if job_description.strip() else PROMPT_VERSION
+    return analysis_cache_key(cv_text, model, job_description, prompt_version)
+
+def lookup_analysis(key: str) -> Optional[dict]:
+    """Đọc kết quả phân tích theo key: cache trước, sau đó candidate index"""
+    analysis = analysis_cache.get(key)
+    if analysis is None:
+        analysis = candidate_index.get(key)
+    return analysis
+
+async def analyze_cv_cached(
+    cv_text: str, model: str, job_description: str = "", job_profile: str = ""
+) -> tuple[CVAnalysisResponse, bool]:
+    """
+    Phân tích CV có dùng cache, dùng chung cho /analyze-cv và /batch-analyze.
+    job_profile: bản tóm tắt JD (batch) dùng trong prompt thay cho JD gốc, cache key vẫn theo JD gốc.
+    Trả về (analysis, cached)
+    """
+    cache_key = cv_cache_key(cv_text, model, job_description)
+    
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return CVAnalysisResponse(**cached), True
+    
+    async def analyze() -> dict:
+        analysis = await analyze_cv_with_ai(cv_text, model, job_profile or job_description)
+        result = analysis.dict()
+        analysis_cache.set(cache_key, result)
+        candidate_index.add(cache_key, result, model)
+        log.info("Saved to cache", extra={"cached_items": len(analysis_cache)})
+        return result
+    
+    # Request trùng key đang chạy (double-click, file trùng trong batch) dùng chung 1 lời gọi AI
+    result, shared = await analysis_singleflight.do(
+        cache_key, analyze, lambda: analysis_cache.peek(cache_key)
+    )
+    return CVAnalysisResponse(**result), shared
+
+async def analyze_job_description(job_description: str, model: str) -> JobRequirements:
+    """
+    Phân tích JD thành bản yêu cầu ngắn gọn (có cache theo hash JD + model)
+    """
+    cache_key = analysis_cache_key("", model, job_description, JD_PROMPT_VERSION)
+    
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return JobRequirements(**cached)
+    
+    prompt = f"""
+Bạn là chuyên gia tuyển dụng. Tóm tắt Job Description thành yêu cầu ngắn gọn, trả về JSON:
 
 {{
+  "title": "Vị trí",
+  "required_skills": ["kỹ năng bắt buộc"],
+  "nice_to_have_skills": ["kỹ năng ưu tiên"],
+  "min_years_experience": 2,
+  "education": "Yêu cầu học vấn",
+  "responsibilities": ["trách nhiệm chính, tối đa 5 ý"],
+  "soft_skills": ["kỹ năng mềm"]
+}}
+
+Job Description:
+{job_description}
+"""
+    
+    async def analyze() -> dict:
+        if model == routing.AUTO_MODEL:
+            response_text = await routing.route(lambda routed_model: call_provider_limited(prompt, routed_model))
+        else:
+            response_text = await call_provider_limited(prompt, model)
+        parsed, _ = parse_json_response(response_text)
+        result = JobRequirements(**response_parsing.coerce_fields(parsed, JobRequirements)).dict()
+        analysis_cache.set(cache_key, result)
+        return result
+    
+    result, _ = await analysis_singleflight.do(cache_key, analyze, lambda: analysis_cache.peek(cache_key))
+    return JobRequirements(**result)
+
+def format_job_requirements(requirements: JobRequirements) -> str:
+    """Chuyển yêu cầu JD thành text ngắn để đưa vào prompt từng CV"""
+    lines = [
+        ("Vị trí", requirements.title),
+        ("Kỹ năng bắt buộc", ", ".join(requirements.required_skills)),
+        ("Kỹ năng ưu tiên", ", ".join(requirements.nice_to_have_skills)),
+        ("Kinh nghiệm tối thiểu", f"{requirements.min_years_experience:g} năm" if requirements.min_years_experience else ""),
+        ("Học vấn", requirements.education),
+        ("Trách nhiệm chính", "; ".join(requirements.responsibilities)),
+        ("Kỹ năng mềm", ", ".join(requirements.soft_skills)),
+    ]
+    return "\n".join(f"{label}: {value}" for label, value in lines if value)
+
+async def prepare_job_description(job_description: str, model: str) -> str:
+    """
+    JD dùng cho batch: bản yêu cầu đã tóm tắt (giống nhau cho mọi CV).
+    Lỗi khi phân tích JD thì dùng JD gốc.
+    """
+    if not job_description.strip():
+        return job_description
+    
+    try:
+        requirements = await analyze_job_description(job_description, model)
+    except Exception as e:
+        log.warning("JD pre-analysis failed, using raw JD", extra={"error": str(e)})
+        return job_description
+    
+    return format_job_requirements(requirements) or job_description
+
+async def batch_job_profile(
+    uploads: list[tuple[str, SpooledUpload]], selected: set[int], model: str, job_description: str
+) -> str:
+    """
+    Bản tóm tắt JD cho batch, chỉ phân tích JD khi có từ 2 CV cần gọi AI
+    (1 CV thì gửi JD gốc luôn, giống /analyze-cv, tránh tốn thêm 1 lời gọi AI).
+    """
+    if not job_description.strip():
+        return ""
+    
+    texts = await asyncio.gather(
+        *[extract_text_cached(filename, content) for index, (filename, content) in enumerate(uploads) if index in selected],
+        return_exceptions=True
+    )
+    # CV trùng nội dung dùng chung 1 lời gọi AI (single-flight) nên đếm theo key
+    pending = {
+        key for key in (cv_cache_key(text, model, job_description) for text in texts if isinstance(text, str))
+        if analysis_cache.peek(key) is None
+    }
+    if len(pending) < 2:
+        return ""
+    return await prepare_job_description(job_description, model)
+
+# Hướng dẫn + JSON schema cho prompt phân tích CV (có / không có JD)
+ANALYSIS_INSTRUCTIONS_JD = """
+Bạn là chuyên gia phân tích CV và tư vấn tuyển dụng. Phân tích CV và SO SÁNH với Job Description để trả về JSON:
+
+{
   "summary": "Tóm tắt về ứng viên",
   "name": "Tên",
   "email": "Email",
@@ -340,7 +1081,7 @@ Bạn là chuyên gia phân tích CV và tư vấn tuyển dụng. Phân tích C
   "matching_skills": ["skill phù hợp với JD"],
   "missing_skills": ["skill thiếu so với JD"],
   "red_flags": ["Gap 2 năm không làm việc", "Đổi việc 5 lần trong 3 năm", "Thiếu kỹ năng bắt buộc X"]
-}}
+}
 
 CHẤM ĐIỂM (0-100):
 - overall_score: Tổng điểm
@@ -355,18 +1096,12 @@ RED FLAGS (nếu có):
 - Job hopping (đổi việc quá nhiều)
 - Thiếu yêu cầu bắt buộc
 - Overselling
-
-Job Description:
-{job_description}
-
-CV Content:
-{cv_text}
 """
-    else:
-        prompt = f"""
+
+ANALYSIS_INSTRUCTIONS = """
 Bạn là chuyên gia phân tích CV. Phân tích CV và trả về JSON:
 
-{{
+{
   "summary": "Tóm tắt",
   "name": "Tên",
   "email": "Email",
@@ -388,34 +1123,220 @@ Bạn là chuyên gia phân tích CV. Phân tích CV và trả về JSON:
   "matching_skills": [],
   "missing_skills": [],
   "red_flags": []
-}}
+}
+"""
+
+def build_analysis_prompt(cv_text: str, job_description: str = "") -> str:
+    """Prompt phân tích 1 CV"""
+    if job_description:
+        return ANALYSIS_INSTRUCTIONS_JD + f"\nJob Description:\n{job_description}\n\nCV Content:\n{cv_text}\n"
+    return ANALYSIS_INSTRUCTIONS + f"\nCV Content:\n{cv_text}\n"
 
-CV Content:
-{cv_text}
+PACKED_PROMPT_HEADER = """
+Request này có {count} CV, mỗi CV nằm giữa <cv index="i"> và </cv> (i từ 0 đến {last}).
+Phân tích TỪNG CV độc lập theo hướng dẫn bên dưới. Trả về DUY NHẤT 1 JSON array gồm {count} object
+theo đúng thứ tự CV, mỗi object có thêm trường "cv_index" là index của CV đó.
 """
+
+def build_packed_prompt(cv_texts: list[str], job_description: str = "") -> str:
+    """Prompt phân tích nhiều CV trong 1 request (hướng dẫn + schema chỉ gửi 1 lần)"""
+    parts = [
+        PACKED_PROMPT_HEADER.format(count=len(cv_texts), last=len(cv_texts) - 1),
+        ANALYSIS_INSTRUCTIONS_JD if job_description else ANALYSIS_INSTRUCTIONS,
+    ]
+    if job_description:
+        parts.append(f"\nJob Description:\n{job_description}\n")
+    parts.extend(f'\n<cv index="{i}">\n{text}\n</cv>\n' for i, text in enumerate(cv_texts))
+    return "".join(parts)
+
+async def analyze_cv_pack(
+    cv_compacted: list[text_compaction.CompactionResult], model: str, job_description: str = ""
+) -> list[Optional[CVAnalysisResponse]]:
+    """
+    Phân tích nhiều CV (đã làm gọn) trong 1 request AI.
+    Trả về kết quả theo thứ tự CV, None cho CV không lấy được kết quả (cần phân tích riêng).
+    """
+    jd_compacted = text_compaction.compact_text(job_description, text_compaction.JD_TOKEN_BUDGET)
+    text_compaction.record_stats(model, *cv_compacted, jd_compacted)
+    prompt = build_packed_prompt([result.text for result in cv_compacted], jd_compacted.text)
+    max_tokens = min(MAX_OUTPUT_TOKENS * len(cv_compacted), packing.PACK_MAX_OUTPUT_TOKENS)
+    log.info("Packed request", extra={
+        "model": model, "cvs": len(cv_compacted), "tokens": sum(result.tokens_after for result in cv_compacted)
+    })
     
     try:
-        if model.startswith("gemini"):
-            # Gọi Gemini API
-            return await analyze_with_gemini(prompt, model, job_description)
-        elif model == "claude-sonnet":
-            # Gọi Claude API
-            return await analyze_with_claude(prompt, job_description)
-        elif model.startswith("openrouter"):
-            # Gọi OpenRouter API
-            return await analyze_with_openrouter(prompt, model, job_description)
+        if model == routing.AUTO_MODEL:
+            response_text = await routing.route(
+                lambda routed_model: call_provider_limited(prompt, routed_model, max_tokens)
+            )
         else:
-            raise HTTPException(status_code=400, detail=f"Model không hỗ trợ: {model}")
+            response_text = await call_provider_limited(prompt, model, max_tokens)
+        with telemetry.span("parse", model):
+            parsed, repairs = response_parsing.parse_json(response_text)
+    except Exception as e:
+        log.error("Packed request error", extra={"model": model, "error": str(e)})
+        return [None] * len(cv_compacted)
+    
+    analyses: list[Optional[CVAnalysisResponse]] = []
+    for item in packing.split_results(parsed, len(cv_compacted), truncated="truncated" in repairs):
+        if item is None:
+            analyses.append(None)
+            continue
+        try:
+            # Object viết dở / thiếu tên, tóm tắt hoặc điểm -> phân tích lại riêng
+            check_analysis_complete(item, [])
+            analyses.append(analysis_from_dict(item))
+        except Exception:
+            analyses.append(None)
+    return analyses
+
+def prepare_analysis_prompt(cv_text: str, model: str, job_description: str = "") -> str:
+    """Làm gọn text CV/JD theo token budget của model rồi build prompt"""
+    with telemetry.span("prompt", model):
+        cv_compacted = text_compaction.compact_text(cv_text, text_compaction.token_budget(model))
+        jd_compacted = text_compaction.compact_text(job_description, text_compaction.JD_TOKEN_BUDGET)
+        text_compaction.record_stats(model, cv_compacted, jd_compacted)
+        prompt = build_analysis_prompt(cv_compacted.text, jd_compacted.text)
+    log.debug("Compacted prompt", extra={
+        "model": model,
+        "cv_tokens": [cv_compacted.tokens_before, cv_compacted.tokens_after],
+        "jd_tokens": [jd_compacted.tokens_before, jd_compacted.tokens_after],
+    })
+    return prompt
+
+async def analyze_cv_with_ai(cv_text: str, model: str = "gemini-2.0-flash", job_description: str = "") -> CVAnalysisResponse:
+    """
+    Sử dụng AI API để phân tích CV
+    Hỗ trợ: Gemini (2.0-flash, 2.5-flash, 2.5-pro) và Claude Sonnet
+    model="auto": chọn model nhanh nhất còn khỏe, tự failover khi lỗi/timeout
+    """
+    if model == routing.AUTO_MODEL:
+        return await routing.route(lambda routed_model: analyze_cv_with_ai(cv_text, routed_model, job_description))
+    
+    prompt = prepare_analysis_prompt(cv_text, model, job_description)
+    
+    try:
+        response_text = await call_provider_limited(prompt, model)
+        return parse_analysis(response_text, model)
+    
+    except gateway.CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Lỗi phân tích AI: {str(e)}")
     
     except Exception as e:
-        print(f"Full error: {e}")
+        log.error("Analysis error", extra={"model": model, "error": str(e)})
         raise HTTPException(status_code=500, detail=f"Lỗi phân tích AI: {str(e)}")
 
-async def analyze_with_gemini(prompt: str, model: str, job_description: str = "") -> CVAnalysisResponse:
-    """Phân tích CV với Gemini"""
-    url = f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent?key={GOOGLE_API_KEY}"
+async def call_provider_limited(prompt: str, model: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> str:
+    """
+    call_provider trong giới hạn concurrency của provider, ghi latency cho routing.
+    model phải là model cụ thể: với model=auto gọi hàm này trong callback của routing.route
+    để semaphore là của model được chọn.
+    """
+    async with get_provider_semaphore(model):
+        return await routing.track(model, call_provider(prompt, model, max_tokens))
+
+async def call_provider(prompt: str, model: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> str:
+    """Gửi prompt tới provider tương ứng với model, trả về text response"""
+    if not model.startswith(("gemini", "openrouter")) and model != "claude-sonnet":
+        raise HTTPException(status_code=400, detail=f"Model không hỗ trợ: {model}")
+    
+    try:
+        with telemetry.span("provider", model):
+            if model.startswith("gemini"):
+                # Gọi Gemini API
+                response_text = await complete_with_gemini(prompt, model, max_tokens)
+            elif model == "claude-sonnet":
+                # Gọi Claude API
+                response_text = await complete_with_claude(prompt, max_tokens)
+            else:
+                # Gọi OpenRouter API
+                response_text = await complete_with_openrouter(prompt, model, max_tokens)
+    except Exception:
+        telemetry.PROVIDER_ERRORS.inc(model=model)
+        raise
+    
+    record_provider_usage(model, prompt, response_text)
+    return response_text
+
+def record_provider_usage(model: str, prompt: str, response_text: str) -> None:
+    """Đếm token (ước lượng) và bytes gửi/nhận của 1 lời gọi provider"""
+    telemetry.TOKENS.inc(text_compaction.estimate_tokens(prompt), model=model, kind="prompt")
+    telemetry.TOKENS.inc(text_compaction.estimate_tokens(response_text), model=model, kind="completion")
+    telemetry.BYTES.inc(len(prompt.encode()), kind="prompt")
+    telemetry.BYTES.inc(len(response_text.encode()), kind="completion")
+
+def parse_json_response(response_text: str) -> tuple[dict, list[str]]:
+    """Parse JSON từ response của AI (bỏ code block, tự sửa lỗi JSON thường gặp), trả về (object, các lỗi đã sửa)"""
+    try:
+        result, repairs = response_parsing.parse_json(response_text)
+    except response_parsing.ResponseParseError as e:
+        log.error("JSON parse error", extra={"error": str(e), "response_text": response_text[:500]})
+        raise HTTPException(status_code=500, detail=f"Lỗi parse JSON từ AI: {str(e)}")
+    
+    # AI đôi khi bọc object trong array
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        result = result[0]
+    if not isinstance(result, dict):
+        raise HTTPException(status_code=500, detail="Lỗi parse JSON từ AI: response không phải JSON object")
+    return result, repairs
+
+def parse_analysis(response_text: str, model: str = "") -> CVAnalysisResponse:
+    """
+    Parse response của AI thành CVAnalysisResponse (ép kiểu từng field).
+    Response bị cắt / thiếu trường chính -> lỗi, để kết quả hỏng không bị cache và index.
+    """
+    with telemetry.span("parse", model):
+        parsed, repairs = parse_json_response(response_text)
+        try:
+            check_analysis_complete(parsed, repairs)
+        except response_parsing.IncompleteResponseError as e:
+            log.error("Incomplete analysis response", extra={"model": model, "error": str(e)})
+            raise HTTPException(status_code=500, detail=f"Lỗi parse JSON từ AI: {str(e)}")
+        return analysis_from_dict(parsed)
+
+def check_analysis_complete(parsed: dict, repairs: list[str]) -> None:
+    """Kết quả phân tích phải có tên hoặc tóm tắt và đủ các trường điểm"""
+    response_parsing.check_complete(parsed, repairs, required=ANALYSIS_SCORE_FIELDS, any_of=("name", "summary"))
+
+def analysis_from_dict(parsed_result: dict) -> CVAnalysisResponse:
+    """Chuẩn hóa dict kết quả của AI thành CVAnalysisResponse"""
+    # Normalize data - convert arrays to strings if needed
+    for field in ("experience", "education"):
+        if field in parsed_result:
+            parsed_result[field] = join_structured_field(field, parsed_result[field])
+    
+    return CVAnalysisResponse(**response_parsing.coerce_fields(parsed_result, CVAnalysisResponse))
+
+def join_structured_field(field: str, value):
+    """experience / education dạng list object -> text"""
+    if not isinstance(value, list):
+        return value
+    if field == "experience":
+        return '\n\n'.join([
+            f"{exp.get('title', '')} - {exp.get('company', '')}\n{exp.get('duration', '')}\n{exp.get('description', '')}"
+            if isinstance(exp, dict) else str(exp)
+            for exp in value
+        ])
+    return '\n'.join([
+        f"{edu.get('degree', '')} - {edu.get('major', '')}\n{edu.get('school', '')} ({edu.get('year', '')})"
+        if isinstance(edu, dict) else str(edu)
+        for edu in value
+    ])
+
+def normalize_analysis_field(field: str, value):
+    """Chuẩn hóa 1 field của CVAnalysisResponse (dùng khi stream từng field)"""
+    value = join_structured_field(field, value)
+    return response_parsing.coerce_value(value, CVAnalysisResponse.model_fields[field].annotation)
+
+def gemini_request(prompt: str, model: str, max_tokens: int, stream: bool = False) -> tuple[str, dict]:
+    """(url, kwargs) request Gemini; stream=True dùng streamGenerateContent (SSE)"""
+    method = "streamGenerateContent" if stream else "generateContent"
+    url = f"/v1/models/{model}:{method}"
     
     headers = {"Content-Type": "application/json"}
+    params = {"key": GOOGLE_API_KEY}
+    if stream:
+        params["alt"] = "sse"
     
     data = {
         "contents": [{
@@ -423,54 +1344,22 @@ async def analyze_with_gemini(prompt: str, model: str, job_description: str = ""
         }],
         "generationConfig": {
             "temperature": 0.3,
-            "maxOutputTokens": 2048,
+            "maxOutputTokens": max_tokens,
         }
     }
-    
-    response = requests.post(url, headers=headers, json=data)
+    return url, {"headers": headers, "params": params, "json": data}
+
+async def complete_with_gemini(prompt: str, model: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> str:
+    """Gọi Gemini"""
+    url, kwargs = gemini_request(prompt, model, max_tokens)
+    response = await gateway.post("gemini", model, url, **kwargs)
     response.raise_for_status()
     
     result = response.json()
-    response_text = result["candidates"][0]["content"]["parts"][0]["text"].strip()
-    
-    # Loại bỏ markdown code block
-    if response_text.startswith("```json"):
-        response_text = response_text[7:]
-    if response_text.startswith("```"):
-        response_text = response_text[3:]
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    
-    response_text = response_text.strip()
-    
-    # Clean invalid control characters
-    import re
-    response_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', response_text)
-    
-    try:
-        parsed_result = json.loads(response_text)
-    except json.JSONDecodeError as e:
-        print(f"JSON Parse Error: {e}")
-        print(f"Response text: {response_text[:500]}...")
-        raise HTTPException(status_code=500, detail=f"Lỗi parse JSON từ AI: {str(e)}")
-    
-    # Normalize data - convert arrays to strings if needed
-    if isinstance(parsed_result.get('experience'), list):
-        parsed_result['experience'] = '\n\n'.join([
-            f"{exp.get('title', '')} - {exp.get('company', '')}\n{exp.get('duration', '')}\n{exp.get('description', '')}"
-            for exp in parsed_result['experience']
-        ])
-    
-    if isinstance(parsed_result.get('education'), list):
-        parsed_result['education'] = '\n'.join([
-            f"{edu.get('degree', '')} - {edu.get('major', '')}\n{edu.get('school', '')} ({edu.get('year', '')})"
-            for edu in parsed_result['education']
-        ])
-    
-    return CVAnalysisResponse(**parsed_result)
+    return result["candidates"][0]["content"]["parts"][0]["text"].strip()
 
-async def analyze_with_claude(prompt: str, job_description: str = "") -> CVAnalysisResponse:
-    """Phân tích CV với Claude Sonnet"""
+def claude_request(prompt: str, max_tokens: int, stream: bool = False) -> tuple[str, dict]:
+    """(url, kwargs) request Claude; stream=True nhận kết quả dạng SSE"""
     ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
     
     if not ANTHROPIC_API_KEY or ANTHROPIC_API_KEY == "your_anthropic_api_key_here":
@@ -479,7 +1368,7 @@ async def analyze_with_claude(prompt: str, job_description: str = "") -> CVAnaly
             detail="Claude API key chưa được cấu hình. Vui lòng dùng Gemini models hoặc thêm ANTHROPIC_API_KEY vào file .env"
         )
     
-    url = "https://api.anthropic.com/v1/messages"
+    url = "/v1/messages"
     
     headers = {
         "Content-Type": "application/json",
@@ -489,72 +1378,43 @@ async def analyze_with_claude(prompt: str, job_description: str = "") -> CVAnaly
     
     data = {
         "model": "claude-3-5-sonnet-20241022",
-        "max_tokens": 2048,
+        "max_tokens": max_tokens,
         "temperature": 0.3,
         "messages": [
             {"role": "user", "content": prompt}
         ]
     }
+    if stream:
+        data["stream"] = True
+    return url, {"headers": headers, "json": data}
+
+async def complete_with_claude(prompt: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> str:
+    """Gọi Claude Sonnet"""
+    url, kwargs = claude_request(prompt, max_tokens)
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=60)
+        response = await gateway.post("claude", "claude-sonnet", url, **kwargs)
         
         if response.status_code != 200:
             error_detail = response.json() if response.text else {}
-            print(f"Claude API Error: {response.status_code} - {error_detail}")
+            log.error("Claude API error", extra={"status": response.status_code, "error": error_detail})
             raise HTTPException(
                 status_code=400,
                 detail=f"Claude API error: {error_detail.get('error', {}).get('message', 'Invalid API key or request')}"
             )
         
         result = response.json()
-        response_text = result["content"][0]["text"].strip()
-        
-        # Loại bỏ markdown code block
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        response_text = response_text.strip()
-        
-        # Clean invalid control characters
-        import re
-        response_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', response_text)
-        
-        try:
-            parsed_result = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}")
-            print(f"Response text: {response_text[:500]}...")
-            raise HTTPException(status_code=500, detail=f"Lỗi parse JSON từ AI: {str(e)}")
-        
-        # Normalize data - convert arrays to strings if needed
-        if isinstance(parsed_result.get('experience'), list):
-            parsed_result['experience'] = '\n\n'.join([
-                f"{exp.get('title', '')} - {exp.get('company', '')}\n{exp.get('duration', '')}\n{exp.get('description', '')}"
-                for exp in parsed_result['experience']
-            ])
-        
-        if isinstance(parsed_result.get('education'), list):
-            parsed_result['education'] = '\n'.join([
-                f"{edu.get('degree', '')} - {edu.get('major', '')}\n{edu.get('school', '')} ({edu.get('year', '')})"
-                for edu in parsed_result['education']
-            ])
-        
-        return CVAnalysisResponse(**parsed_result)
+        return result["content"][0]["text"].strip()
     
-    except requests.exceptions.RequestException as e:
-        print(f"Request error: {e}")
+    except httpx.HTTPError as e:
+        log.error("Claude request error", extra={"error": str(e)})
         raise HTTPException(
             status_code=500,
             detail=f"Lỗi kết nối Claude API: {str(e)}"
         )
 
-async def analyze_with_openrouter(prompt: str, model: str, job_description: str = "") -> CVAnalysisResponse:
-    """Phân tích CV với OpenRouter (hỗ trợ nhiều models)"""
+def openrouter_request(prompt: str, model: str, max_tokens: int, stream: bool = False) -> tuple[str, dict]:
+    """(url, kwargs) request OpenRouter; stream=True nhận kết quả dạng SSE"""
     if not OPENROUTER_API_KEY or OPENROUTER_API_KEY == "your_openrouter_api_key_here":
         raise HTTPException(
             status_code=400,
@@ -570,7 +1430,7 @@ async def analyze_with_openrouter(prompt: str, model: str, job_description: str
     
     openrouter_model = model_mapping.get(model, "anthropic/claude-3.5-sonnet")
     
-    url = "https://openrouter.ai/api/v1/chat/completions"
+    url = "/v1/chat/completions"
     
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -588,93 +1448,70 @@ async def analyze_with_openrouter(prompt: str, model: str, job_description: str
             }
         ],
         "temperature": 0.3,
-        "max_tokens": 2048
+        "max_tokens": max_tokens
     }
+    if stream:
+        data["stream"] = True
+    return url, {"headers": headers, "json": data}
+
+async def complete_with_openrouter(prompt: str, model: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> str:
+    """Gọi OpenRouter (hỗ trợ nhiều models)"""
+    url, kwargs = openrouter_request(prompt, model, max_tokens)
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=60)
+        response = await gateway.post("openrouter", model, url, **kwargs)
         
         if response.status_code != 200:
             error_detail = response.json() if response.text else {}
-            print(f"OpenRouter API Error: {response.status_code} - {error_detail}")
+            log.error("OpenRouter API error", extra={"status": response.status_code, "error": error_detail})
             raise HTTPException(
                 status_code=400,
                 detail=f"OpenRouter API error: {error_detail.get('error', {}).get('message', 'Invalid request')}"
             )
         
         result = response.json()
-        response_text = result["choices"][0]["message"]["content"].strip()
-        
-        # Loại bỏ markdown code block
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        response_text = response_text.strip()
-        
-        # Clean invalid control characters
-        import re
-        response_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', response_text)
-        
-        try:
-            parsed_result = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}")
-            print(f"Response text: {response_text[:500]}...")
-            raise HTTPException(status_code=500, detail=f"Lỗi parse JSON từ AI: {str(e)}")
-        
-        # Normalize data
-        if isinstance(parsed_result.get('experience'), list):
-            parsed_result['experience'] = '\n\n'.join([
-                f"{exp.get('title', '')} - {exp.get('company', '')}\n{exp.get('duration', '')}\n{exp.get('description', '')}"
-                for exp in parsed_result['experience']
-            ])
-        
-        if isinstance(parsed_result.get('education'), list):
-            parsed_result['education'] = '\n'.join([
-                f"{edu.get('degree', '')} - {edu.get('major', '')}\n{edu.get('school', '')} ({edu.get('year', '')})"
-                for edu in parsed_result['education']
-            ])
-        
-        return CVAnalysisResponse(**parsed_result)
+        return result["choices"][0]["message"]["content"].strip()
     
-    except requests.exceptions.RequestException as e:
-        print(f"Request error: {e}")
+    except httpx.HTTPError as e:
+        log.error("OpenRouter request error", extra={"error": str(e)})
         raise HTTPException(
             status_code=500,
             detail=f"Lỗi kết nối OpenRouter API: {str(e)}"
         )
 
-def extract_text_from_pdf(content: bytes) -> str:
-    """Extract text từ PDF"""
-    import io
-    from PyPDF2 import PdfReader
-    
-    pdf_file = io.BytesIO(content)
-    reader = PdfReader(pdf_file)
-    
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
+async def stream_provider(prompt: str, model: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> AsyncIterator[str]:
+    """Gửi prompt với streaming API của provider, yield từng đoạn text ngay khi nhận được"""
+    provider = gateway.provider_for_model(model)
+    if provider == "gemini":
+        url, kwargs = gemini_request(prompt, model, max_tokens, stream=True)
+    elif model == "claude-sonnet":
+        url, kwargs = claude_request(prompt, max_tokens, stream=True)
+    elif provider == "openrouter":
+        url, kwargs = openrouter_request(prompt, model, max_tokens, stream=True)
+    else:
+        raise HTTPException(status_code=400, detail=f"Model không hỗ trợ: {model}")
     
-    return text
+    async with gateway.stream(provider, model, url, **kwargs) as response:
+        if response.status_code != 200:
+            await response.aread()
+            log.error("Provider stream error", extra={
+                "provider": provider, "status": response.status_code, "error": response.text[:500]
+            })
+            raise HTTPException(status_code=502, detail=f"{provider} API error: HTTP {response.status_code}")
+        
+        async for data in streaming.iter_sse_data(response):
+            event = json.loads(data)
+            if provider == "gemini":
+                parts = (event.get("candidates") or [{}])[0].get("content", {}).get("parts") or []
+                text = "".join(part.get("text", "") for part in parts)
+            elif provider == "claude":
+                text = event.get("delta", {}).get("text", "") if event.get("type") == "content_block_delta" else ""
+            else:
+                text = ((event.get("choices") or [{}])[0].get("delta") or {}).get("content") or ""
+            if text:
+                yield text
 
-def extract_text_from_docx(content: bytes) -> str:
-    """Extract text từ DOCX"""
-    import io
-    from docx import Document
-    
-    docx_file = io.BytesIO(content)
-    doc = Document(docx_file)
-    
-    text = ""
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-    
-    return text
+warmup.mark_imported(time.perf_counter() - _IMPORT_START)
 
 if __name__ == "__main__":
     import uvicorn
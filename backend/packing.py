@@ -0,0 +1,71 @@
+"""
+Gộp nhiều CV ngắn vào 1 request AI (packed mode).
+
+Mỗi request chỉ trả phần hướng dẫn + JSON schema 1 lần cho cả nhóm CV,
+AI trả về JSON array, kết quả được tách lại theo từng CV.
+"""
+import os
+from typing import Any, Optional
+
+# Tổng token text CV tối đa trong 1 request packed
+PACK_TOKEN_BUDGET = int(os.getenv("PACK_TOKEN_BUDGET", "6000"))
+# Số CV tối đa trong 1 request packed
+PACK_MAX_CVS = int(os.getenv("PACK_MAX_CVS", "5"))
+# CV dài hơn số token này được phân tích riêng (không pack)
+PACK_MAX_CV_TOKENS = int(os.getenv("PACK_MAX_CV_TOKENS", "1500"))
+# Giới hạn token output của 1 request packed
+PACK_MAX_OUTPUT_TOKENS = int(os.getenv("PACK_MAX_OUTPUT_TOKENS", "8192"))
+
+
+def plan_packs(
+    token_counts: list[int],
+    budget: int = PACK_TOKEN_BUDGET,
+    max_items: int = PACK_MAX_CVS,
+    max_item_tokens: int = PACK_MAX_CV_TOKENS,
+) -> tuple[list[list[int]], list[int]]:
+    """
+    Chia CV thành các nhóm (first-fit theo thứ tự input) sao cho tổng token <= budget.
+    Trả về (các nhóm index, index CV phân tích riêng). Nhóm chỉ có 1 CV được tính là riêng.
+    """
+    packs: list[list[int]] = []
+    pack_tokens: list[int] = []
+    singles: list[int] = []
+
+    for index, tokens in enumerate(token_counts):
+        if tokens > max_item_tokens or max_items < 2:
+            singles.append(index)
+            continue
+        for slot, pack in enumerate(packs):
+            if len(pack) < max_items and pack_tokens[slot] + tokens <= budget:
+                pack.append(index)
+                pack_tokens[slot] += tokens
+                break
+        else:
+            packs.append([index])
+            pack_tokens.append(tokens)
+
+    singles.extend(pack[0] for pack in packs if len(pack) == 1)
+    return [pack for pack in packs if len(pack) > 1], sorted(singles)
+
+
+def split_results(parsed: Any, count: int, truncated: bool = False) -> list[Optional[dict]]:
+    """
+    Tách JSON array của AI thành kết quả từng CV (theo "cv_index" nếu có, không thì theo thứ tự).
+    Phần tử thiếu / sai kiểu là None (cần phân tích lại riêng).
+    truncated: response bị cắt (chạm PACK_MAX_OUTPUT_TOKENS) -> object cuối đang viết dở, bỏ qua.
+    """
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results") or parsed.get("analyses") or [parsed]
+    if not isinstance(parsed, list):
+        return [None] * count
+
+    results: list[Optional[dict]] = [None] * count
+    items = [item for item in parsed if isinstance(item, dict)]
+    if truncated:
+        items = items[:-1]
+    indexed = all(isinstance(item.get("cv_index"), int) for item in items)
+    for position, item in enumerate(items):
+        index = item.get("cv_index") if indexed else position
+        if 0 <= index < count and results[index] is None:
+            results[index] = item
+    return results
@@ -0,0 +1,336 @@
+"""
+Parse response JSON của AI: tách JSON, sửa lỗi thường gặp, ép kiểu theo model.
+
+Sửa được (không cần gọi lại AI):
+- markdown code block / text thừa trước và sau JSON
+- dấu phẩy thừa trước } ], thiếu dấu phẩy giữa các phần tử
+- ký tự điều khiển / xuống dòng trong string, dấu " không escape trong string
+- True / False / None kiểu Python
+- response bị cắt giữa chừng (vd. chạm maxOutputTokens): đóng string và ngoặc còn mở
+"""
+import re
+import json
+import threading
+from collections import Counter
+from typing import Any, Union, get_args, get_origin
+
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_SCALAR_RE = re.compile(r'[^\s,\[\]{}":]+')
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+# Sau `",` của 1 value: phần tiếp theo phải là key mới (object) / value mới (array), hoặc hết text
+_NEXT_KEY_RE = re.compile(r'\s*(?:"(?:[^"\\\n]|\\.)*(?:"\s*:|$)|[}\]]|$)')
+_NEXT_VALUE_RE = re.compile(r'\s*(?:["{\[\]]|-?\d|(?:true|false|null|True|False|None)\b|$)')
+
+_stats_lock = threading.Lock()
+_stats = {"parsed": 0, "repaired": 0, "failed": 0, "coerced_fields": 0}
+_repairs: Counter = Counter()
+
+
+class ResponseParseError(ValueError):
+    pass
+
+
+class IncompleteResponseError(ResponseParseError):
+    """Response parse được nhưng bị cắt hoặc thiếu trường bắt buộc (không được cache)"""
+
+
+def extract_json(text: str) -> str:
+    """Lấy phần JSON (object hoặc array) trong response, bỏ code block và text thừa"""
+    text = _FENCE_RE.sub("", text).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ResponseParseError("Không tìm thấy JSON trong response")
+    return text[min(starts):]
+
+
+def repair_json(text: str) -> tuple[str, list[str]]:
+    """
+    Sửa JSON lỗi trong 1 lượt quét (theo dõi ngoặc và trạng thái key/value).
+    Trả về (json đã sửa, danh sách loại lỗi đã sửa).
+    """
+    out: list[str] = []
+    repairs: list[str] = []
+    # Mỗi phần tử: [ngoặc mở, trạng thái]. Object: key/colon/value/comma, array: value/comma
+    stack: list[list[str]] = []
+    # Vị trí cắt an toàn khi bị truncate: (độ dài out, các ngoặc còn mở)
+    safe_cut: tuple[int, str] = (0, "")
+    done = False
+    i = 0
+    n = len(text)
+
+    def closers() -> str:
+        return "".join(_CLOSERS[bracket] for bracket, _ in reversed(stack))
+
+    def value_done() -> None:
+        nonlocal done
+        if stack:
+            stack[-1][1] = "comma"
+        else:
+            done = True
+
+    while i < n and not done:
+        char = text[i]
+
+        if char in " \t\r\n":
+            out.append(char)
+            i += 1
+            continue
+
+        # Thiếu dấu phẩy giữa 2 phần tử
+        if stack and stack[-1][1] == "comma" and char not in ",}]:":
+            safe_cut = (len(out), closers())
+            out.append(",")
+            stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+            repairs.append("missing_comma")
+
+        if char == '"':
+            is_key = bool(stack) and stack[-1][0] == "{" and stack[-1][1] == "key"
+            context = "key" if is_key else stack[-1][0] if stack else ""
+            i, closed = _read_string(text, i, out, repairs, context)
+            if not closed:
+                out.append('"')
+                repairs.append("unterminated_string")
+                if is_key:
+                    break
+            if is_key:
+                stack[-1][1] = "colon"
+            else:
+                value_done()
+            continue
+
+        if char in "{[":
+            stack.append([char, "key" if char == "{" else "value"])
+            out.append(char)
+            safe_cut = (len(out), closers())
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repairs.append("trailing_comma")
+            if not stack:
+                break
+            stack.pop()
+            out.append(char)
+            value_done()
+        elif char == ",":
+            if stack and stack[-1][1] == "comma":
+                safe_cut = (len(out), closers())
+                out.append(char)
+                stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+            else:
+                repairs.append("extra_comma")
+        elif char == ":":
+            out.append(char)
+            if stack and stack[-1][1] == "colon":
+                stack[-1][1] = "value"
+        else:
+            match = _SCALAR_RE.match(text, i)
+            token = match.group()
+            if token in _PY_LITERALS:
+                token = _PY_LITERALS[token]
+                repairs.append("python_literal")
+            out.append(token)
+            i = match.end()
+            value_done()
+            continue
+        i += 1
+
+    if stack:
+        repairs.append("truncated")
+        candidate = "".join(out) + closers()
+        try:
+            json.loads(candidate)
+            return candidate, repairs
+        except json.JSONDecodeError:
+            length, cut_closers = safe_cut
+            return "".join(out[:length]) + cut_closers, repairs
+
+    return "".join(out), repairs
+
+
+def _read_string(text: str, i: int, out: list[str], repairs: list[str], context: str = "") -> tuple[int, bool]:
+    """
+    Đọc string bắt đầu tại text[i] == '"', escape ký tự điều khiển và dấu " nằm trong nội dung.
+    context: "key", "{" (value trong object), "[" (phần tử array) hoặc "" (gốc).
+    Trả về (vị trí tiếp theo, đã đóng)
+    """
+    out.append('"')
+    i += 1
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if char == "\\" and i + 1 < n:
+            out.append(text[i:i + 2])
+            i += 2
+            continue
+        if char == '"':
+            if _closes_string(text, i + 1, context):
+                out.append('"')
+                return i + 1, True
+            out.append('\\"')
+            repairs.append("unescaped_quote")
+        elif char < " " or "\x7f" <= char <= "\x9f":
+            out.append(_ESCAPES.get(char, " "))
+            repairs.append("control_char")
+        else:
+            out.append(char)
+        i += 1
+    return i, False
+
+
+def _closes_string(text: str, i: int, context: str) -> bool:
+    """
+    Dấu " ngay trước text[i] có phải dấu đóng string không.
+    Đóng khi theo sau là } ] " xuống dòng / hết text, : (với key), hoặc , mà sau đó là key mới
+    (value trong object) / value mới (phần tử array). Vd. "say "yes", then" -> "yes", không đóng string.
+    """
+    n = len(text)
+    while i < n and text[i] in " \t":
+        i += 1
+    if i >= n:
+        return True
+    char = text[i]
+    if char in '}]"\r\n':
+        return True
+    if char == ":":
+        return context in ("key", "")
+    if char == ",":
+        if context == "{":
+            return bool(_NEXT_KEY_RE.match(text, i + 1))
+        if context == "[":
+            return bool(_NEXT_VALUE_RE.match(text, i + 1))
+        return True
+    return False
+
+
+def parse_json(text: str) -> tuple[Any, list[str]]:
+    """Parse JSON từ response của AI, tự sửa lỗi nếu json.loads thất bại. Trả về (kết quả, các lỗi đã sửa)"""
+    try:
+        raw = extract_json(text)
+        try:
+            result = json.loads(raw)
+            repairs = []
+        except json.JSONDecodeError:
+            repaired, repairs = repair_json(raw)
+            result = json.loads(repaired)
+    except (ValueError, json.JSONDecodeError) as e:
+        _record(failed=True)
+        raise ResponseParseError(str(e)) from e
+
+    _record(repairs=repairs)
+    return result, repairs
+
+
+def check_complete(data: dict, repairs: list[str], required: tuple = (), any_of: tuple = ()) -> None:
+    """
+    Raise IncompleteResponseError nếu response bị cắt (repair "truncated"), thiếu field trong required,
+    hoặc mọi field trong any_of đều rỗng. Kiểm tra trước coerce_fields (coerce điền giá trị rỗng cho field thiếu).
+    """
+    if "truncated" in repairs:
+        raise IncompleteResponseError("Response bị cắt giữa chừng")
+    missing = [name for name in required if data.get(name) is None]
+    if any_of and not any(data.get(name) for name in any_of):
+        missing.append(" / ".join(any_of))
+    if missing:
+        raise IncompleteResponseError(f"Response thiếu trường: {', '.join(missing)}")
+
+
+def coerce_fields(data: dict, model) -> dict:
+    """
+    Ép kiểu từng field theo pydantic model (str / int / float / list[str]),
+    field thiếu dùng giá trị mặc định, field lạ bị bỏ.
+    """
+    result = {}
+    coerced = 0
+    for name, field in model.model_fields.items():
+        if name not in data or data[name] is None:
+            if field.is_required():
+                result[name] = _empty_value(field.annotation)
+                coerced += 1
+            continue
+        value = data[name]
+        new_value = coerce_value(value, field.annotation)
+        coerced += new_value is not value
+        result[name] = new_value
+
+    if coerced:
+        with _stats_lock:
+            _stats["coerced_fields"] += coerced
+    return result
+
+
+def coerce_value(value: Any, annotation) -> Any:
+    """Ép 1 giá trị về kiểu annotation (str / int / float / list[str])"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+        origin = get_origin(annotation)
+
+    if origin is list or annotation is list:
+        if isinstance(value, list):
+            if all(isinstance(item, str) for item in value):
+                return value
+            items = [item for item in value if item is not None]
+        elif isinstance(value, str):
+            items = [item.strip() for item in re.split(r"[,\n;]", value) if item.strip()]
+        else:
+            items = [value]
+        return [_to_str(item) for item in items]
+
+    if annotation is str:
+        return value if isinstance(value, str) else _to_str(value)
+
+    if annotation in (int, float):
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            return value if isinstance(value, annotation) else annotation(value)
+        match = _NUMBER_RE.search(str(value))
+        return annotation(float(match.group())) if match else annotation(0)
+
+    return value
+
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " - ".join(_to_str(item) for item in value.values() if item not in (None, ""))
+    if isinstance(value, list):
+        return ", ".join(_to_str(item) for item in value)
+    return "" if value is None else str(value)
+
+
+def _empty_value(annotation) -> Any:
+    if get_origin(annotation) is list or annotation is list:
+        return []
+    if annotation in (int, float):
+        return annotation(0)
+    return ""
+
+
+def _record(repairs: list[str] = (), failed: bool = False) -> None:
+    with _stats_lock:
+        if failed:
+            _stats["failed"] += 1
+            return
+        _stats["parsed"] += 1
+        if repairs:
+            _stats["repaired"] += 1
+            _repairs.update(set(repairs))
+
+
+def get_stats() -> dict:
+    """Thống kê parse: số response parse được, phải sửa, thất bại, theo loại lỗi"""
+    with _stats_lock:
+        total = _stats["parsed"] + _stats["failed"]
+        return {
+            **_stats,
+            "repair_rate": round(_stats["repaired"] / total, 4) if total else 0.0,
+            "failure_rate": round(_stats["failed"] / total, 4) if total else 0.0,
+            "repairs": dict(_repairs),
+        }
@@ -0,0 +1,192 @@
+"""
+Routing tự động giữa các model (model=auto).
+
+Theo dõi latency p50/p95 và tỉ lệ lỗi gần đây của từng model, gửi request tới
+model nhanh nhất còn khỏe, tự chuyển sang model kế tiếp khi lỗi hoặc timeout.
+Có thể bật hedged request: gửi thêm request tới model thứ 2 nếu model đầu chậm.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import gateway
+import telemetry
+
+log = telemetry.get_logger("routing")
+
+AUTO_MODEL = "auto"
+# Các model được dùng cho chế độ auto (theo thứ tự ưu tiên khi chưa có số liệu)
+AUTO_MODELS = [m.strip() for m in os.getenv("AUTO_MODELS", "gemini-2.0-flash,gemini-2.5-flash,openrouter-llama").split(",") if m.strip()]
+# Timeout mỗi lần thử 1 model trước khi chuyển sang model khác, tính từ lúc request được gửi tới provider
+# (không tính thời gian chờ semaphore / rate limit phía app)
+AUTO_MODEL_TIMEOUT = float(os.getenv("AUTO_MODEL_TIMEOUT", "30"))
+# Sau bao nhiêu giây thì gửi hedged request tới model thứ 2 (0 = tắt)
+AUTO_HEDGE_DELAY = float(os.getenv("AUTO_HEDGE_DELAY", "0"))
+# Model có tỉ lệ lỗi cao hơn ngưỡng này bị coi là không khỏe
+AUTO_MAX_ERROR_RATE = float(os.getenv("AUTO_MAX_ERROR_RATE", "0.5"))
+STATS_WINDOW = int(os.getenv("AUTO_STATS_WINDOW", "50"))
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+# model -> deque[(latency_seconds, ok)]
+_samples: dict[str, deque] = {}
+# Provider đã cấu hình API key (set_providers), None = dùng mọi model trong AUTO_MODELS
+_providers: Optional[set[str]] = None
+# Timeout của lần thử hiện tại trong route(), track() áp dụng khi request được gửi đi
+_attempt_timeout: ContextVar[Optional[float]] = ContextVar("attempt_timeout", default=None)
+
+
+def set_providers(providers: list[str]) -> None:
+    """Chỉ route tới model của các provider đã có API key (gọi khi app startup)"""
+    global _providers
+    _providers = set(providers)
+
+
+def auto_models() -> list[str]:
+    """Các model trong AUTO_MODELS thuộc provider đã cấu hình"""
+    if _providers is None:
+        return list(AUTO_MODELS)
+    return [model for model in AUTO_MODELS if gateway.provider_for_model(model) in _providers]
+
+
+def record(model: str, latency: float, ok: bool) -> None:
+    with _lock:
+        _samples.setdefault(model, deque(maxlen=STATS_WINDOW)).append((latency, ok))
+
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def model_stats(model: str) -> dict:
+    """p50/p95 latency (chỉ tính request thành công) và tỉ lệ lỗi gần đây"""
+    with _lock:
+        samples = list(_samples.get(model, ()))
+    latencies = [latency for latency, ok in samples if ok]
+    p50 = _percentile(latencies, 0.5)
+    p95 = _percentile(latencies, 0.95)
+    return {
+        "samples": len(samples),
+        "p50": round(p50, 3) if p50 is not None else None,
+        "p95": round(p95, 3) if p95 is not None else None,
+        "error_rate": round(sum(1 for _, ok in samples if not ok) / len(samples), 4) if samples else 0.0,
+    }
+
+
+def _is_healthy(model: str, stats: dict) -> bool:
+    circuit = gateway.circuit_state(gateway.provider_for_model(model), model)
+    return circuit != "open" and stats["error_rate"] <= AUTO_MAX_ERROR_RATE
+
+
+def rank_models() -> list[str]:
+    """Model khỏe xếp theo p95 tăng dần (model chưa có số liệu được thử trước), model không khỏe để cuối"""
+    models = auto_models()
+    stats = {model: model_stats(model) for model in models}
+    healthy = [m for m in models if _is_healthy(m, stats[m])]
+    unhealthy = [m for m in models if m not in healthy]
+    healthy.sort(key=lambda m: stats[m]["p95"] or 0.0)
+    return healthy + unhealthy
+
+
+async def track(model: str, awaitable: Awaitable[T]) -> T:
+    """
+    Đo latency 1 lời gọi model và ghi vào thống kê (bỏ qua nếu bị hủy).
+    Latency và timeout của route() tính từ lúc gateway gửi request đầu tiên,
+    nên gọi track bên trong semaphore của provider.
+    """
+    timeout = _attempt_timeout.get()
+    start = time.monotonic()
+    sent = False
+
+    def on_send() -> None:
+        nonlocal start, sent
+        if sent:
+            return
+        sent = True
+        start = time.monotonic()
+        if timeout is not None:
+            deadline.reschedule(asyncio.get_running_loop().time() + timeout)
+
+    token = gateway.on_send.set(on_send)
+    try:
+        async with asyncio.timeout(None) as deadline:
+            result = await awaitable
+    except TimeoutError:
+        if not deadline.expired():
+            record(model, time.monotonic() - start, False)
+            raise
+        record(model, timeout, False)
+        raise TimeoutError(f"{model} quá {timeout:.0f}s")
+    except Exception:
+        record(model, time.monotonic() - start, False)
+        raise
+    finally:
+        gateway.on_send.reset(token)
+    record(model, time.monotonic() - start, True)
+    return result
+
+
+async def _attempt(call: Callable[[str], Awaitable[T]], model: str) -> T:
+    """call(model) phải gọi provider qua track() để áp dụng AUTO_MODEL_TIMEOUT"""
+    token = _attempt_timeout.set(AUTO_MODEL_TIMEOUT)
+    try:
+        return await call(model)
+    finally:
+        _attempt_timeout.reset(token)
+
+
+async def _hedged(call: Callable[[str], Awaitable[T]], primary: str, secondary: str) -> T:
+    """Gửi tới primary, nếu sau AUTO_HEDGE_DELAY chưa xong thì gửi thêm tới secondary, lấy kết quả đầu tiên"""
+    tasks = {asyncio.create_task(_attempt(call, primary))}
+    done, _ = await asyncio.wait(tasks, timeout=AUTO_HEDGE_DELAY)
+    if not done or next(iter(done)).exception() is not None:
+        log.info("Hedging request", extra={"primary": primary, "secondary": secondary})
+        tasks.add(asyncio.create_task(_attempt(call, secondary)))
+
+    pending = set(tasks)
+    last_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def route(call: Callable[[str], Awaitable[T]]) -> T:
+    """Gọi call(model) theo thứ tự rank_models(), failover sang model kế tiếp khi lỗi"""
+    ranked = rank_models()
+    if not ranked:
+        raise RuntimeError("Không có model nào cho chế độ auto (AUTO_MODELS, cần API key của provider)")
+
+    last_error: Optional[BaseException] = None
+    i = 0
+    while i < len(ranked):
+        try:
+            if AUTO_HEDGE_DELAY > 0 and i + 1 < len(ranked):
+                return await _hedged(call, ranked[i], ranked[i + 1])
+            return await _attempt(call, ranked[i])
+        except Exception as e:
+            log.warning("Auto routing failover", extra={"model": ranked[i], "error": str(e)})
+            last_error = e
+        i += 2 if AUTO_HEDGE_DELAY > 0 and i + 1 < len(ranked) else 1
+
+    raise last_error
+
+
+def stats() -> dict:
+    """Thống kê routing của các model"""
+    return {model: model_stats(model) for model in auto_models()}
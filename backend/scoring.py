@@ -0,0 +1,209 @@
+"""
+Chấm điểm sơ bộ CV theo JD ngay trên server (không gọi AI, chạy bằng NumPy).
+
+Điểm = kết hợp của:
+- Độ phủ kỹ năng: từ điển kỹ năng (có alias) -> vector nhị phân, so khớp kỹ năng JD
+- BM25: độ liên quan của CV với các từ khóa trong JD, tính trên cả tập ứng viên
+- Độ phủ từ khóa: tỉ lệ từ khóa JD xuất hiện trong CV
+
+NumPy được import lazy (chỉ endpoint có top_k / prescore cần) để app start nhanh hơn.
+"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Kỹ năng -> các alias (lowercase) dùng để nhận diện trong text
+SKILL_ALIASES = {
+    "Python": ["python"],
+    "Java": ["java"],
+    "JavaScript": ["javascript", "js", "es6"],
+    "TypeScript": ["typescript", "ts"],
+    "Go": ["golang", "go lang"],
+    "Rust": ["rust"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    ".NET": [".net", "dotnet", "asp.net"],
+    "PHP": ["php"],
+    "Ruby": ["ruby", "rails", "ruby on rails"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift"],
+    "React": ["react", "reactjs", "react.js"],
+    "Next.js": ["next.js", "nextjs"],
+    "Vue": ["vue", "vuejs", "vue.js", "nuxt"],
+    "Angular": ["angular", "angularjs"],
+    "Node.js": ["node.js", "nodejs", "node"],
+    "Express": ["express", "expressjs"],
+    "NestJS": ["nestjs", "nest.js"],
+    "HTML/CSS": ["html", "css", "html5", "css3", "sass", "scss"],
+    "Tailwind": ["tailwind", "tailwindcss"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring": ["spring", "spring boot", "springboot"],
+    "Laravel": ["laravel"],
+    "SQL": ["sql"],
+    "PostgreSQL": ["postgresql", "postgres"],
+    "MySQL": ["mysql", "mariadb"],
+    "SQL Server": ["sql server", "mssql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Elasticsearch": ["elasticsearch", "elastic search", "opensearch"],
+    "Kafka": ["kafka"],
+    "RabbitMQ": ["rabbitmq"],
+    "Docker": ["docker", "container", "containers"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "AWS": ["aws", "amazon web services", "ec2", "s3", "lambda"],
+    "GCP": ["gcp", "google cloud"],
+    "Azure": ["azure"],
+    "Terraform": ["terraform"],
+    "CI/CD": ["ci/cd", "cicd", "jenkins", "github actions", "gitlab ci"],
+    "Git": ["git", "github", "gitlab"],
+    "Linux": ["linux", "ubuntu", "unix", "bash", "shell"],
+    "REST API": ["rest", "restful", "rest api"],
+    "GraphQL": ["graphql"],
+    "gRPC": ["grpc"],
+    "Microservices": ["microservices", "microservice"],
+    "Machine Learning": ["machine learning", "ml"],
+    "Deep Learning": ["deep learning"],
+    "NLP": ["nlp", "natural language processing"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch"],
+    "scikit-learn": ["scikit-learn", "sklearn"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "Spark": ["spark", "pyspark"],
+    "Airflow": ["airflow"],
+    "Power BI": ["power bi", "powerbi"],
+    "Tableau": ["tableau"],
+    "Excel": ["excel"],
+    "Figma": ["figma"],
+    "Android": ["android"],
+    "iOS": ["ios"],
+    "Flutter": ["flutter", "dart"],
+    "React Native": ["react native"],
+    "Agile/Scrum": ["agile", "scrum", "kanban"],
+    "Testing": ["unit test", "unit testing", "pytest", "jest", "junit", "selenium", "tdd"],
+    "English": ["english", "tiếng anh", "ielts", "toeic"],
+}
+SKILL_NAMES = list(SKILL_ALIASES)
+_SKILL_PATTERNS = [
+    re.compile(
+        r"(?<![\w.+#])(?:" + "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True)) + r")(?![\w+#])",
+        re.IGNORECASE
+    )
+    for aliases in SKILL_ALIASES.values()
+]
+
+_WORD_RE = re.compile(r"[\w+#.]+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "and", "or", "the", "of", "to", "in", "for", "with", "on", "at", "by", "as", "is", "are", "be",
+    "we", "you", "our", "your", "will", "can", "from", "this", "that", "it", "have", "has", "who", "etc",
+    "và", "của", "các", "có", "cho", "với", "là", "trong", "được", "một", "những", "về", "khi", "để",
+    "ứng", "viên", "yêu", "cầu", "công", "việc", "kinh", "nghiệm", "năm",
+}
+
+# Trọng số các thành phần điểm
+WEIGHT_SKILLS = 0.5
+WEIGHT_BM25 = 0.35
+WEIGHT_KEYWORDS = 0.15
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = (token.strip(".").lower() for token in _WORD_RE.findall(text))
+    return [token for token in tokens if len(token) > 1 and token not in STOPWORDS]
+
+
+def skill_vector(text: str) -> np.ndarray:
+    """Vector nhị phân: kỹ năng nào trong từ điển xuất hiện trong text"""
+    import numpy as np
+
+    return np.fromiter((bool(pattern.search(text)) for pattern in _SKILL_PATTERNS), dtype=bool, count=len(_SKILL_PATTERNS))
+
+
+def bm25_scores(query_terms: list[str], documents: list[list[str]]) -> np.ndarray:
+    """Điểm BM25 của mỗi document với query (tính vector hóa trên ma trận term x doc)"""
+    import numpy as np
+
+    if not documents or not query_terms:
+        return np.zeros(len(documents))
+
+    terms = list(dict.fromkeys(query_terms))
+    term_index = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros((len(terms), len(documents)), dtype=np.float64)
+    for j, doc in enumerate(documents):
+        for term, count in Counter(doc).items():
+            i = term_index.get(term)
+            if i is not None:
+                tf[i, j] = count
+
+    doc_len = np.array([len(doc) for doc in documents], dtype=np.float64)
+    avg_len = doc_len.mean() or 1.0
+    df = (tf > 0).sum(axis=1)
+    n = len(documents)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    denom = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len)
+    return (idf[:, None] * tf * (BM25_K1 + 1) / np.where(denom == 0, 1, denom)).sum(axis=0)
+
+
+def rank_candidates(cv_texts: list[str], job_description: str) -> list[dict]:
+    """
+    Chấm điểm và xếp hạng CV theo JD.
+    Trả về list theo thứ tự input, mỗi phần tử có score (0-100), rank và chi tiết.
+    """
+    import numpy as np
+
+    if not cv_texts:
+        return []
+
+    jd_skills = skill_vector(job_description)
+    cv_skills = np.vstack([skill_vector(text) for text in cv_texts])
+    matched = cv_skills & jd_skills
+    jd_skill_count = int(jd_skills.sum())
+    skill_overlap = matched.sum(axis=1) / jd_skill_count if jd_skill_count else np.zeros(len(cv_texts))
+
+    query_terms = tokenize(job_description)
+    documents = [tokenize(text) for text in cv_texts]
+    bm25 = bm25_scores(query_terms, documents)
+    bm25_max = bm25.max() if len(bm25) else 0
+    bm25_norm = bm25 / bm25_max if bm25_max > 0 else np.zeros(len(cv_texts))
+
+    query_set = set(query_terms)
+    keyword_coverage = np.array([
+        len(query_set & set(doc)) / len(query_set) if query_set else 0.0
+        for doc in documents
+    ])
+
+    scores = 100 * (WEIGHT_SKILLS * skill_overlap + WEIGHT_BM25 * bm25_norm + WEIGHT_KEYWORDS * keyword_coverage)
+    ranks = np.empty(len(cv_texts), dtype=int)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(cv_texts) + 1)
+
+    results = []
+    for i in range(len(cv_texts)):
+        results.append({
+            "score": round(float(scores[i]), 2),
+            "rank": int(ranks[i]),
+            "skill_overlap": round(float(skill_overlap[i]), 4),
+            "bm25": round(float(bm25[i]), 4),
+            "keyword_coverage": round(float(keyword_coverage[i]), 4),
+            "matching_skills": [SKILL_NAMES[k] for k in np.flatnonzero(matched[i])],
+            "missing_skills": [SKILL_NAMES[k] for k in np.flatnonzero(jd_skills & ~cv_skills[i])],
+        })
+    return results
+
+
+def warm_up() -> None:
+    """Import sẵn NumPy (gọi khi warm-up)"""
+    import numpy  # noqa: F401
+
+
+def shortlist(scores: list[dict], top_k: int) -> set[int]:
+    """Index của top_k CV có rank cao nhất"""
+    return {i for i, score in enumerate(scores) if score["rank"] <= top_k}
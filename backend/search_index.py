@@ -0,0 +1,190 @@
+"""
+Index tìm kiếm ứng viên trên các kết quả phân tích (SQLite).
+
+- Inverted index trên skills / matching_skills
+- Index số trên các cột điểm
+- Full-text (FTS5) trên name, summary, experience, education
+Vd: ứng viên có Kubernetes và overall_score >= 80 -> trả lời trong vài ms.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", "search.db")
+
+SCORE_FIELDS = [
+    "overall_score", "skills_score", "experience_score",
+    "education_score", "soft_skills_score", "match_percentage",
+]
+SORT_FIELDS = set(SCORE_FIELDS) | {"indexed_at"}
+
+
+class CandidateIndex:
+    """Index ứng viên lưu trong SQLite"""
+
+    def __init__(self, db_path: str = SEARCH_DB_PATH):
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        score_columns = ", ".join(f"{field} INTEGER NOT NULL DEFAULT 0" for field in SCORE_FIELDS)
+        self._db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS candidates (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                model TEXT NOT NULL,
+                {score_columns},
+                indexed_at REAL NOT NULL,
+                analysis TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS candidate_skills (
+                skill TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (skill, kind, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_candidate_skills_key ON candidate_skills(key);
+            CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(
+                key UNINDEXED, name, summary, experience, education
+            );
+        """)
+        for field in SCORE_FIELDS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_candidates_{field} ON candidates({field})")
+        self._db.commit()
+
+    @staticmethod
+    def _normalize_skill(skill: str) -> str:
+        return " ".join(skill.lower().split())
+
+    def _delete(self, key: str) -> None:
+        self._db.execute("DELETE FROM candidates WHERE key = ?", (key,))
+        self._db.execute("DELETE FROM candidate_skills WHERE key = ?", (key,))
+        self._db.execute("DELETE FROM candidates_fts WHERE key = ?", (key,))
+
+    def _insert(self, key: str, analysis: dict, model: str) -> None:
+        self._delete(key)
+        self._db.execute(
+            f"INSERT INTO candidates (key, name, email, model, {', '.join(SCORE_FIELDS)}, indexed_at, analysis) "
+            f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in SCORE_FIELDS)}, ?, ?)",
+            (
+                key, analysis.get("name", ""), analysis.get("email", ""), model,
+                *[int(analysis.get(field) or 0) for field in SCORE_FIELDS],
+                time.time(), json.dumps(analysis, ensure_ascii=False),
+            )
+        )
+        skills = {
+            (self._normalize_skill(skill), kind, key)
+            for kind in ("skills", "matching_skills")
+            for skill in analysis.get(kind) or []
+            if isinstance(skill, str) and skill.strip()
+        }
+        self._db.executemany("INSERT OR IGNORE INTO candidate_skills (skill, kind, key) VALUES (?, ?, ?)", skills)
+        self._db.execute(
+            "INSERT INTO candidates_fts (key, name, summary, experience, education) VALUES (?, ?, ?, ?, ?)",
+            (key, analysis.get("name", ""), analysis.get("summary", ""),
+             analysis.get("experience", ""), analysis.get("education", ""))
+        )
+
+    def add(self, key: str, analysis: dict, model: str = "") -> None:
+        """Thêm / cập nhật 1 kết quả phân tích vào index"""
+        with self._lock:
+            self._insert(key, analysis, model)
+            self._db.commit()
+
+    def add_many(self, items: Iterable[tuple[str, dict]], model: str = "") -> int:
+        """Index nhiều kết quả trong 1 transaction, trả về số lượng"""
+        count = 0
+        with self._lock:
+            for key, analysis in items:
+                self._insert(key, analysis, model)
+                count += 1
+            self._db.commit()
+        return count
+
+    def search(
+        self,
+        skills: Optional[list[str]] = None,
+        skill_field: str = "skills",
+        q: str = "",
+        min_scores: Optional[dict[str, int]] = None,
+        sort: str = "overall_score",
+        offset: int = 0,
+        limit: int = 20,
+    ) -> dict:
+        """
+        Tìm ứng viên: có TẤT CẢ skills (trong skills hoặc matching_skills),
+        điểm >= min_scores, khớp full-text q. Sắp xếp giảm dần theo sort.
+        """
+        where = []
+        params: list = []
+
+        for skill in skills or []:
+            where.append("c.key IN (SELECT key FROM candidate_skills WHERE skill = ? AND kind = ?)")
+            params.extend([self._normalize_skill(skill), skill_field])
+
+        for field, value in (min_scores or {}).items():
+            if field in SCORE_FIELDS and value is not None:
+                where.append(f"c.{field} >= ?")
+                params.append(value)
+
+        if q.strip():
+            # Mỗi từ là 1 phrase để tránh lỗi cú pháp FTS5 với ký tự đặc biệt
+            fts_query = " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+            where.append("c.key IN (SELECT key FROM candidates_fts WHERE candidates_fts MATCH ?)")
+            params.append(fts_query)
+
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        sort = sort if sort in SORT_FIELDS else "overall_score"
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM candidates c {where_sql}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT c.key, c.model, c.indexed_at, c.analysis FROM candidates c {where_sql} "
+                f"ORDER BY c.{sort} DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            ).fetchall()
+
+        return {
+            "total": total,
+            "results": [
+                {"key": row["key"], "model": row["model"], "indexed_at": row["indexed_at"],
+                 "analysis": json.loads(row["analysis"])}
+                for row in rows
+            ],
+        }
+
+    def get(self, key: str) -> Optional[dict]:
+        """Kết quả phân tích đã index theo key (None nếu không có)"""
+        with self._lock:
+            row = self._db.execute("SELECT analysis FROM candidates WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["analysis"]) if row else None
+
+    def top_skills(self, limit: int = 50) -> list[dict]:
+        """Các skill phổ biến nhất trong index"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT skill, COUNT(*) AS count FROM candidate_skills WHERE kind = 'skills' "
+                "GROUP BY skill ORDER BY count DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self) -> int:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+            self._db.execute("DELETE FROM candidates")
+            self._db.execute("DELETE FROM candidate_skills")
+            self._db.execute("DELETE FROM candidates_fts")
+            self._db.commit()
+            return count
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,146 @@
+"""
+Single-flight: gộp các request phân tích giống nhau đang chạy đồng thời.
+
+- Trong 1 process: request trùng key chờ chung 1 future.
+- Giữa các uvicorn worker: dùng lease trong SQLite (cùng file với cache),
+  worker không giữ lease thì chờ kết quả xuất hiện trong cache dùng chung.
+"""
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+SINGLEFLIGHT_LEASE_SECONDS = float(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", "120"))
+SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "0.5"))
+
+
+class SingleFlight:
+    """Gộp các lời gọi cùng key thành 1 lời gọi thật"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        lease_seconds: float = SINGLEFLIGHT_LEASE_SECONDS,
+        poll_interval: float = SINGLEFLIGHT_POLL_INTERVAL,
+    ):
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS inflight (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _acquire_lease(self, key: str) -> bool:
+        """Giành lease cho key (hoặc lấy lại lease đã hết hạn)"""
+        if self._db is None:
+            return True
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO inflight (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE inflight.expires_at < ?",
+                (key, self.owner, now + self.lease_seconds, now)
+            )
+            return cursor.rowcount > 0
+
+    def _lease_active(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT expires_at FROM inflight WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] >= time.time()
+
+    def _release_lease(self, key: str) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, self.owner))
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Optional[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Chạy fn() 1 lần cho mỗi key đang in-flight.
+        lookup() đọc kết quả từ cache dùng chung (khi worker khác đang xử lý); được gọi lặp lại
+        mỗi poll_interval nên không nên tính hit/miss (vd. dùng PersistentCache.peek).
+        Trả về (result, shared) - shared=True nếu dùng chung kết quả của request khác.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Request dẫn đầu bị hủy (client ngắt kết nối) -> tự chạy lại
+                if not future.cancelled():
+                    raise
+                return await self.do(key, fn, lookup)
+            self.shared += 1
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            # Worker khác đang xử lý cùng key -> chờ kết quả trong cache dùng chung
+            waited = False
+            while not self._acquire_lease(key):
+                waited = True
+                result = lookup()
+                if result is not None:
+                    self.shared += 1
+                    future.set_result(result)
+                    return result, True
+                if not self._lease_active(key):
+                    continue
+                await asyncio.sleep(self.poll_interval)
+
+            # Worker kia có thể vừa ghi cache rồi nhả lease giữa 2 lần poll
+            result = lookup() if waited else None
+            if result is not None:
+                self._release_lease(key)
+                self.shared += 1
+                future.set_result(result)
+                return result, True
+
+            try:
+                self.calls += 1
+                result = await fn()
+            finally:
+                self._release_lease(key)
+            future.set_result(result)
+            return result, False
+
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                # Tránh warning "exception was never retrieved" khi không có ai chờ
+                future.exception()
+            raise
+
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
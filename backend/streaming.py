@@ -0,0 +1,137 @@
+"""
+Đọc response stream của AI và parse JSON tăng dần.
+
+- iter_sse_data: lấy payload các dòng "data:" của Server-Sent Events
+- IncrementalJSONParser: nhận từng đoạn text, trả về các field cấp 1 của JSON object
+  ngay khi giá trị của field đó đã hoàn chỉnh (không chờ hết response)
+"""
+import json
+from typing import Any, AsyncIterator
+
+import httpx
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """Payload của từng event SSE (bỏ qua comment, dòng trống và [DONE])"""
+    data_lines: list[str] = []
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+        elif not line.strip() and data_lines:
+            data = "\n".join(data_lines)
+            data_lines = []
+            if data != "[DONE]":
+                yield data
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data != "[DONE]":
+            yield data
+
+
+class IncrementalJSONParser:
+    """
+    Parse JSON object theo từng đoạn text.
+    feed(chunk) trả về list (key, value) của các field cấp 1 vừa hoàn chỉnh.
+    Text trước dấu { đầu tiên (vd. ```json) bị bỏ qua.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Trạng thái trong object gốc: key -> colon -> value -> comma
+        self._state = "key"
+        self._key_start = -1
+        self._key = None
+        self._value_start = -1
+        self._done = False
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        self.text += chunk
+        fields: list[tuple[str, Any]] = []
+        text = self.text
+
+        while self._pos < len(text) and not self._done:
+            char = text[self._pos]
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        key = _loads(text[self._key_start:self._pos + 1])
+                        self._key = key if isinstance(key, str) else None
+                        self._state = "colon"
+                    elif self._depth == 1 and self._state == "value":
+                        self._emit(fields, self._pos + 1)
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._key_start = self._pos
+                elif self._depth == 1 and self._state == "value" and self._value_start < 0:
+                    self._value_start = self._pos
+            elif char == ":" and self._depth == 1 and self._state == "colon":
+                self._state = "value"
+                self._value_start = -1
+            elif char in "{[":
+                if self._depth == 1 and self._state == "value" and self._value_start < 0:
+                    self._value_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == "value":
+                    self._emit(fields, self._pos + 1)
+                elif self._depth == 0:
+                    # Đóng object gốc: scalar cuối cùng (nếu có) đã hoàn chỉnh
+                    if self._state == "value" and self._value_start >= 0:
+                        self._emit(fields, self._pos)
+                    self._done = True
+            elif char == "," and self._depth == 1:
+                if self._state == "value" and self._value_start >= 0:
+                    self._emit(fields, self._pos)
+                self._state = "key"
+            elif not char.isspace() and self._depth == 1 and self._state == "value" and self._value_start < 0:
+                # Bắt đầu number / true / false / null
+                self._value_start = self._pos
+            self._pos += 1
+
+        return fields
+
+    def _emit(self, fields: list, end: int) -> None:
+        value = _loads(self.text[self._value_start:end].strip())
+        if self._key is not None and value is not _INVALID:
+            fields.append((self._key, value))
+        self._state = "comma"
+        self._value_start = -1
+
+    @property
+    def done(self) -> bool:
+        """Đã nhận đủ object gốc"""
+        return self._done
+
+
+_INVALID = object()
+
+
+def _loads(text: str) -> Any:
+    try:
+        # strict=False: chấp nhận xuống dòng chưa escape trong string
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return _INVALID
@@ -0,0 +1,291 @@
+"""
+Đo latency, đếm metrics và log có cấu trúc.
+
+- span(stage, model): đo thời gian từng bước (upload, extract, prompt, provider, parse)
+  -> histogram theo stage/model + ghi vào trace của request hiện tại
+- Counter / Histogram xuất dạng Prometheus text tại /metrics (không cần thư viện ngoài)
+- Log JSON 1 dòng/event, tự gắn request_id
+- TelemetryMiddleware: latency mỗi request, log request chậm kèm các span,
+  profiler lấy mẫu (pyinstrument, tùy chọn) cho request chậm
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json | text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Request lâu hơn số giây này được log warning kèm chi tiết span
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "10"))
+# Tỉ lệ request được chạy profiler (0 = tắt, cần cài pyinstrument)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+_trace: ContextVar[Optional[dict]] = ContextVar("trace", default=None)
+
+
+# ---------- Metrics ----------
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Iterable[str], values: Iterable[str], le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # key -> [count theo bucket..., sum, count]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            data = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, data in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, data):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, f'{bound:g}')} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, '+Inf')} {data[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {data[-2]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {data[-1]}")
+        return lines
+
+
+_registry: list = []
+
+
+def counter(name: str, help: str, labelnames: tuple = ()) -> Counter:
+    metric = Counter(name, help, labelnames)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def format_metric(name: str, kind: str, help: str, samples: dict[tuple, float], labelnames: tuple = ()) -> list[str]:
+    """Format metric lấy từ nơi khác (vd. thống kê cache) theo Prometheus text"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for key, value in samples.items():
+        lines.append(f"{name}{_format_labels(labelnames, key)} {value:g}")
+    return lines
+
+
+def render(extra_lines: Iterable[str] = ()) -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = counter("cv_http_requests_total", "Số HTTP request", ("method", "path", "status"))
+HTTP_LATENCY = histogram("cv_http_request_duration_seconds", "Latency HTTP request", ("method", "path"))
+STAGE_LATENCY = histogram("cv_stage_duration_seconds", "Latency từng bước phân tích", ("stage", "model"))
+EXTRACTION_LATENCY = histogram("cv_extraction_duration_seconds", "Latency extract text theo định dạng", ("format",))
+PROVIDER_ERRORS = counter("cv_provider_errors_total", "Số lời gọi provider lỗi", ("model",))
+TOKENS = counter("cv_tokens_total", "Số token (ước lượng) gửi/nhận theo model", ("model", "kind"))
+BYTES = counter("cv_bytes_total", "Số bytes đã xử lý", ("kind",))
+
+
+# ---------- Spans ----------
+
+@contextmanager
+def span(stage: str, model: str = ""):
+    """Đo thời gian 1 bước, ghi vào histogram và trace của request hiện tại"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage, model=model)
+        trace = _trace.get()
+        if trace is not None:
+            spans = trace["spans"]
+            spans[stage] = round(spans.get(stage, 0.0) + elapsed, 4)
+
+
+def request_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace["request_id"] if trace else None
+
+
+# ---------- Logging ----------
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = request_id()
+        if rid:
+            data["request_id"] = rid
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging() -> None:
+    """Cấu hình logger "cv" (gọi 1 lần khi khởi động)"""
+    logger = logging.getLogger("cv")
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"cv.{name}")
+
+
+log = get_logger("http")
+
+
+# ---------- Middleware ----------
+
+class TelemetryMiddleware:
+    """ASGI middleware: request_id, latency mỗi request (tính cả thời gian stream body), profiler cho request chậm"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        rid = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        trace = {"request_id": rid, "spans": {}}
+        token = _trace.set(trace)
+        status = 500
+        profiler = _start_profiler()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, path=path, status=status)
+            HTTP_LATENCY.observe(elapsed, method=method, path=path)
+
+            fields = {
+                "method": method, "path": path, "status": status,
+                "duration_ms": round(elapsed * 1000, 1), "spans": trace["spans"],
+            }
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                profile_path = _stop_profiler(profiler, rid, save=True)
+                if profile_path:
+                    fields["profile"] = profile_path
+                log.warning("slow request", extra=fields)
+            else:
+                _stop_profiler(profiler, rid, save=False)
+                log.info("request", extra=fields)
+            _trace.reset(token)
+
+
+def _start_profiler():
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def _stop_profiler(profiler, rid: str, save: bool) -> Optional[str]:
+    if profiler is None:
+        return None
+    profiler.stop()
+    if not save:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{int(time.time())}-{rid}.html")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(profiler.output_html())
+    return path
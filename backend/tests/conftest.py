@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Module của backend nằm phẳng trong thư mục backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import gc
+import io
+import time
+import asyncio
+import threading
+
+import pytest
+
+import exporter
+
+
+def result(i: int) -> dict:
+    return {"analysis": {"name": f"Ứng viên {i}", "overall_score": i % 100, "skills": ["Python", "SQL"]}}
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_iter_rows_formats_fields():
+    row = next(exporter.iter_rows([result(7)]))
+    assert row[0] == "Ứng viên 7"
+    assert row[3] == 7
+    assert row[8] == "Python, SQL"
+    assert row[1] == ""
+
+
+def test_iter_rows_stops_when_cancelled():
+    cancelled = threading.Event()
+    rows = exporter.iter_rows((result(i) for i in range(10)), cancelled)
+    next(rows)
+    cancelled.set()
+    with pytest.raises(exporter.ExportCancelled):
+        next(rows)
+
+
+def test_stream_csv_has_bom_and_all_rows():
+    text = b"".join(exporter.stream_csv(result(i) for i in range(3))).decode("utf-8")
+    assert text.startswith("﻿Tên,")
+    assert len(text.strip().splitlines()) == 4
+
+
+def test_stream_xlsx_produces_workbook():
+    from openpyxl import load_workbook
+
+    data = asyncio.run(collect(exporter.stream_xlsx([result(i) for i in range(50)])))
+    sheet = load_workbook(io.BytesIO(data), read_only=True).active
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0][0] == "Tên"
+    assert len(rows) == 51
+
+
+# openpyxl báo lỗi khi đóng các generator ghi XML dở dang (workbook bị bỏ giữa chừng)
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnraisableExceptionWarning")
+def test_stream_xlsx_stops_producer_when_client_disconnects(monkeypatch):
+    monkeypatch.setattr(exporter, "QUEUE_POLL_SECONDS", 0.05)
+    consumed = []
+
+    def results():
+        for i in range(10 ** 7):
+            consumed.append(i)
+            yield result(i)
+
+    async def run():
+        # Write-only workbook chỉ ghi zip khi save, client ngắt trước khi nhận byte đầu tiên
+        task = asyncio.create_task(collect(exporter.stream_xlsx(results())))
+        while len(consumed) < 1000:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    threads_before = threading.active_count()
+    asyncio.run(run())
+    # Thread tạo file có thể đọc thêm 1 dòng trước khi thấy cờ cancelled
+    time.sleep(0.3)
+    count = len(consumed)
+    time.sleep(0.3)
+    gc.collect()
+    # Thread tạo file đã dừng, không đọc thêm dòng nào
+    assert len(consumed) == count
+    assert count < 10 ** 7
+    assert threading.active_count() <= threads_before
+
+
+def test_concurrent_xlsx_exports_do_not_need_executor_threads(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(exporter, "MAX_PENDING_CHUNKS", 2)
+    monkeypatch.setattr(exporter, "CHUNK_SIZE", 1024)
+
+    async def run():
+        # Default executor chỉ 1 thread: export không được chiếm nó, to_thread khác vẫn chạy được
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+        exports = [asyncio.create_task(collect(exporter.stream_xlsx([result(i) for i in range(2000)]))) for _ in range(3)]
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: "free"), timeout=5) == "free"
+        return await asyncio.wait_for(asyncio.gather(*exports), timeout=30)
+
+    for data in asyncio.run(run()):
+        assert data.startswith(b"PK")
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import extraction
+
+
+@pytest.fixture
+def cpus(monkeypatch, tmp_path):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+    cpu_max = tmp_path / "cpu.max"
+    monkeypatch.setattr(extraction, "_CGROUP_CPU_MAX", str(cpu_max))
+    return cpu_max
+
+
+def test_available_cpus_uses_cgroup_quota(cpus):
+    cpus.write_text("150000 100000\n")
+    assert extraction.available_cpus() == 2
+
+
+def test_available_cpus_without_quota(cpus):
+    assert extraction.available_cpus() == 16
+    cpus.write_text("max 100000\n")
+    assert extraction.available_cpus() == 16
+
+
+def test_fractional_quota_still_gets_one_cpu(cpus):
+    cpus.write_text("10000 100000\n")
+    assert extraction.available_cpus() == 1
+
+
+def test_normalize_text_keeps_page_breaks():
+    text = extraction.normalize_text("Trang 1  \r\n\n" + extraction.PAGE_BREAK + "\nTrang 2\t \n")
+    assert text == "Trang 1" + extraction.PAGE_BREAK + "Trang 2"
@@ -0,0 +1,155 @@
+import time
+import asyncio
+
+import httpx
+import pytest
+
+import gateway
+import http_client
+
+URL = "/v1/models/test:generateContent"
+
+
+@pytest.fixture(autouse=True)
+def fresh_gateway(monkeypatch):
+    monkeypatch.setattr(gateway, "_breakers", {})
+    monkeypatch.setattr(gateway, "_buckets", {})
+    monkeypatch.setattr(gateway, "MAX_RETRIES", 3)
+    monkeypatch.setattr(gateway, "BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(gateway, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(gateway, "CIRCUIT_RESET_SECONDS", 30)
+    yield
+    http_client.set_transport("gemini", None)
+
+
+def install(handler):
+    http_client.set_transport("gemini", httpx.MockTransport(handler))
+
+
+def scripted(*statuses):
+    """Handler trả lần lượt các status, sau đó luôn 200"""
+    remaining = list(statuses)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = remaining.pop(0) if remaining else 200
+        headers = {"retry-after": "0"} if status == 429 else {}
+        return httpx.Response(status, headers=headers, json={})
+
+    return handler, calls
+
+
+def expired_breaker() -> gateway.CircuitBreaker:
+    """Breaker đã open quá reset_seconds (đang half_open)"""
+    breaker = gateway._breaker("gemini", "test")
+    breaker.failures = gateway.CIRCUIT_FAILURE_THRESHOLD
+    breaker.opened_at = time.monotonic() - gateway.CIRCUIT_RESET_SECONDS - 1
+    return breaker
+
+
+def test_rate_limited_responses_do_not_open_circuit():
+    handler, calls = scripted(429, 429, 429)
+    install(handler)
+
+    response = asyncio.run(gateway.post("gemini", "test", URL))
+
+    assert response.status_code == 200
+    assert len(calls) == 4
+    assert gateway.circuit_state("gemini", "test") == "closed"
+    assert gateway.status()["gemini:test"]["consecutive_failures"] == 0
+
+
+def test_retry_after_pauses_the_bucket():
+    def handler(request):
+        return httpx.Response(429, headers={"retry-after": "0.2"})
+
+    install(handler)
+    gateway.MAX_RETRIES = 0
+
+    async def run():
+        response = await gateway.post("gemini", "test", URL)
+        start = asyncio.get_running_loop().time()
+        await gateway._bucket("gemini", "test").acquire()
+        return response, asyncio.get_running_loop().time() - start
+
+    response, waited = asyncio.run(run())
+    assert response.status_code == 429
+    assert waited >= 0.15
+
+
+def test_server_errors_open_circuit():
+    handler, calls = scripted(500, 503, 500, 500)
+    install(handler)
+
+    # Circuit mở sau 2 lỗi nên lần retry thứ 3 fail fast
+    with pytest.raises(gateway.CircuitOpenError):
+        asyncio.run(gateway.post("gemini", "test", URL))
+    assert len(calls) == 2
+    assert gateway.circuit_state("gemini", "test") == "open"
+
+
+def test_transport_errors_count_as_failures():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    install(handler)
+
+    with pytest.raises(gateway.CircuitOpenError):
+        asyncio.run(gateway.post("gemini", "test", URL))
+    assert gateway.circuit_state("gemini", "test") == "open"
+
+
+def test_half_open_allows_single_probe():
+    calls = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def handler(request):
+            calls.append(request)
+            await gate.wait()
+            return httpx.Response(200, json={})
+
+        install(handler)
+        breaker = expired_breaker()
+        assert breaker.state == "half_open"
+
+        probe = asyncio.create_task(gateway.post("gemini", "test", URL))
+        await asyncio.sleep(0.01)
+        with pytest.raises(gateway.CircuitOpenError):
+            await gateway.post("gemini", "test", URL)
+
+        gate.set()
+        response = await probe
+        assert response.status_code == 200
+        assert breaker.state == "closed"
+        assert (await gateway.post("gemini", "test", URL)).status_code == 200
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_failed_probe_reopens_circuit():
+    handler, calls = scripted(500)
+    install(handler)
+    gateway.MAX_RETRIES = 0
+    breaker = expired_breaker()
+
+    response = asyncio.run(gateway.post("gemini", "test", URL))
+
+    assert response.status_code == 500
+    assert breaker.state == "open"
+    assert breaker.probe_at is None
+
+
+def test_stream_rate_limit_does_not_open_circuit():
+    handler, calls = scripted(429, 429, 429)
+    install(handler)
+
+    async def run():
+        async with gateway.stream("gemini", "test", URL) as response:
+            return response.status_code
+
+    assert asyncio.run(run()) == 200
+    assert gateway.circuit_state("gemini", "test") == "closed"
@@ -0,0 +1,124 @@
+import time
+import sqlite3
+import asyncio
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = jobs.JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def create(store, count=2) -> str:
+    return store.create_job([(f"cv{i}.txt", f"cv {i}".encode()) for i in range(count)], "gemini-2.0-flash", "")
+
+
+def item_rows(store):
+    return store._db.execute("SELECT idx, status, owner, claimed_at FROM job_items ORDER BY idx").fetchall()
+
+
+def test_claim_records_owner_and_time(store):
+    create(store)
+    items = store.claim_items(1, "worker-a")
+    assert [item["idx"] for item in items] == [0]
+    row = item_rows(store)[0]
+    assert row["status"] == "running"
+    assert row["owner"] == "worker-a"
+    assert row["claimed_at"] == pytest.approx(time.time(), abs=5)
+
+
+def test_requeue_only_stale_claims(store):
+    create(store)
+    store.claim_items(2, "worker-a")
+    # Claim còn hạn của worker khác không bị lấy lại
+    assert store.requeue_stale(timeout=60) == 0
+
+    store._db.execute("UPDATE job_items SET claimed_at = ? WHERE idx = 0", (time.time() - 120,))
+    assert store.requeue_stale(timeout=60) == 1
+    assert [row["status"] for row in item_rows(store)] == ["pending", "running"]
+    assert item_rows(store)[0]["owner"] is None
+
+
+def test_renew_claims_keeps_items(store):
+    create(store)
+    store.claim_items(2, "worker-a")
+    store._db.execute("UPDATE job_items SET claimed_at = ?", (time.time() - 120,))
+    assert store.renew_claims("worker-a") == 2
+    assert store.requeue_stale(timeout=60) == 0
+
+
+def test_finish_ignored_when_claim_taken_over(store):
+    job_id = create(store, 1)
+    store.claim_items(1, "worker-a")
+    store._db.execute("UPDATE job_items SET claimed_at = 0")
+    store.requeue_stale(timeout=60)
+    store.claim_items(1, "worker-b")
+
+    store.finish_item(job_id, 0, {"filename": "cv0.txt", "analysis": {}}, "worker-a")
+    assert store.get_job(job_id)["processed"] == 0
+    store.finish_item(job_id, 0, {"filename": "cv0.txt", "analysis": {}}, "worker-b")
+    job = store.get_job(job_id)
+    assert job["processed"] == 1
+    assert job["status"] == "done"
+
+
+def test_old_schema_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE job_items (job_id TEXT NOT NULL, idx INTEGER NOT NULL, filename TEXT NOT NULL, "
+        "content BLOB, status TEXT NOT NULL, result TEXT, PRIMARY KEY (job_id, idx))"
+    )
+    db.execute("INSERT INTO job_items VALUES ('old', 0, 'a.txt', NULL, 'running', NULL)")
+    db.commit()
+    db.close()
+
+    store = jobs.JobStore(path)
+    # Item running từ trước khi có claimed_at được coi là quá hạn
+    assert store.requeue_stale(timeout=60) == 1
+    store.close()
+
+
+class FlakyStore:
+    """JobStore lỗi claim_items vài lần đầu (vd. DB bị khóa)"""
+
+    def __init__(self, store, failures: int):
+        self._store = store
+        self.failures = failures
+
+    def claim_items(self, limit, owner):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self._store.claim_items(limit, owner)
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+
+def test_worker_survives_db_errors(store):
+    job_id = create(store, 3)
+    flaky = FlakyStore(store, failures=2)
+
+    async def process(filename, content, model, job_description):
+        return {"filename": filename, "analysis": {"name": content.decode()}}
+
+    async def run():
+        worker = asyncio.create_task(jobs.run_worker(flaky, process, asyncio.Event(), poll_interval=0.01))
+        try:
+            for _ in range(500):
+                if store.get_job(job_id)["status"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(run())
+    assert flaky.failures == 0
+    assert store.get_job(job_id)["completed"] == 3
@@ -0,0 +1,19 @@
+from packing import plan_packs, split_results
+from response_parsing import parse_json
+
+
+def test_plan_packs_respects_budget_and_item_limits():
+    packs, singles = plan_packs([500, 2000, 600, 700, 100], budget=1300, max_items=2, max_item_tokens=1500)
+    assert packs == [[0, 2], [3, 4]]
+    assert singles == [1]
+
+
+def test_split_results_by_cv_index():
+    parsed = [{"cv_index": 1, "name": "B"}, {"cv_index": 0, "name": "A"}, "rác"]
+    assert split_results(parsed, 3) == [{"cv_index": 0, "name": "A"}, {"cv_index": 1, "name": "B"}, None]
+
+
+def test_split_results_drops_object_cut_by_truncation():
+    parsed, repairs = parse_json('[{"cv_index": 0, "name": "A"}, {"cv_index": 1, "name": "B", "summary": "trunc')
+    assert "truncated" in repairs
+    assert split_results(parsed, 2, truncated=True) == [{"cv_index": 0, "name": "A"}, None]
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import response_parsing
+from response_parsing import (
+    IncompleteResponseError, ResponseParseError, check_complete, coerce_fields, parse_json, repair_json,
+)
+
+
+def repaired(text: str) -> tuple[object, list[str]]:
+    fixed, repairs = repair_json(text)
+    return json.loads(fixed), repairs
+
+
+def test_valid_json_in_markdown_fence():
+    assert parse_json('Kết quả:\n```json\n{"name": "A", "skills": ["Python"]}\n```\nHết.') == (
+        {"name": "A", "skills": ["Python"]}, []
+    )
+
+
+def test_no_json_raises():
+    with pytest.raises(ResponseParseError):
+        parse_json("Xin lỗi, tôi không thể phân tích CV này.")
+
+
+def test_trailing_comma():
+    assert repaired('{"a": 1, "b": [1, 2,],}') == ({"a": 1, "b": [1, 2]}, ["trailing_comma", "trailing_comma"])
+
+
+def test_missing_comma():
+    value, repairs = repaired('{"a": 1 "b": "x"\n"c": [1 2]}')
+    assert value == {"a": 1, "b": "x", "c": [1, 2]}
+    assert repairs.count("missing_comma") == 3
+
+
+def test_extra_comma():
+    assert repaired('{"a": 1,, "b": 2}') == ({"a": 1, "b": 2}, ["extra_comma"])
+
+
+def test_control_characters_in_string():
+    value, repairs = repaired('{"summary": "dòng 1\ndòng 2\tcột"}')
+    assert value == {"summary": "dòng 1\ndòng 2\tcột"}
+    assert "control_char" in repairs
+
+
+def test_unescaped_quote_in_string():
+    value, repairs = repaired('{"summary": "Ứng viên "xuất sắc" về Python", "name": "A"}')
+    assert value == {"summary": 'Ứng viên "xuất sắc" về Python', "name": "A"}
+    assert "unescaped_quote" in repairs
+
+
+def test_unescaped_quote_followed_by_comma_in_object():
+    value, _ = repaired('{"summary": "say "yes", then leave", "name": "A"}')
+    assert value == {"summary": 'say "yes", then leave', "name": "A"}
+
+
+def test_unescaped_quote_followed_by_comma_in_array():
+    value, _ = repaired('{"strengths": ["say "yes", then act", "Python"]}')
+    assert value == {"strengths": ['say "yes", then act', "Python"]}
+
+
+def test_closing_quote_before_next_key_across_lines():
+    value, repairs = repaired('{\n  "a": "x",\n  "b": "y"\n}')
+    assert value == {"a": "x", "b": "y"}
+    assert repairs == []
+
+
+def test_python_literals():
+    assert repaired('{"a": True, "b": False, "c": None}') == (
+        {"a": True, "b": False, "c": None}, ["python_literal"] * 3
+    )
+
+
+def test_truncated_inside_string():
+    value, repairs = repaired('{"name": "A", "skills": ["Python", "SQ')
+    assert value == {"name": "A", "skills": ["Python", "SQ"]}
+    assert "unterminated_string" in repairs
+    assert "truncated" in repairs
+
+
+def test_truncated_after_key_cuts_back_to_last_complete_field():
+    value, repairs = repaired('{"name": "A", "skills": ["Python"], "educa')
+    assert value == {"name": "A", "skills": ["Python"]}
+    assert "truncated" in repairs
+
+
+def test_truncated_array_of_objects():
+    value, _ = repaired('[{"cv_index": 0, "name": "A"}, {"cv_index": 1, "name": "B", "skills": [')
+    assert value == [{"cv_index": 0, "name": "A"}, {"cv_index": 1, "name": "B", "skills": []}]
+
+
+def test_parse_json_records_repairs():
+    before = response_parsing.get_stats()
+    assert parse_json('{"a": 1,}') == ({"a": 1}, ["trailing_comma"])
+    after = response_parsing.get_stats()
+    assert after["repaired"] == before["repaired"] + 1
+    assert after["repairs"]["trailing_comma"] == before["repairs"].get("trailing_comma", 0) + 1
+
+
+def test_coerce_fields():
+    from pydantic import BaseModel
+
+    class Model(BaseModel):
+        name: str
+        skills: list[str]
+        score: int = 0
+
+    data = {"name": None, "skills": "Python, SQL; Docker", "score": "85/100", "extra": 1}
+    assert coerce_fields(data, Model) == {"name": "", "skills": ["Python", "SQL", "Docker"], "score": 85}
+
+
+def test_check_complete_rejects_truncated_response():
+    data, repairs = parse_json('{"summary": "Ứng viên có 5 năm kinh nghi')
+    assert "truncated" in repairs
+    with pytest.raises(IncompleteResponseError):
+        check_complete(data, repairs, any_of=("name", "summary"))
+
+
+def test_check_complete_rejects_missing_fields():
+    with pytest.raises(IncompleteResponseError, match="name / summary"):
+        check_complete({}, [], any_of=("name", "summary"))
+    with pytest.raises(IncompleteResponseError, match="overall_score"):
+        check_complete({"name": "A", "overall_score": None}, [], required=("overall_score",), any_of=("name",))
+
+
+def test_check_complete_accepts_repaired_complete_response():
+    data, repairs = parse_json('{"name": "A", "summary": "", "overall_score": 0,}')
+    check_complete(data, repairs, required=("overall_score",), any_of=("name", "summary"))
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+
+import gateway
+import http_client
+import routing
+
+URL = "/v1/models/test:generateContent"
+
+
+@pytest.fixture(autouse=True)
+def fresh_routing(monkeypatch):
+    monkeypatch.setattr(routing, "_samples", {})
+    monkeypatch.setattr(routing, "_providers", None)
+    monkeypatch.setattr(routing, "AUTO_HEDGE_DELAY", 0)
+    monkeypatch.setattr(gateway, "_breakers", {})
+    monkeypatch.setattr(gateway, "_buckets", {})
+    yield
+    http_client.set_transport("gemini", None)
+
+
+def slow_provider(seconds: float):
+    async def handler(request):
+        await asyncio.sleep(seconds)
+        return httpx.Response(200, json={})
+
+    http_client.set_transport("gemini", httpx.MockTransport(handler))
+
+
+def test_timeout_and_latency_exclude_local_queueing(monkeypatch):
+    monkeypatch.setattr(routing, "AUTO_MODELS", ["gemini-2.0-flash"])
+    monkeypatch.setattr(routing, "AUTO_MODEL_TIMEOUT", 0.15)
+    slow_provider(0.05)
+
+    async def run():
+        # Concurrency 1: request thứ 4 chờ ~0.15s trước khi được gửi, vẫn không bị tính timeout
+        semaphore = asyncio.Semaphore(1)
+
+        async def call(model):
+            async with semaphore:
+                return await routing.track(model, gateway.post("gemini", model, URL))
+
+        return await asyncio.gather(*[routing.route(call) for _ in range(4)])
+
+    responses = asyncio.run(run())
+    assert [response.status_code for response in responses] == [200] * 4
+    stats = routing.model_stats("gemini-2.0-flash")
+    assert stats["error_rate"] == 0.0
+    assert stats["p95"] < 0.15
+
+
+def test_slow_provider_times_out_and_fails_over(monkeypatch):
+    monkeypatch.setattr(routing, "AUTO_MODELS", ["gemini-2.0-flash", "gemini-2.5-flash"])
+    monkeypatch.setattr(routing, "AUTO_MODEL_TIMEOUT", 0.05)
+
+    async def handler(request):
+        if "2.0-flash" in str(request.url):
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"model": str(request.url)})
+
+    http_client.set_transport("gemini", httpx.MockTransport(handler))
+
+    async def call(model):
+        return await routing.track(model, gateway.post("gemini", model, f"/v1/models/{model}:generateContent"))
+
+    response = asyncio.run(routing.route(call))
+    assert "2.5-flash" in response.json()["model"]
+    assert routing.model_stats("gemini-2.0-flash")["error_rate"] == 1.0
+
+
+def test_track_without_route_has_no_timeout(monkeypatch):
+    monkeypatch.setattr(routing, "AUTO_MODEL_TIMEOUT", 0.01)
+    slow_provider(0.05)
+    response = asyncio.run(routing.track("gemini-2.0-flash", gateway.post("gemini", "gemini-2.0-flash", URL)))
+    assert response.status_code == 200
+
+
+def test_rank_models_skips_providers_without_api_key(monkeypatch):
+    monkeypatch.setattr(routing, "AUTO_MODELS", ["gemini-2.0-flash", "openrouter-llama", "claude-sonnet"])
+    assert routing.rank_models() == ["gemini-2.0-flash", "openrouter-llama", "claude-sonnet"]
+    routing.set_providers(["gemini", "claude"])
+    assert routing.rank_models() == ["gemini-2.0-flash", "claude-sonnet"]
+    assert list(routing.stats()) == ["gemini-2.0-flash", "claude-sonnet"]
@@ -0,0 +1,44 @@
+import asyncio
+
+from cache import PersistentCache
+from singleflight import SingleFlight
+
+
+def test_peek_does_not_touch_stats(tmp_path):
+    cache = PersistentCache("test", db_path=str(tmp_path / "cache.db"))
+    assert cache.peek("k") is None
+    cache.set("k", {"v": 1})
+    assert cache.peek("k") == {"v": 1}
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 0
+
+
+def test_follower_polls_shared_cache_without_counting_misses(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = PersistentCache("test", db_path=db_path)
+    leader = SingleFlight(db_path, poll_interval=0.01)
+    follower = SingleFlight(db_path, poll_interval=0.01)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def analyze():
+            await release.wait()
+            cache.set("k", {"score": 1})
+            return {"score": 1}
+
+        async def never_called():
+            raise AssertionError("follower must reuse the leader result")
+
+        lead = asyncio.create_task(leader.do("k", analyze, lambda: cache.peek("k")))
+        await asyncio.sleep(0.02)
+        follow = asyncio.create_task(follower.do("k", never_called, lambda: cache.peek("k")))
+        await asyncio.sleep(0.1)
+        release.set()
+        return await lead, await follow
+
+    (lead_result, lead_shared), (follow_result, follow_shared) = asyncio.run(run())
+    assert lead_result == follow_result == {"score": 1}
+    assert (lead_shared, follow_shared) == (False, True)
+    assert follower.calls == 0
+    assert cache.stats()["misses"] == 0
@@ -0,0 +1,90 @@
+import json
+import random
+import asyncio
+
+import httpx
+import pytest
+
+from streaming import IncrementalJSONParser, iter_sse_data
+
+ANALYSIS = {
+    "name": "Nguyễn Văn A",
+    "summary": 'Ứng viên nói "có", rồi làm \\ ngay\nxuống dòng',
+    "skills": ["Python", "SQL", "[không phải ngoặc]"],
+    "details": {"years": 3, "companies": [{"name": "FPT {HN}"}]},
+    "overall_score": 85,
+    "ratio": -0.5,
+    "remote": True,
+    "notes": None,
+    "match_percentage": 90,
+}
+TEXT = "```json\n" + json.dumps(ANALYSIS, ensure_ascii=False, indent=2) + "\n```"
+
+
+def feed_all(chunks) -> tuple[list, IncrementalJSONParser]:
+    parser = IncrementalJSONParser()
+    fields = []
+    for chunk in chunks:
+        fields.extend(parser.feed(chunk))
+    return fields, parser
+
+
+def test_whole_text_emits_every_field_in_order():
+    fields, parser = feed_all([TEXT])
+    assert fields == list(ANALYSIS.items())
+    assert parser.done
+
+
+def test_single_character_chunks():
+    fields, parser = feed_all(TEXT)
+    assert fields == list(ANALYSIS.items())
+    assert parser.done
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(TEXT)), 15))
+    chunks = [TEXT[start:end] for start, end in zip([0, *cuts], [*cuts, len(TEXT)])]
+    fields, _ = feed_all(chunks)
+    assert fields == list(ANALYSIS.items())
+
+
+def test_field_emitted_as_soon_as_value_is_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"name": "A') == []
+    assert parser.feed('n", "skills": ["Py') == [("name", "An")]
+    assert parser.feed('thon"]') == [("skills", ["Python"])]
+    # Number chỉ hoàn chỉnh khi gặp , hoặc }
+    assert parser.feed(', "overall_score": 8') == []
+    assert parser.feed('5') == []
+    assert parser.feed('}') == [("overall_score", 85)]
+    assert parser.done
+
+
+def test_escape_split_across_chunks():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"summary": "say \\') == []
+    assert parser.feed('"yes\\"", "name": "B"}') == [("summary", 'say "yes"'), ("name", "B")]
+
+
+def test_text_after_root_object_is_ignored():
+    fields, parser = feed_all(['{"name": "A"}', ' {"name": "B"}'])
+    assert fields == [("name", "A")]
+    assert parser.done
+
+
+def test_iter_sse_data():
+    body = (
+        b": keep-alive\n\n"
+        b'data: {"a": 1}\n\n'
+        b"data: line 1\ndata: line 2\n\n"
+        b"data: [DONE]\n\n"
+        b'data: {"tail": true}'
+    )
+
+    async def collect():
+        response = httpx.Response(200, content=body)
+        return [data async for data in iter_sse_data(response)]
+
+    assert asyncio.run(collect()) == ['{"a": 1}', "line 1\nline 2", '{"tail": true}']
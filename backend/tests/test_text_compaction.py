@@ -0,0 +1,78 @@
+import text_compaction
+from text_compaction import PAGE_BREAK, compact_text, estimate_tokens, normalize
+
+
+def test_normalize_joins_hyphenated_words_and_collapses_spaces():
+    assert normalize("Devel-\nopment   team lead") == "Development team lead"
+
+
+def test_normalize_keeps_phone_numbers_and_years():
+    text = "Nguyen Van A\n0912345678\nĐại học Bách Khoa\n2019\nPython"
+    assert normalize(text) == text
+
+
+def test_normalize_drops_labelled_and_fraction_page_numbers():
+    text = "Kinh nghiệm\nPage 1 of 2\nBackend Developer\nTrang 2 / 2\n1/2\nPython"
+    assert normalize(text) == "Kinh nghiệm\nBackend Developer\nPython"
+
+
+def test_normalize_keeps_fractions_that_are_not_page_numbers():
+    assert normalize("Điểm\n9/8\nPython") == "Điểm\n9/8\nPython"
+
+
+def test_normalize_drops_bare_numbers_only_at_page_boundaries():
+    pages = ["CV\nKỹ năng\n42\nPython\n1", "Kinh nghiệm\nJava\n2"]
+    assert normalize(PAGE_BREAK.join(pages)) == "CV\nKỹ năng\n42\nPython\nKinh nghiệm\nJava"
+
+
+def test_normalize_removes_headers_and_footers_repeated_on_pages():
+    pages = [
+        f"Nguyen Van A - CV\nNội dung trang {page}\nSoftware Engineer\nChi tiết {page}\nConfidential"
+        for page in range(1, 4)
+    ]
+    lines = normalize(PAGE_BREAK.join(pages)).split("\n")
+    assert lines.count("Nguyen Van A - CV") == 1
+    assert lines.count("Confidential") == 1
+    # Dòng lặp trong thân trang không phải header/footer
+    assert lines.count("Software Engineer") == 3
+
+
+def test_normalize_keeps_repeated_job_titles_without_page_breaks():
+    text = "\n".join(
+        f"Software Engineer\nCông ty {company}\n- Phát triển API" for company in ("A", "B", "C")
+    )
+    lines = normalize(text).split("\n")
+    assert lines.count("Software Engineer") == 3
+    assert lines.count("- Phát triển API") == 3
+
+
+def test_normalize_drops_consecutive_duplicates():
+    assert normalize("Python\nPython\n\n\n\nJava") == "Python\n\nJava"
+
+
+def test_compact_text_within_budget_is_not_truncated():
+    result = compact_text("Kỹ năng\nPython, SQL", budget=100)
+    assert result.text == "Kỹ năng\nPython, SQL"
+    assert not result.truncated
+    assert result.tokens_after == estimate_tokens(result.text)
+
+
+def test_compact_text_cuts_low_priority_sections_first():
+    text = "\n".join([
+        "Nguyen Van A",
+        "Kỹ năng",
+        "Python, SQL, Docker",
+        "Sở thích",
+        *(f"Đọc sách chủ đề số {i}" for i in range(50)),
+    ])
+    budget = estimate_tokens("Nguyen Van A\nKỹ năng\nPython, SQL, Docker") + 20
+    result = compact_text(text, budget)
+    assert result.truncated
+    assert result.tokens_after <= budget
+    assert "Python, SQL, Docker" in result.text
+    assert "Đọc sách chủ đề số 49" not in result.text
+    assert result.tokens_before > result.tokens_after
+
+
+def test_token_budget_falls_back_to_default():
+    assert text_compaction.token_budget("unknown-model") == text_compaction.DEFAULT_TOKEN_BUDGET
@@ -0,0 +1,227 @@
+"""
+Làm gọn text CV / JD trước khi đưa vào prompt.
+
+- Chuẩn hóa: nối từ bị ngắt dòng bằng gạch nối, gộp khoảng trắng, bỏ số trang
+- Bỏ header/footer lặp lại giữa các trang và dòng trùng lặp
+- Cắt theo token budget của từng model, ưu tiên giữ các section quan trọng
+"""
+import os
+import re
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+# Token budget cho text CV theo model (ước lượng, không cần tokenizer thật)
+MODEL_TOKEN_BUDGETS = {
+    "gemini-2.0-flash": 6000,
+    "gemini-2.5-flash": 8000,
+    "gemini-2.5-pro": 12000,
+    "claude-sonnet": 8000,
+    "openrouter-claude": 8000,
+    "openrouter-gpt4": 6000,
+    "openrouter-llama": 4000,
+}
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CV_TOKEN_BUDGET", "6000"))
+JD_TOKEN_BUDGET = int(os.getenv("JD_TOKEN_BUDGET", "1500"))
+
+# Thứ tự ưu tiên khi phải cắt: section ở cuối list bị cắt trước
+SECTION_PRIORITY = ["contact", "skills", "education", "experience", "projects", "certifications", "other"]
+
+SECTION_PATTERNS = {
+    "contact": r"contact|personal (details|information)|thông tin (cá nhân|liên hệ)|liên hệ",
+    "skills": r"(technical |core )?skills|competenc(y|ies)|technologies|kỹ năng|ky nang",
+    "experience": r"(work |professional )?experience|employment( history)?|work history|kinh nghiệm( làm việc)?",
+    "education": r"education|academic|qualifications|học vấn|trình độ học vấn|đào tạo",
+    "projects": r"projects?|dự án",
+    "certifications": r"certifications?|certificates?|awards?|chứng chỉ|giải thưởng",
+    "other": r"summary|objective|profile|about me|interests|hobbies|references|languages|"
+             r"mục tiêu|giới thiệu|sở thích|ngoại ngữ|người tham chiếu",
+}
+_SECTION_RE = {
+    name: re.compile(rf"^\s*(?:{pattern})\s*:?\s*$", re.IGNORECASE)
+    for name, pattern in SECTION_PATTERNS.items()
+}
+
+# Số trang có nhãn ("Page 2", "Trang 2 / 5") hoặc dạng "2/5", "2 of 5": bỏ ở mọi vị trí
+_PAGE_LABEL_RE = re.compile(r"^(?:page|trang)\s*\d{1,3}(?:\s*(?:/|of|trên)\s*\d{1,3})?$", re.IGNORECASE)
+_PAGE_FRACTION_RE = re.compile(r"^(\d{1,3})\s*(?:/|of|trên)\s*(\d{1,3})$", re.IGNORECASE)
+# Số đứng một mình chỉ là số trang khi nằm ở đầu / cuối trang (giữ số điện thoại, năm, ...)
+_BARE_NUMBER_RE = re.compile(r"^\d{1,3}$")
+# Ký tự ngăn cách trang trong text extract từ PDF (extraction.PAGE_BREAK)
+PAGE_BREAK = "\f"
+# Số dòng không rỗng ở đầu / cuối mỗi trang được coi là vùng header / footer
+PAGE_MARGIN_LINES = 2
+_HYPHENATION_RE = re.compile(r"(\w)-\n(\w)")
+_SPACES_RE = re.compile(r"[ \t\u00a0\u200b]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    truncated: bool
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token (~4 ký tự/token cho từ dài, mỗi dấu câu 1 token)"""
+    return sum(max(1, math.ceil(len(token) / 4)) for token in _TOKEN_RE.findall(text))
+
+
+def _is_page_number(line: str, at_margin: bool) -> bool:
+    if _PAGE_LABEL_RE.match(line):
+        return True
+    fraction = _PAGE_FRACTION_RE.match(line)
+    if fraction:
+        return 0 < int(fraction.group(1)) <= int(fraction.group(2))
+    return at_margin and bool(_BARE_NUMBER_RE.match(line))
+
+
+def _margin_indexes(lines: list[str]) -> set[int]:
+    """Vị trí các dòng không rỗng ở đầu / cuối trang"""
+    filled = [i for i, line in enumerate(lines) if line]
+    return set(filled[:PAGE_MARGIN_LINES] + filled[-PAGE_MARGIN_LINES:])
+
+
+def normalize(text: str) -> str:
+    """Nối từ bị ngắt bằng gạch nối, gộp khoảng trắng, bỏ số trang, header/footer và dòng lặp"""
+    text = _HYPHENATION_RE.sub(r"\1\2", text)
+    pages = []
+    for page in text.split(PAGE_BREAK):
+        lines = [_SPACES_RE.sub(" ", line).strip() for line in page.split("\n")]
+        margin = _margin_indexes(lines)
+        pages.append([
+            (line, i in margin) for i, line in enumerate(lines)
+            if not _is_page_number(line, i in margin)
+        ])
+
+    # Header/footer: dòng ngắn nằm ở đầu / cuối của >= 3 trang (hoặc mọi trang nếu PDF chỉ có 2 trang);
+    # chỉ giữ lần xuất hiện đầu tiên. Dòng lặp trong thân trang (vd. chức danh) được giữ nguyên.
+    repeated: set[str] = set()
+    if len(pages) > 1:
+        counts = Counter(
+            line for page in pages
+            for line in {line for line, at_margin in page if at_margin and len(line) < 80}
+        )
+        repeated = {line for line, count in counts.items() if count >= min(3, len(pages))}
+
+    result = []
+    seen_repeated = set()
+    for line, at_margin in (item for page in pages for item in page):
+        if at_margin and line in repeated:
+            if line in seen_repeated:
+                continue
+            seen_repeated.add(line)
+        # Bỏ dòng trùng liên tiếp
+        if line and result and result[-1] == line:
+            continue
+        result.append(line)
+
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(result)).strip()
+
+
+def split_sections(text: str) -> list[tuple[str, str]]:
+    """Tách text thành các section (name, text); phần đầu CV được coi là contact"""
+    sections: list[tuple[str, list[str]]] = [("contact", [])]
+    for line in text.split("\n"):
+        section_name = next(
+            (name for name, pattern in _SECTION_RE.items() if len(line) < 60 and pattern.match(line)),
+            None
+        )
+        if section_name:
+            sections.append((section_name, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(name, "\n".join(lines).strip()) for name, lines in sections if any(lines)]
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cắt text theo ranh giới dòng để không vượt budget token"""
+    if budget <= 0:
+        return ""
+    kept = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def compact_text(text: str, budget: int) -> CompactionResult:
+    """Chuẩn hóa và cắt text theo budget, ưu tiên section quan trọng"""
+    tokens_before = estimate_tokens(text)
+    text = normalize(text)
+    tokens = estimate_tokens(text)
+
+    if tokens <= budget:
+        return CompactionResult(text, tokens_before, tokens, False)
+
+    sections = split_sections(text)
+    section_tokens = [estimate_tokens(section_text) for _, section_text in sections]
+
+    # Giữ nguyên các section ưu tiên cao, section ưu tiên thấp nhất bị cắt trước
+    allowed = dict(enumerate(section_tokens))
+    overflow = tokens - budget
+    order = sorted(
+        range(len(sections)),
+        key=lambda i: SECTION_PRIORITY.index(sections[i][0]),
+        reverse=True
+    )
+    for i in order:
+        if overflow <= 0:
+            break
+        cut = min(overflow, allowed[i])
+        allowed[i] -= cut
+        overflow -= cut
+
+    parts = []
+    for i, (_, section_text) in enumerate(sections):
+        if allowed[i] >= section_tokens[i]:
+            parts.append(section_text)
+        elif allowed[i] > 0:
+            parts.append(truncate_to_tokens(section_text, allowed[i]))
+
+    text = "\n\n".join(part for part in parts if part)
+    return CompactionResult(text, tokens_before, estimate_tokens(text), True)
+
+
+def token_budget(model: str) -> int:
+    """Token budget cho text CV của model"""
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+# Thống kê token trước/sau theo model để đo hiệu quả
+_stats_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+
+
+def record_stats(model: str, *results: CompactionResult) -> None:
+    with _stats_lock:
+        stats = _stats.setdefault(
+            model, {"requests": 0, "tokens_before": 0, "tokens_after": 0, "truncated": 0}
+        )
+        stats["requests"] += 1
+        for result in results:
+            stats["tokens_before"] += result.tokens_before
+            stats["tokens_after"] += result.tokens_after
+            stats["truncated"] += int(result.truncated)
+
+
+def get_stats() -> dict:
+    """Thống kê token theo model, kèm tỉ lệ tiết kiệm"""
+    with _stats_lock:
+        report = {}
+        for model, stats in _stats.items():
+            saved = stats["tokens_before"] - stats["tokens_after"]
+            report[model] = {
+                **stats,
+                "tokens_saved": saved,
+                "saved_ratio": round(saved / stats["tokens_before"], 4) if stats["tokens_before"] else 0.0,
+            }
+        return report
@@ -0,0 +1,197 @@
+"""
+Đọc file upload đã được Starlette spool (không copy thêm lần nữa).
+
+- File nhỏ Starlette giữ trong memory -> lấy bytes; file lớn đã rollover ra file tạm
+  -> giữ fd (dup) của file đó, hash qua mmap, process extract mở lại qua /proc/<pid>/fd
+- Giới hạn kích thước mỗi request: RequestSizeLimitMiddleware từ chối ngay khi vượt
+  trong lúc nhận body. Giới hạn mỗi file chỉ kiểm tra được sau khi Starlette parse xong form
+  (Starlette không có giới hạn theo từng file khi parse)
+- Extractor đọc trực tiếp file đã spool theo đường dẫn, job queue ghi BLOB từ mmap, không copy thêm bytes
+"""
+import os
+import json
+import mmap
+import asyncio
+import hashlib
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+import telemetry
+
+# Kích thước tối đa mỗi file CV (MB)
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "10"))
+# Kích thước tối đa mỗi request (MB), áp dụng cho toàn bộ body
+MAX_REQUEST_MB = float(os.getenv("MAX_REQUEST_MB", "200"))
+
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+MAX_REQUEST_BYTES = int(MAX_REQUEST_MB * 1024 * 1024)
+
+# File tạm của Starlette không có tên (đã unlink), process khác mở lại qua fd của process này
+_PROC_FD_DIR = "/proc/self/fd"
+
+
+class SpooledUpload:
+    """
+    File upload đã được Starlette spool, kèm kích thước và hash nội dung.
+    content: bytes khi file nằm trong memory; fd: bản dup fd của file tạm khi đã rollover ra đĩa
+    (vẫn đọc được sau khi FastAPI đóng UploadFile, vd. endpoint stream).
+    """
+
+    def __init__(self, filename: str, size: int, content: Optional[bytes] = None, fd: Optional[int] = None):
+        self.filename = filename
+        self.size = size
+        self.content = content
+        self.digest = ""
+        self._fd = fd
+        self._mmap: Optional[mmap.mmap] = None
+        self._views: list[memoryview] = []
+
+    @property
+    def path(self) -> Optional[str]:
+        """Đường dẫn để process khác mở file tạm, None nếu file nằm trong memory"""
+        if self._fd is None:
+            return None
+        return f"/proc/{os.getpid()}/fd/{self._fd}"
+
+    def buffer(self) -> memoryview:
+        """View read-only trên nội dung file (bytes hoặc mmap của file tạm, không copy)"""
+        if self._fd is None:
+            return memoryview(self.content or b"")
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        self._views.append(view)
+        return view
+
+    def close(self) -> None:
+        """Giải phóng mmap và fd (file tạm do Starlette tạo, tự mất khi fd cuối cùng đóng)"""
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def close_all(uploads) -> None:
+    """Đóng các SpooledUpload trong list [(filename, upload)]"""
+    for _, upload in uploads:
+        upload.close()
+
+
+async def spool_upload(file: UploadFile, max_bytes: Optional[int] = None) -> SpooledUpload:
+    """
+    Lấy nội dung UploadFile đã được Starlette spool và hash, không ghi thêm file tạm.
+    Vượt max_bytes (mặc định MAX_UPLOAD_BYTES) -> HTTPException 413.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(file.filename, max_bytes)
+
+    with telemetry.span("upload"):
+        rolled = getattr(file.file, "_rolled", False)
+        if rolled and os.path.isdir(_PROC_FD_DIR):
+            size = os.fstat(file.file.fileno()).st_size
+            if size > max_bytes:
+                raise _too_large(file.filename, max_bytes)
+            upload = SpooledUpload(file.filename, size, fd=os.dup(file.file.fileno()))
+        else:
+            await file.seek(0)
+            content = await file.read()
+            if len(content) > max_bytes:
+                raise _too_large(file.filename, max_bytes)
+            upload = SpooledUpload(file.filename, len(content), content=content)
+
+        try:
+            # hashlib nhả GIL khi hash buffer lớn
+            if upload.size > 1024 * 1024:
+                upload.digest = await asyncio.to_thread(_sha256, upload.buffer())
+            else:
+                upload.digest = _sha256(upload.buffer())
+        except BaseException:
+            upload.close()
+            raise
+
+    telemetry.BYTES.inc(upload.size, kind="upload")
+    return upload
+
+
+def _sha256(data: memoryview) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _too_large(filename: str, max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File {filename} vượt quá {max_bytes / 1024 / 1024:g}MB"
+    )
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware giới hạn kích thước body mỗi request.
+    Từ chối ngay theo Content-Length, hoặc khi số bytes đã nhận vượt giới hạn.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise _RequestTooLarge(self.max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except _RequestTooLarge:
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": _request_too_large_detail(self.max_bytes)}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _request_too_large_detail(max_bytes: int) -> str:
+    return f"Request vượt quá {max_bytes / 1024 / 1024:g}MB"
+
+
+class _RequestTooLarge(HTTPException):
+    """HTTPException để FastAPI trả 413 khi vượt giới hạn trong lúc đọc body"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=_request_too_large_detail(max_bytes))
@@ -0,0 +1,79 @@
+"""
+Warm-up sau khi app start (chạy nền, không chặn việc nhận request):
+- tạo sẵn các process extract và import PyPDF2 / python-docx trong từng process
+- import openpyxl cho export Excel, NumPy cho chấm điểm sơ bộ
+- mở sẵn kết nối HTTP tới các provider đã cấu hình API key
+
+Thư viện nặng chỉ dùng ở vài endpoint (PyPDF2, python-docx, openpyxl, NumPy, pyarrow, pyinstrument)
+được import lazy trong hàm nên không làm chậm lúc import app; warm-up nạp sẵn các thư viện
+nằm trên đường đi của request thường gặp. /ready trả về 503 cho tới khi warm-up xong.
+"""
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable
+
+import exporter
+import extraction
+import http_client
+import scoring
+import telemetry
+
+# Tắt warm-up (vd. khi chạy script / test cần start nhanh)
+WARMUP_ENABLED = os.getenv("WARMUP", "1").lower() not in ("0", "false", "no")
+# Mở sẵn kết nối tới provider khi warm-up
+WARMUP_HTTP = os.getenv("WARMUP_HTTP", "1").lower() not in ("0", "false", "no")
+
+log = telemetry.get_logger("warmup")
+
+_state = {
+    "ready": False,
+    "import_ms": None,
+    "startup_ms": None,
+    "warmup_ms": None,
+    "steps": {},
+}
+
+
+def mark_imported(seconds: float) -> None:
+    """Thời gian import module app (main)"""
+    _state["import_ms"] = round(seconds * 1000, 1)
+
+
+def mark_started(seconds: float) -> None:
+    """Thời gian chạy phần startup của lifespan"""
+    _state["startup_ms"] = round(seconds * 1000, 1)
+
+
+def status() -> dict:
+    return {**_state, "steps": dict(_state["steps"])}
+
+
+async def run(providers: list[str]) -> None:
+    """Chạy song song các bước warm-up, lỗi ở 1 bước chỉ được ghi lại (app vẫn ready)"""
+    if not WARMUP_ENABLED:
+        _state["ready"] = True
+        return
+
+    start = time.perf_counter()
+    steps: dict[str, Callable[[], Awaitable]] = {
+        "extraction": extraction.warm_pool,
+        "export": lambda: asyncio.to_thread(exporter.warm_up),
+        "scoring": lambda: asyncio.to_thread(scoring.warm_up),
+    }
+    if WARMUP_HTTP and providers:
+        steps["http"] = lambda: http_client.warm_up(providers)
+
+    async def timed(name: str, step: Callable[[], Awaitable]) -> None:
+        step_start = time.perf_counter()
+        try:
+            result = await step()
+            _state["steps"][name] = {"ms": round((time.perf_counter() - step_start) * 1000, 1), "result": result}
+        except Exception as e:
+            _state["steps"][name] = {"ms": round((time.perf_counter() - step_start) * 1000, 1), "error": str(e)}
+            log.warning("Warm-up step failed", extra={"step": name, "error": str(e)})
+
+    await asyncio.gather(*[timed(name, step) for name, step in steps.items()])
+    _state["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    _state["ready"] = True
+    log.info("Warm-up done", extra=status())